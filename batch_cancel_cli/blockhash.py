@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from solders.hash import Hash
+
+# Refresh in the background once this share of the TTL has elapsed, so foreground callers keep hitting the cache
+REFRESH_AT = 0.8
+
+
+@dataclass(frozen=True)
+class CachedBlockhash:
+    blockhash: Hash
+    last_valid_block_height: int
+    fetched_at: float
+
+
+class BlockhashCache:
+    """Thread-safe recent blockhash provider shared by sync and async runners.
+
+    A fetched blockhash is reused for `ttl` seconds. Once started, a daemon thread refreshes it ahead of the TTL and
+    as soon as the current block height gets within `refresh_margin` blocks of its `lastValidBlockHeight`.
+    """
+
+    def __init__(
+        self,
+        fetch_blockhash: Callable[[], tuple[Hash, int]],
+        fetch_block_height: Callable[[], int] | None = None,
+        ttl: float = 20.0,
+        refresh_margin: int = 40,
+        poll_interval: float = 2.0,
+    ):
+        self.fetch_blockhash = fetch_blockhash
+        self.fetch_block_height = fetch_block_height
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.poll_interval = poll_interval
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._current: CachedBlockhash | None = None
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def current(self) -> CachedBlockhash | None:
+        return self._current
+
+    def _fresh(self, current: CachedBlockhash | None) -> bool:
+        return current is not None and time.monotonic() - current.fetched_at < self.ttl
+
+    def _hit(self) -> CachedBlockhash | None:
+        with self._lock:
+            if not self._fresh(self._current):
+                return None
+            self.hits += 1
+            return self._current
+
+    def get_entry(self) -> CachedBlockhash:
+        return self._hit() or self._fetch(miss=True)
+
+    async def get_entry_async(self) -> CachedBlockhash:
+        if (current := self._hit()) is not None:
+            return current
+        return await asyncio.to_thread(self._fetch, True)
+
+    def get(self) -> Hash:
+        return self.get_entry().blockhash
+
+    async def get_async(self) -> Hash:
+        return (await self.get_entry_async()).blockhash
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._current = None
+
+    def _fetch(self, miss: bool) -> CachedBlockhash:
+        # only one thread talks to the RPC, the rest wait and reuse its result
+        with self._fetch_lock:
+            with self._lock:
+                if miss and self._fresh(self._current):
+                    self.hits += 1
+                    return self._current  # type: ignore[return-value]
+            blockhash, last_valid_block_height = self.fetch_blockhash()
+            current = CachedBlockhash(blockhash, last_valid_block_height, time.monotonic())
+            with self._lock:
+                self._current = current
+                if miss:
+                    self.misses += 1
+                else:
+                    self.refreshes += 1
+        self.start()
+        return current
+
+    def _expiring(self, current: CachedBlockhash) -> bool:
+        if time.monotonic() - current.fetched_at >= self.ttl * REFRESH_AT:
+            return True
+        if self.fetch_block_height is None:
+            return False
+        if current.last_valid_block_height - self.fetch_block_height() <= self.refresh_margin:
+            self.invalidate()
+            return True
+        return False
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            current = self._current
+            if current is None:
+                continue
+            try:
+                if self._expiring(current):
+                    self._fetch(miss=False)
+            except Exception:
+                # foreground callers will fetch on their own if the cache runs stale
+                continue
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="blockhash-refresh", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "refreshes": self.refreshes}
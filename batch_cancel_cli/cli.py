@@ -1,28 +1,22 @@
+import time
 from pathlib import Path
-from typing import Callable, Sequence, overload
+from typing import TYPE_CHECKING, TextIO, overload
 
 import click
 from click import Context
-from more_itertools import chunked
-from solana.rpc.api import Client
-from solana.transaction import Transaction
-from solders.instruction import Instruction
 from solders.keypair import Keypair
 from solders.pubkey import Pubkey
-from solders.signature import Signature
-from spl.token.constants import ASSOCIATED_TOKEN_PROGRAM_ID, TOKEN_PROGRAM_ID
 
-from batch_cancel_cli.client.instructions import cancel as build_cancel_ix
-from batch_cancel_cli.client.instructions import create as build_create_ix
-from batch_cancel_cli.client.instructions import transfer_recipient as build_transfer_recipient_ix
-from batch_cancel_cli.client.instructions.create import CreateAccounts, CreateArgs
-from batch_cancel_cli.client.program_id import PROGRAM_ID
-from batch_cancel_cli.client.structures import Contract
+from batch_cancel_cli.confirmation import COMMITMENT_LEVELS
+from batch_cancel_cli.metrics import STAGES
+from batch_cancel_cli.packing import COMPUTE_UNITS_PER_PAIR, MAX_COMPUTE_UNIT_LIMIT
+
+# The runners pull in the RPC clients and the generated program client, which is most of the startup time. They're
+# imported by the commands that run, so `--help` and argument errors come back without loading them.
+if TYPE_CHECKING:
+    from batch_cancel_cli.runner import Runner
 
 NETWORKS = {True: "https://api.devnet.solana.com", False: "https://api.mainnet-beta.solana.com"}
-STREAMFLOW_TREASURY = Pubkey.from_string("5SEpbdjFK5FxwTvfsGMXVQTD2v4M2c5tyRTxhdsPkgDw")
-WITHDRAWOR = Pubkey.from_string("wdrwhnCv4pzW8beKsbPa4S2UDZrXenjg16KJdKSpb5u")
-FEE_ORACLE = Pubkey.from_string("B743wFVk2pCYhV91cn287e1xY7f1vt4gdY48hhNiuQmT")
 
 
 @overload
@@ -46,6 +40,13 @@ def validate_pubkey(ctx, param, value: str | tuple[str, ...]) -> Pubkey | tuple[
         raise click.BadParameter("Invalid pubkey")
 
 
+def validate_stages(ctx: Context, param: click.Parameter, value: str) -> tuple[str, ...]:
+    stages = tuple(dict.fromkeys(stage.strip() for stage in value.split(",") if stage.strip()))
+    if unknown := [stage for stage in stages if stage not in STAGES]:
+        raise click.BadParameter(f"Unknown stages {', '.join(unknown)}, choose from {', '.join(STAGES)}")
+    return stages
+
+
 def validate_private_keys_file(ctx, param, value: str) -> Keypair:
     path = Path(value)
     if not path.exists():
@@ -60,160 +61,6 @@ def validate_private_keys_file(ctx, param, value: str) -> Keypair:
             raise click.BadParameter("Invalid keys file")
 
 
-def derive_ata(pubkey: Pubkey, mint: Pubkey) -> Pubkey:
-    return Pubkey.find_program_address(
-        [bytes(pubkey), bytes(TOKEN_PROGRAM_ID), bytes(mint)], ASSOCIATED_TOKEN_PROGRAM_ID
-    )[0]
-
-
-def build_create_args(net_amount_deposited: int, period: int, amount_per_period: int, name: str) -> CreateArgs:
-    encoded_name = name.encode()
-    name_byte_array = bytearray(64)
-    name_byte_array[0 : len(encoded_name)] = encoded_name
-    return CreateArgs(
-        start_time=0,
-        net_amount_deposited=net_amount_deposited,
-        period=period,
-        amount_per_period=amount_per_period,
-        cliff=0,
-        cliff_amount=0,
-        cancelable_by_sender=True,
-        cancelable_by_recipient=False,
-        automatic_withdrawal=False,
-        transferable_by_sender=True,
-        transferable_by_recipient=False,
-        can_topup=False,
-        stream_name=list(name_byte_array),
-        withdraw_frequency=0,
-        pausable=False,
-        can_update_rate=False,
-    )
-
-
-class Runner:
-    def __init__(
-        self,
-        rpc_url: str,
-        signer: Keypair,
-        program_id: Pubkey = PROGRAM_ID,
-    ):
-        self.client = Client(rpc_url)
-        self.signer = signer
-        self.payer = signer.pubkey()
-        self.program_id = program_id
-
-    def generate_compute_budget_instruction(self) -> Instruction:
-        return Instruction(
-            program_id=Pubkey.from_string("ComputeBudget111111111111111111111111111111"),
-            data=bytes.fromhex("0200e20400"),
-            accounts=[],
-        )
-
-    def generate_create_instruction(
-        self, args: CreateArgs, contract_signer: Keypair, mint: Pubkey, recipient: Pubkey
-    ) -> Instruction:
-        contract_metadata = contract_signer.pubkey()
-        escrow_tokens, _ = Pubkey.find_program_address([b"strm", bytes(contract_metadata)], self.program_id)
-        return build_create_ix(
-            args,
-            CreateAccounts(
-                mint=mint,
-                sender=self.payer,
-                sender_tokens=derive_ata(self.payer, mint),
-                recipient=recipient,
-                recipient_tokens=derive_ata(recipient, mint),
-                streamflow_treasury=STREAMFLOW_TREASURY,
-                streamflow_treasury_tokens=derive_ata(STREAMFLOW_TREASURY, mint),
-                partner=self.payer,
-                partner_tokens=derive_ata(self.payer, mint),
-                metadata=contract_metadata,
-                escrow_tokens=escrow_tokens,
-                fee_oracle=FEE_ORACLE,
-                withdrawor=WITHDRAWOR,
-                streamflow_program=self.program_id,
-            ),
-            self.program_id,
-        )
-
-    def generate_transfer_instruction(
-        self, new_recipient: Pubkey, contract_id: Pubkey, contract: Contract
-    ) -> Instruction:
-        mint = Pubkey(contract.mint)
-        return build_transfer_recipient_ix(
-            {
-                "authority": self.payer,
-                "new_recipient": new_recipient,
-                "new_recipient_tokens": derive_ata(new_recipient, mint),
-                "metadata": contract_id,
-                "mint": mint,
-            },
-            self.program_id,
-        )
-
-    def generate_cancel_instruction(
-        self, contract_id: Pubkey, contract: Contract, recipient: Pubkey | None = None
-    ) -> Instruction:
-        mint = Pubkey(contract.mint)
-        recipient = recipient or Pubkey(contract.recipient)
-        return build_cancel_ix(
-            {
-                "authority": self.payer,
-                "sender": Pubkey(contract.sender),
-                "sender_tokens": Pubkey(contract.sender_tokens),
-                "recipient": recipient,
-                "recipient_tokens": derive_ata(recipient, mint),
-                "metadata": contract_id,
-                "escrow_tokens": Pubkey(contract.escrow_tokens),
-                "streamflow_treasury": Pubkey(contract.streamflow_treasury),
-                "streamflow_treasury_tokens": Pubkey(contract.streamflow_treasury_tokens),
-                "partner": Pubkey(contract.partner),
-                "partner_tokens": Pubkey(contract.partner_tokens),
-                "mint": mint,
-            },
-            self.program_id,
-        )
-
-    def generate_tx(self, *ixs: Instruction) -> Transaction:
-        return Transaction(
-            recent_blockhash=(self.client.get_latest_blockhash()).value.blockhash,
-            fee_payer=self.payer,
-        ).add(self.generate_compute_budget_instruction(), *ixs)
-
-    def get_contract(self, contract_id: Pubkey) -> Contract:
-        res = self.client.get_account_info(contract_id)
-        return Contract.from_bytes(res.value.data)
-
-    def get_contracts(
-        self, contract_ids: Sequence[Pubkey], filter_: Callable[[Contract], bool] | None = None
-    ) -> list[Contract | None]:
-        contracts = []
-        for chunk in chunked(contract_ids, 100):
-            res = self.client.get_multiple_accounts(chunk)
-            for data in res.value:
-                if (
-                    not data
-                    or (contract := Contract.from_bytes(data.data))
-                    and ((filter_ and not filter_(contract)) or contract.closed)
-                ):
-                    contracts.append(None)
-                    continue
-                contracts.append(contract)
-        return contracts
-
-    def create_contract(self, args: CreateArgs, contract_signer: Keypair, mint: Pubkey, recipient: Pubkey) -> Signature:
-        ix = self.generate_create_instruction(args, contract_signer, mint, recipient)
-        tx = self.generate_tx(ix)
-        tx.sign(self.signer, contract_signer)
-        return self.client.send_raw_transaction(tx.serialize()).value
-
-    def transfer_cancel(self, new_recipient: Pubkey, contract_id: Pubkey, contract: Contract) -> Signature:
-        transfer_ix = self.generate_transfer_instruction(new_recipient, contract_id, contract)
-        cancel_ix = self.generate_cancel_instruction(contract_id, contract, new_recipient)
-        tx = self.generate_tx(transfer_ix, cancel_ix)
-        tx.sign(self.signer)
-        return self.client.send_raw_transaction(tx.serialize()).value
-
-
 @click.group(context_settings={"help_option_names": ["-h", "--help"]})
 @click.option("--devnet", is_flag=True, show_default=True, default=False, help="Use devnet")
 @click.option(
@@ -224,18 +71,140 @@ class Runner:
     callback=validate_private_keys_file,
     help="Path to the keys.json file for the stream sender or base58 encoded private key",
 )
-@click.option("--rpc", help="Use non default RPC Pool")
+@click.option(
+    "--rpc",
+    multiple=True,
+    help="Use non default RPC Pool, repeat or separate with commas to spread requests over several endpoints",
+)
+@click.option(
+    "--blockhash-ttl",
+    show_default=True,
+    default=20.0,
+    type=click.FloatRange(min=0),
+    help="Seconds to reuse a fetched blockhash before requesting a new one",
+)
+@click.option(
+    "--fetch-concurrency",
+    show_default=True,
+    default=4,
+    type=click.IntRange(min=1),
+    help="Number of account chunks to fetch in parallel",
+)
+@click.option(
+    "--pda-cache",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="File to load derived addresses (ATAs, PDAs) from and save them to after the run",
+)
+@click.option(
+    "--rps",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Read requests per second to allow, unlimited by default; lowered automatically on HTTP 429",
+)
+@click.option(
+    "--send-rps",
+    type=click.FloatRange(min=0, min_open=True),
+    help="sendTransaction requests per second to allow, defaults to --rps",
+)
+@click.option(
+    "--burst",
+    show_default=True,
+    default=10,
+    type=click.IntRange(min=1),
+    help="Requests that may go out at once before --rps and --send-rps apply",
+)
+@click.option(
+    "--hedge-after",
+    type=click.FloatRange(min=0),
+    help="Seconds after which a slow account fetch is duplicated to the next best endpoint, needs several --rpc",
+)
+@click.option(
+    "--auto-cu",
+    is_flag=True,
+    help="Simulate the first transaction of every shape and request only the compute units it used plus a margin",
+)
+@click.option(
+    "--cu-margin",
+    show_default=True,
+    default=0.2,
+    type=click.FloatRange(min=0),
+    help="Share of the simulated compute units to add on top with --auto-cu",
+)
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="File to write a JSON summary of the run to: latency percentiles, calls and errors per stage and RPC method",
+)
+@click.option(
+    "--prometheus-file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="File to write the run's latency histograms and counters to in the Prometheus text format",
+)
+@click.option(
+    "--profile",
+    type=click.Choice(["cpu", "alloc"]),
+    help="Profile the command's --profile-stages with cProfile (cpu) or tracemalloc (alloc)",
+)
+@click.option(
+    "--profile-stages",
+    show_default=True,
+    default="fetch,build,sign,send",
+    callback=validate_stages,
+    help=f"Comma separated stages to profile, any of {', '.join(STAGES)}",
+)
+@click.option(
+    "--profile-file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="File to write the profile to, profile-cpu.pstats or profile-alloc.folded (collapsed stacks) by default",
+)
 @click.pass_context
-def cli(ctx: Context, devnet: bool, signer: Keypair, rpc: str | None):
+def cli(
+    ctx: Context,
+    devnet: bool,
+    signer: Keypair,
+    rpc: tuple[str, ...],
+    blockhash_ttl: float,
+    fetch_concurrency: int,
+    pda_cache: Path | None,
+    rps: float | None,
+    send_rps: float | None,
+    burst: int,
+    hedge_after: float | None,
+    auto_cu: bool,
+    cu_margin: float,
+    metrics_file: Path | None,
+    prometheus_file: Path | None,
+    profile: str | None,
+    profile_stages: tuple[str, ...],
+    profile_file: Path | None,
+):
+    from batch_cancel_cli.compute_units import ComputeUnitProfiler
+    from batch_cancel_cli.pool import RpcPool
+    from batch_cancel_cli.ratelimit import RateLimiter
+    from batch_cancel_cli.runner import Runner, start_profiler, write_metrics
+
     ctx.ensure_object(dict)
-    rpc = rpc or NETWORKS[devnet]
-    ctx.obj["runner"] = Runner(
-        rpc,
+    urls = [url.strip() for value in rpc for url in value.split(",") if url.strip()] or [NETWORKS[devnet]]
+    # --rps, --send-rps and --burst apply to every endpoint on its own
+    pool = RpcPool(urls, lambda: RateLimiter(rps, burst, send_rps), hedge_after)
+    runner = Runner(
+        pool.primary,
         signer,
         Pubkey.from_string("HqDGZjaVRXJ9MGRQEw7qDc2rAr6iH1n1kAQdCZaCMfMZ")
         if devnet
         else Pubkey.from_string("strmRqUCoQUgGUan5YhzUZa6KqdzwX5L6FpUxfmKg5m"),
+        blockhash_ttl,
+        fetch_concurrency,
+        pool=pool,
     )
+    if auto_cu:
+        runner.cu_profiler = ComputeUnitProfiler(runner.simulate_units, cu_margin)
+    if pda_cache:
+        runner.pda_cache.load(pda_cache)
+        ctx.call_on_close(lambda: runner.pda_cache.save(pda_cache))
+    ctx.call_on_close(lambda: write_metrics(runner, metrics_file, prometheus_file))
+    if profile:
+        start_profiler(ctx, runner, profile, profile_stages, profile_file)
+    ctx.obj["runner"] = runner
 
 
 @cli.command(help="Create a new Contract")
@@ -267,58 +236,264 @@ def create(
     amount_per_period: int,
     name: str,
 ):
+    from batch_cancel_cli.runner import build_create_args
+
     contract_signer = Keypair()
     args = build_create_args(net_amount, period, amount_per_period, name)
-    runner: Runner = ctx.obj["runner"]
+    runner: "Runner" = ctx.obj["runner"]
     signature = runner.create_contract(args, contract_signer, mint, recipient)
     click.echo(f"Contract id: {contract_signer.pubkey()}")
     click.echo(f"Tx: {signature}")
     click.echo("Finished")
 
 
-@cli.command(help="Transfer contract_ids to new_recipient and then cancel them")
+@cli.command(help="Transfer contract_ids (or contracts from --ids-file or --sender) to new_recipient and cancel them")
 @click.argument(
     "contract_ids",
     nargs=-1,
     callback=validate_pubkey,
 )
 @click.option("-r", "--new-recipient", callback=validate_pubkey, help="Address for the new recipient")
+@click.option(
+    "--ids-file",
+    type=click.File("r"),
+    help="File with one contract id per line to read instead of contract_ids, use - for stdin",
+)
+@click.option(
+    "--dedup/--no-dedup",
+    show_default=True,
+    default=True,
+    help="Drop repeated ids from --ids-file, which keeps every unique id in memory",
+)
 @click.option(
     "--check-claims",
     help="Cancel only contracts that have NOT been claimed",
     is_flag=True,
 )
+@click.option(
+    "-c",
+    "--concurrency",
+    show_default=True,
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of transactions to keep in flight at once",
+)
+@click.option(
+    "--pack",
+    is_flag=True,
+    help="Pack as many transfer+cancel pairs into one transaction as fit, falling back to one pair per transaction",
+)
+@click.option(
+    "--cu-per-pair",
+    show_default=True,
+    default=COMPUTE_UNITS_PER_PAIR,
+    type=click.IntRange(min=1),
+    help="Compute units to request per transfer+cancel pair",
+)
+@click.option(
+    "--sender",
+    callback=lambda ctx, param, value: value and validate_pubkey(ctx, param, value),
+    help="Find open contracts created by this sender on chain instead of passing contract_ids",
+)
+@click.option(
+    "--mint",
+    callback=lambda ctx, param, value: value and validate_pubkey(ctx, param, value),
+    help="Only find contracts of this mint, used with --sender",
+)
+@click.option(
+    "--v0",
+    "versioned",
+    is_flag=True,
+    help=(
+        "Send v0 transactions that load the accounts shared by all contracts from an address lookup table. With --pack"
+        f" the compute budget still caps a transaction at {MAX_COMPUTE_UNIT_LIMIT // COMPUTE_UNITS_PER_PAIR} pairs at"
+        " the default --cu-per-pair, lower it or use --auto-cu to fill the extra room"
+    ),
+)
+@click.option(
+    "--lookup-table",
+    callback=lambda ctx, param, value: value and validate_pubkey(ctx, param, value),
+    help="Existing address lookup table to use with --v0, a new one is created when omitted",
+)
+@click.option(
+    "--journal",
+    "journal_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Append the progress of every contract to this journal file",
+)
+@click.option(
+    "--resume",
+    "resume_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Continue the run recorded in this journal, skipping finished contracts and re-checking sent ones",
+)
+@click.option(
+    "--simulate-first",
+    is_flag=True,
+    help="Simulate every transfer+cancel before sending and skip the contracts whose simulation fails",
+)
+@click.option(
+    "--simulate-concurrency",
+    show_default=True,
+    default=8,
+    type=click.IntRange(min=1),
+    help="Number of simulations to keep in flight with --simulate-first",
+)
+@click.option(
+    "--confirm",
+    is_flag=True,
+    help="Track sent transactions and report every contract as confirmed, failed or expired",
+)
+@click.option(
+    "--commitment",
+    show_default=True,
+    default="confirmed",
+    type=click.Choice(list(COMMITMENT_LEVELS)),
+    help="Commitment level a transaction has to reach to count as confirmed, used with --confirm",
+)
+@click.option(
+    "--websocket",
+    is_flag=True,
+    help="Settle transactions from signatureSubscribe notifications and poll only the rest, used with --confirm",
+)
+@click.option(
+    "--max-subscriptions",
+    show_default=True,
+    default=1000,
+    type=click.IntRange(min=1),
+    help="Open signature subscriptions per WebSocket, transactions above the limit are polled",
+)
+@click.option(
+    "--priority-fee-percentile",
+    type=click.FloatRange(min=0, max=100),
+    help="Pay this percentile of the recent prioritization fees on the treasury accounts, no priority fee by default",
+)
+@click.option(
+    "--max-priority-fee",
+    show_default=True,
+    default=100_000,
+    type=click.IntRange(min=1),
+    help="Highest compute unit price in micro-lamports, also caps the raised price of retries",
+)
+@click.option(
+    "--max-attempts",
+    show_default=True,
+    default=5,
+    type=click.IntRange(min=1),
+    help="Send attempts per transaction before giving up on transient errors, 1 disables retries",
+)
+@click.option(
+    "--retry-timeout",
+    show_default=True,
+    default=60.0,
+    type=click.FloatRange(min=0),
+    help="Seconds to keep retrying a transaction",
+)
 @click.pass_context
 def cancel(
     ctx: Context,
     contract_ids: tuple[Pubkey],
     new_recipient: Pubkey,
+    ids_file: TextIO | None,
+    dedup: bool,
     check_claims: bool,
+    concurrency: int,
+    pack: bool,
+    cu_per_pair: int,
+    sender: Pubkey | None,
+    mint: Pubkey | None,
+    versioned: bool,
+    lookup_table: Pubkey | None,
+    journal_path: Path | None,
+    resume_path: Path | None,
+    simulate_first: bool,
+    simulate_concurrency: int,
+    confirm: bool,
+    commitment: str,
+    websocket: bool,
+    max_subscriptions: int,
+    priority_fee_percentile: float | None,
+    max_priority_fee: int,
+    max_attempts: int,
+    retry_timeout: float,
 ):
-    if check_claims:
-        click.echo("Cancelling only contracts without claims")
-    else:
-        click.echo("Cancelling all provided contracts")
-
-    def claim_filter(c: Contract) -> bool:
-        return not c.last_withdrawn
+    from batch_cancel_cli.fees import PriorityFeePolicy
+    from batch_cancel_cli.journal import Journal
+    from batch_cancel_cli.retry import RetryPolicy
+    from batch_cancel_cli.runner import (
+        Reporter,
+        cancel_contracts,
+        iter_cancel_items,
+        print_run_stats,
+        resume_journal,
+        start_tracking,
+        use_lookup_table,
+        wait_for_confirmations,
+    )
 
-    runner: Runner = ctx.obj["runner"]
-    contracts = runner.get_contracts(contract_ids, claim_filter if check_claims else None)
-    click.echo(f"Processing {len(contracts)} contracts")
-    for contract_id, contract in zip(contract_ids, contracts, strict=True):
-        if not contract:
-            click.echo(f"Skipping contract {contract_id}")
-            continue
-        try:
-            sig = runner.transfer_cancel(new_recipient, contract_id, contract)
-        except Exception as e:
-            click.echo(f"Failed to cancel contract {contract_id}: {e}")
-            continue
-        click.echo(f"Cancel tx for contract {contract_id}: {sig}")
+    if sum(map(bool, (contract_ids, ids_file, sender))) != 1:
+        raise click.UsageError("Provide exactly one of contract_ids, --ids-file or --sender")
+    if mint and not sender:
+        raise click.UsageError("--mint can only be used with --sender")
+    if journal_path and resume_path:
+        raise click.UsageError("--journal and --resume are mutually exclusive")
+    if websocket and not confirm:
+        raise click.UsageError("--websocket can only be used with --confirm")
+    click.echo("Cancelling only contracts without claims" if check_claims else "Cancelling all provided contracts")
+
+    runner: "Runner" = ctx.obj["runner"]
+    runner.compute_units_per_pair = cu_per_pair
+    entries = Journal.load(resume_path) if resume_path else {}
+    journal = Journal(path) if (path := resume_path or journal_path) else None
+    if journal:
+        ctx.call_on_close(journal.close)
+    reporter = Reporter(journal)
+    runner.retry.policy = RetryPolicy(max_attempts=max_attempts, max_elapsed=retry_timeout)
+    runner.retry.on_retry = reporter.retrying
+    if priority_fee_percentile is not None:
+        runner.priority_fees = PriorityFeePolicy(
+            runner.get_recent_prioritization_fees, priority_fee_percentile, max_priority_fee
+        )
+    subscriber = start_tracking(runner, reporter, commitment, websocket, max_subscriptions) if confirm else None
+    finished = resume_journal(runner, journal, entries) if journal and resume_path else set()
+    items = iter_cancel_items(runner, reporter, contract_ids, ids_file, sender, mint, check_claims, finished, dedup)
+    if versioned or lookup_table:
+        items = use_lookup_table(runner, new_recipient, items, lookup_table)
+    if simulate_first:
+        items = reporter.skip_doomed(runner.iter_simulations(new_recipient, items, simulate_concurrency))
+    cancel_contracts(runner, reporter, new_recipient, items, concurrency, pack)
+    reporter.simulation_summary()
+    if reporter.tracker is not None:
+        wait_for_confirmations(reporter.tracker, subscriber)
+    print_run_stats(runner)
     click.echo("Finished")
 
 
+@cli.command(help="Summarize the state of contract_ids (requires the numpy extra)")
+@click.argument(
+    "contract_ids",
+    nargs=-1,
+    callback=validate_pubkey,
+)
+@click.pass_context
+def summary(ctx: Context, contract_ids: tuple[Pubkey]) -> None:
+    runner: "Runner" = ctx.obj["runner"]
+    try:
+        batch = runner.get_contracts_batch(contract_ids)
+    except ImportError as e:
+        raise click.ClickException("summary requires numpy, install it with the `numpy` extra") from e
+    exists = batch.exists
+    open_ = exists & (batch["closed"] == 0)
+    click.echo(f"Contracts: {len(batch)}")
+    click.echo(f"Missing: {int((~exists).sum())}")
+    click.echo(f"Closed: {int((exists & (batch['closed'] != 0)).sum())}")
+    click.echo(f"Canceled: {int((exists & (batch['canceled_at'] != 0)).sum())}")
+    click.echo(f"Open: {int(open_.sum())}")
+    click.echo(f"Open with claims: {int((open_ & (batch['last_withdrawn'] != 0)).sum())}")
+    click.echo(f"Open and fully vested: {int((open_ & (batch['end_time'] <= int(time.time()))).sum())}")
+    click.echo(f"Withdrawn amount: {int(batch['withdrawn_amount'][exists].sum())}")
+
+
 def main():
     cli()
 
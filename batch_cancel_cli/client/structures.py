@@ -1,51 +1,142 @@
-from podite import F32, U8, U32, U64, FixedLenArray, pod
-
-
-@pod
-class Contract:
-    magic: U64
-    version: U8
-    created_at: U64
-    withdrawn_amount: U64
-    canceled_at: U64
-    end_time: U64
-    last_withdrawn: U64
-    sender: FixedLenArray[U8, 32]
-    sender_tokens: FixedLenArray[U8, 32]
-    recipient: FixedLenArray[U8, 32]
-    recipient_tokens: FixedLenArray[U8, 32]
-    mint: FixedLenArray[U8, 32]
-    escrow_tokens: FixedLenArray[U8, 32]
-    streamflow_treasury: FixedLenArray[U8, 32]
-    streamflow_treasury_tokens: FixedLenArray[U8, 32]
-    streamflow_fee: U64
-    streamflow_fee_withdrawn: U64
-    streamflow_fee_percentage: F32
-    partner: FixedLenArray[U8, 32]
-    partner_tokens: FixedLenArray[U8, 32]
-    partner_fee: U64
-    partner_fee_withdrawn: U64
-    partner_fee_percentage: F32
-    start_time: U64
-    net_amount_deposited: U64
-    period: U64
-    amount_per_period: U64
-    cliff: U64
-    cliff_amount: U64
-    cancelable_by_sender: U8
-    cancelable_by_recipient: U8
-    automatic_withdrawal: U8
-    transferable_by_sender: U8
-    transferable_by_recipient: U8
-    can_topup: U8
-    name: FixedLenArray[U8, 64]
-    withdrawal_frequency: U64
-    ghost: U32
-    pausable: U8
-    can_update_rate: U8
-    padding: FixedLenArray[U8, 130]
-    closed: U8
-    current_pause_start: U64
-    pause_cumulative: U64
-    last_rate_change_time: U64
-    funds_unlocked_at_last_rate_change: U64
+import struct
+from typing import TYPE_CHECKING, Any
+
+from solders.pubkey import Pubkey
+
+if TYPE_CHECKING:
+    from .contract import Contract  # noqa: F401
+
+
+def __getattr__(name: str) -> Any:
+    # podite builds the `Contract` codec at import, which costs more than the rest of the client
+    if name == "Contract":
+        from .contract import Contract
+
+        return Contract
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Byte layout of `Contract`, in field order. 32 byte arrays listed in CONTRACT_PUBKEY_FIELDS decode to `Pubkey`.
+CONTRACT_LAYOUT: tuple[tuple[str, str], ...] = (
+    ("magic", "Q"),
+    ("version", "B"),
+    ("created_at", "Q"),
+    ("withdrawn_amount", "Q"),
+    ("canceled_at", "Q"),
+    ("end_time", "Q"),
+    ("last_withdrawn", "Q"),
+    ("sender", "32s"),
+    ("sender_tokens", "32s"),
+    ("recipient", "32s"),
+    ("recipient_tokens", "32s"),
+    ("mint", "32s"),
+    ("escrow_tokens", "32s"),
+    ("streamflow_treasury", "32s"),
+    ("streamflow_treasury_tokens", "32s"),
+    ("streamflow_fee", "Q"),
+    ("streamflow_fee_withdrawn", "Q"),
+    ("streamflow_fee_percentage", "f"),
+    ("partner", "32s"),
+    ("partner_tokens", "32s"),
+    ("partner_fee", "Q"),
+    ("partner_fee_withdrawn", "Q"),
+    ("partner_fee_percentage", "f"),
+    ("start_time", "Q"),
+    ("net_amount_deposited", "Q"),
+    ("period", "Q"),
+    ("amount_per_period", "Q"),
+    ("cliff", "Q"),
+    ("cliff_amount", "Q"),
+    ("cancelable_by_sender", "B"),
+    ("cancelable_by_recipient", "B"),
+    ("automatic_withdrawal", "B"),
+    ("transferable_by_sender", "B"),
+    ("transferable_by_recipient", "B"),
+    ("can_topup", "B"),
+    ("name", "64s"),
+    ("withdrawal_frequency", "Q"),
+    ("ghost", "I"),
+    ("pausable", "B"),
+    ("can_update_rate", "B"),
+    ("padding", "130s"),
+    ("closed", "B"),
+    ("current_pause_start", "Q"),
+    ("pause_cumulative", "Q"),
+    ("last_rate_change_time", "Q"),
+    ("funds_unlocked_at_last_rate_change", "Q"),
+)
+CONTRACT_PUBKEY_FIELDS = frozenset(
+    {
+        "sender",
+        "sender_tokens",
+        "recipient",
+        "recipient_tokens",
+        "mint",
+        "escrow_tokens",
+        "streamflow_treasury",
+        "streamflow_treasury_tokens",
+        "partner",
+        "partner_tokens",
+    }
+)
+CONTRACT_STRUCT = struct.Struct("<" + "".join(fmt for _, fmt in CONTRACT_LAYOUT))
+CONTRACT_OFFSETS: dict[str, int] = {
+    name: struct.calcsize("<" + "".join(fmt for _, fmt in CONTRACT_LAYOUT[:i]))
+    for i, (name, _) in enumerate(CONTRACT_LAYOUT)
+}
+CONTRACT_SIZE = CONTRACT_STRUCT.size
+
+
+class _LazyField:
+    """Decodes a single field on first access and caches it on the instance."""
+
+    def __init__(self, name: str, fmt: str):
+        self.name = name
+        self.offset = CONTRACT_OFFSETS[name]
+        self.unpack_from = struct.Struct("<" + fmt).unpack_from
+        self.pubkey = name in CONTRACT_PUBKEY_FIELDS
+
+    def __get__(self, instance: "ContractView | None", owner: type) -> Any:
+        if instance is None:
+            return self
+        value = self.unpack_from(instance.buffer, self.offset)[0]
+        if self.pubkey:
+            value = Pubkey(value)
+        instance.__dict__[self.name] = value
+        return value
+
+
+class ContractView:
+    """Zero-copy view over `Contract` account data.
+
+    Fields are read with precompiled `struct` formats at fixed offsets only when accessed, pubkey fields are returned
+    as `Pubkey` and fixed byte arrays (`name`, `padding`) as `bytes`.
+    """
+
+    def __init__(self, buffer: bytes | memoryview):
+        if len(buffer) < CONTRACT_SIZE:
+            raise ValueError(f"Contract data is {len(buffer)} bytes, expected at least {CONTRACT_SIZE}")
+        self.buffer = buffer
+
+    @classmethod
+    def from_bytes(cls, data: bytes | memoryview) -> "ContractView":
+        return cls(data)
+
+    def unpack(self) -> dict[str, Any]:
+        values = CONTRACT_STRUCT.unpack_from(self.buffer)
+        return {
+            name: Pubkey(value) if name in CONTRACT_PUBKEY_FIELDS else value
+            for (name, _), value in zip(CONTRACT_LAYOUT, values, strict=True)
+        }
+
+    def __repr__(self) -> str:
+        return f"ContractView(mint={self.mint}, sender={self.sender}, closed={self.closed})"
+
+    if TYPE_CHECKING:
+
+        def __getattr__(self, name: str) -> Any:
+            ...
+
+
+for _name, _fmt in CONTRACT_LAYOUT:
+    setattr(ContractView, _name, _LazyField(_name, _fmt))
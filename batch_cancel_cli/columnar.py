@@ -0,0 +1,53 @@
+"""Column-oriented decoding of Contract accounts, requires the optional `numpy` extra."""
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+from solders.pubkey import Pubkey
+
+from batch_cancel_cli.client.structures import CONTRACT_LAYOUT, CONTRACT_SIZE
+
+_NUMPY_FORMATS = {"Q": "<u8", "I": "<u4", "B": "u1", "f": "<f4"}
+
+
+def _field_dtype(fmt: str) -> str | tuple[str, tuple[int]]:
+    if fmt.endswith("s"):
+        return "u1", (int(fmt[:-1]),)
+    return _NUMPY_FORMATS[fmt]
+
+
+# Packed (unaligned) structured dtype mirroring `client.structures.Contract` byte for byte
+CONTRACT_DTYPE = np.dtype([(name, _field_dtype(fmt)) for name, fmt in CONTRACT_LAYOUT])
+assert CONTRACT_DTYPE.itemsize == CONTRACT_SIZE
+
+
+@dataclass
+class ContractBatch:
+    ids: list[Pubkey]
+    records: np.ndarray
+    exists: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.records[field]
+
+    @classmethod
+    def concatenate(cls, batches: Sequence["ContractBatch"]) -> "ContractBatch":
+        if not batches:
+            return cls([], np.empty(0, dtype=CONTRACT_DTYPE), np.empty(0, dtype=bool))
+        return cls(
+            [contract_id for batch in batches for contract_id in batch.ids],
+            np.concatenate([batch.records for batch in batches]),
+            np.concatenate([batch.exists for batch in batches]),
+        )
+
+
+def decode_contracts(contract_ids: Sequence[Pubkey], datas: Sequence[bytes | None]) -> ContractBatch:
+    # missing or short accounts are zero-filled and flagged in `exists`, everything else decodes in one frombuffer
+    empty = bytes(CONTRACT_SIZE)
+    rows = [data[:CONTRACT_SIZE] if data is not None and len(data) >= CONTRACT_SIZE else None for data in datas]
+    exists = np.fromiter((row is not None for row in rows), dtype=np.bool_, count=len(rows))
+    buffer = b"".join(row or empty for row in rows)
+    return ContractBatch(list(contract_ids), np.frombuffer(buffer, dtype=CONTRACT_DTYPE), exists)
@@ -0,0 +1,61 @@
+import asyncio
+import math
+import threading
+from typing import Callable, Hashable
+
+from solana.transaction import Transaction
+from solders.transaction import VersionedTransaction
+
+from batch_cancel_cli.packing import MAX_COMPUTE_UNIT_LIMIT
+
+# Limits are rounded up to this many units, so tiny differences between runs don't show up in the transactions
+ROUND_TO = 1_000
+
+
+class ComputeUnitProfiler:
+    """Sizes `SetComputeUnitLimit` from one simulation per transaction shape.
+
+    The first transaction of a shape, e.g. `("transfer+cancel", 4, False)` for four packed pairs in a legacy tx, is
+    simulated with the maximum limit; the units it consumed plus `margin` become the limit of every later transaction of
+    that shape. Shapes whose simulation fails are simulated again next time, callers keep their fixed budget meanwhile.
+    """
+
+    def __init__(self, simulate: Callable[[Transaction | VersionedTransaction], int | None], margin: float = 0.2):
+        self.simulate = simulate
+        self.margin = margin
+        self.hits = 0
+        self.simulations = 0
+        self._limits: dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+
+    def _hit(self, shape: Hashable) -> int | None:
+        with self._lock:
+            if (limit := self._limits.get(shape)) is not None:
+                self.hits += 1
+            return limit
+
+    def _profile(self, shape: Hashable, build: Callable[[int], Transaction | VersionedTransaction]) -> int | None:
+        # only one thread simulates, the rest wait and reuse its result
+        with self._profile_lock:
+            if (limit := self._hit(shape)) is not None:
+                return limit
+            self.simulations += 1
+            units = self.simulate(build(MAX_COMPUTE_UNIT_LIMIT))
+            if units is None:
+                return None
+            limit = min(math.ceil(units * (1 + self.margin) / ROUND_TO) * ROUND_TO, MAX_COMPUTE_UNIT_LIMIT)
+            with self._lock:
+                self._limits[shape] = limit
+            return limit
+
+    def limit(self, shape: Hashable, build: Callable[[int], Transaction | VersionedTransaction]) -> int | None:
+        return self._hit(shape) or self._profile(shape, build)
+
+    async def limit_async(
+        self, shape: Hashable, build: Callable[[int], Transaction | VersionedTransaction]
+    ) -> int | None:
+        return self._hit(shape) or await asyncio.to_thread(self._profile, shape, build)
+
+    def stats(self) -> dict[str, int]:
+        return {"shapes": len(self._limits), "simulations": self.simulations, "hits": self.hits}
@@ -0,0 +1,186 @@
+import threading
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Callable, Sequence
+
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+from solders.transaction_status import TransactionConfirmationStatus, TransactionStatus
+
+MAX_SIGNATURE_STATUSES = 256
+
+COMMITMENT_LEVELS = {
+    "processed": 0,
+    "confirmed": 1,
+    "finalized": 2,
+}
+# solders statuses are not hashable, their position here is their level
+_STATUS_LEVELS = (
+    TransactionConfirmationStatus.Processed,
+    TransactionConfirmationStatus.Confirmed,
+    TransactionConfirmationStatus.Finalized,
+)
+
+
+class Outcome(StrEnum):
+    CONFIRMED = "confirmed"
+    FAILED = "failed"
+    EXPIRED = "expired"
+    # given up on, the node could not be reached to tell
+    UNKNOWN = "unknown"
+
+
+def reached_commitment(status: TransactionStatus, commitment: str) -> bool:
+    if status.confirmation_status is None:
+        # nodes omit the status once a transaction is rooted
+        return status.confirmations is None
+    return _STATUS_LEVELS.index(status.confirmation_status) >= COMMITMENT_LEVELS[commitment]
+
+
+@dataclass(frozen=True)
+class PendingTransaction:
+    signature: Signature
+    contract_ids: tuple[Pubkey, ...]
+    last_valid_block_height: int
+
+
+class ConfirmationTracker:
+    """Collects sent signatures and resolves them with batched getSignatureStatuses polls.
+
+    A transaction is confirmed or failed once its status reaches `commitment`, and expired once the block height has
+    passed the `lastValidBlockHeight` of its blockhash without the signature being seen. Signatures `watch`ed by a
+    subscription are left out of the polls until they expire, `resolve` settles them from the notification instead.
+    `wait` gives up after `max_failures` polls in a row fail and settles whatever is left as unknown.
+    """
+
+    def __init__(
+        self,
+        get_statuses: Callable[[Sequence[Signature]], list[TransactionStatus | None]],
+        get_block_height: Callable[[], int],
+        on_result: Callable[[PendingTransaction, Outcome, str | None], None],
+        commitment: str = "confirmed",
+        poll_interval: float = 2.0,
+        max_failures: int = 10,
+    ):
+        self.get_statuses = get_statuses
+        self.get_block_height = get_block_height
+        self.on_result = on_result
+        self.commitment = commitment
+        self.poll_interval = poll_interval
+        self.max_failures = max_failures
+        self.counts = {outcome: 0 for outcome in Outcome}
+        self.on_add: Callable[[PendingTransaction], None] | None = None
+        self.on_resolve: Callable[[PendingTransaction], None] | None = None
+        self._pending: dict[Signature, PendingTransaction] = {}
+        self._watched: dict[Signature, int] = {}
+        self._idle = threading.Event()
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, signature: Signature, contract_ids: Sequence[Pubkey], last_valid_block_height: int) -> None:
+        pending = PendingTransaction(signature, tuple(contract_ids), last_valid_block_height)
+        with self._lock:
+            self._pending[signature] = pending
+            self._idle.clear()
+        if self.on_add:
+            self.on_add(pending)
+
+    def pending(self) -> list[PendingTransaction]:
+        with self._lock:
+            return list(self._pending.values())
+
+    def is_pending(self, signature: Signature) -> bool:
+        return signature in self._pending
+
+    def watch(self, signature: Signature) -> bool:
+        # checked under the lock `_resolve` drops the watch with, a settled signature is never watched again
+        with self._lock:
+            if signature not in self._pending:
+                return False
+            self._watched[signature] = self._watched.get(signature, 0) + 1
+            return True
+
+    def unwatch(self, signature: Signature) -> None:
+        with self._lock:
+            if (count := self._watched.pop(signature, 0) - 1) > 0:
+                self._watched[signature] = count
+
+    def resolve(self, signature: Signature, error: str | None) -> None:
+        if (pending := self._pending.get(signature)) is not None:
+            self._resolve(pending, Outcome.FAILED if error else Outcome.CONFIRMED, error)
+
+    def _resolve(self, pending: PendingTransaction, outcome: Outcome, error: str | None = None) -> None:
+        with self._lock:
+            if self._pending.pop(pending.signature, None) is None:
+                return
+            self._watched.pop(pending.signature, None)
+            self.counts[outcome] += 1
+            if not self._pending:
+                self._idle.set()
+        self.on_result(pending, outcome, error)
+        if self.on_resolve:
+            self.on_resolve(pending)
+
+    def poll(self) -> None:
+        with self._poll_lock:
+            if not self._pending:
+                return
+            # read the height first, so a signature missing from the statuses below really missed its window
+            block_height = self.get_block_height()
+            with self._lock:
+                pending = [
+                    p
+                    for p in self._pending.values()
+                    if p.signature not in self._watched or block_height > p.last_valid_block_height
+                ]
+            if not pending:
+                return
+            statuses = self.get_statuses([p.signature for p in pending])
+            for p, status in zip(pending, statuses, strict=True):
+                if status is None:
+                    if block_height > p.last_valid_block_height:
+                        self._resolve(p, Outcome.EXPIRED)
+                    continue
+                if not reached_commitment(status, self.commitment):
+                    continue
+                if status.err:
+                    self._resolve(p, Outcome.FAILED, str(status.err))
+                else:
+                    self._resolve(p, Outcome.CONFIRMED)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception:
+                # transient RPC errors only delay the next poll
+                continue
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="confirmation-tracker", daemon=True)
+            self._thread.start()
+
+    def wait(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        failures = 0
+        while self._pending:
+            try:
+                self.poll()
+                failures = 0
+            except Exception:
+                # the expiry check needs the block height too, a node that stays down would be waited on forever
+                failures += 1
+                if failures >= self.max_failures:
+                    for pending in self.pending():
+                        self._resolve(pending, Outcome.UNKNOWN)
+                    return
+            # subscriptions can settle the rest before the next poll is due
+            self._idle.wait(self.poll_interval)
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Sequence
+
+from solders.pubkey import Pubkey
+
+# getRecentPrioritizationFees accepts at most this many accounts
+MAX_FEE_ACCOUNTS = 128
+# Every retry multiplies the price, starting from at least MIN_RETRY_PRICE when recent fees were zero
+RETRY_MULTIPLIER = 2.0
+MIN_RETRY_PRICE = 1_000
+
+
+@dataclass(frozen=True)
+class GetRecentPrioritizationFees:
+    # solders has no request type for this method yet, providers only need `to_json` and `id`
+    accounts: tuple[Pubkey, ...]
+    id: int = 0
+
+    def to_json(self) -> str:
+        params = [[str(account) for account in self.accounts]]
+        return json.dumps({"jsonrpc": "2.0", "id": self.id, "method": "getRecentPrioritizationFees", "params": params})
+
+
+def percentile(values: Sequence[int], q: float) -> int:
+    # nearest-rank percentile, always one of the observed fees
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+class PriorityFeePolicy:
+    """Compute unit prices, in micro-lamports, from the recent prioritization fees of the accounts a tx writes.
+
+    The `percentile` of the fees paid in recent slots is cached per account set for `ttl` seconds and shared by sync
+    and async runners. Retries of the same transaction pay more, prices never exceed `max_price`. When the fees can't
+    be fetched, the last price known for the account set is used, or the latest one fetched for any set, or nothing.
+    """
+
+    def __init__(
+        self,
+        fetch_fees: Callable[[Sequence[Pubkey]], list[int]],
+        percentile: float = 75.0,
+        max_price: int = 100_000,
+        ttl: float = 10.0,
+    ):
+        self.fetch_fees = fetch_fees
+        self.percentile = percentile
+        self.max_price = max_price
+        self.ttl = ttl
+        self.fetches = 0
+        self.failures = 0
+        self.highest = 0
+        self._latest = 0
+        self._prices: dict[frozenset[Pubkey], tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+    def _cached(self, key: frozenset[Pubkey]) -> int | None:
+        with self._lock:
+            cached = self._prices.get(key)
+        if cached is None or time.monotonic() - cached[1] >= self.ttl:
+            return None
+        return cached[0]
+
+    def _fetch(self, key: frozenset[Pubkey]) -> int:
+        # only one thread talks to the RPC, the rest wait and reuse its result
+        with self._fetch_lock:
+            if (price := self._cached(key)) is not None:
+                return price
+            try:
+                price = percentile(self.fetch_fees(list(key)[:MAX_FEE_ACCOUNTS]), self.percentile)
+            except Exception:
+                # the price is advisory, a failed lookup must not fail the transaction; the fallback is cached for
+                # `ttl` as well, so an unreachable RPC isn't asked again for every transaction
+                with self._lock:
+                    stale = self._prices.get(key)
+                    price = stale[0] if stale is not None else self._latest
+                    self._prices[key] = (price, time.monotonic())
+                    self.failures += 1
+                return price
+            with self._lock:
+                self._prices[key] = (price, time.monotonic())
+                self._latest = price
+                self.fetches += 1
+        return price
+
+    def _escalate(self, price: int, attempt: int) -> int:
+        if attempt > 1:
+            price = int(max(price, MIN_RETRY_PRICE) * RETRY_MULTIPLIER ** (attempt - 1))
+        price = min(price, self.max_price)
+        self.highest = max(self.highest, price)
+        return price
+
+    def price(self, accounts: Sequence[Pubkey], attempt: int = 1) -> int:
+        key = frozenset(accounts)
+        base = self._cached(key)
+        return self._escalate(self._fetch(key) if base is None else base, attempt)
+
+    async def price_async(self, accounts: Sequence[Pubkey], attempt: int = 1) -> int:
+        key = frozenset(accounts)
+        base = self._cached(key)
+        return self._escalate(await asyncio.to_thread(self._fetch, key) if base is None else base, attempt)
+
+    def stats(self) -> dict[str, int]:
+        return {"fetches": self.fetches, "failures": self.failures, "highest": self.highest}
@@ -0,0 +1,111 @@
+import os
+import threading
+from dataclasses import dataclass
+from enum import StrEnum
+from pathlib import Path
+
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+
+
+class State(StrEnum):
+    FETCHED = "fetched"
+    SKIPPED = "skipped"
+    SENT = "sent"
+    CONFIRMED = "confirmed"
+    FAILED = "failed"
+    EXPIRED = "expired"
+
+
+# Contracts in these states are not fetched or sent again on resume
+FINISHED_STATES = frozenset({State.SKIPPED, State.CONFIRMED})
+
+
+@dataclass(frozen=True)
+class JournalEntry:
+    state: State
+    signature: Signature | None = None
+    error: str | None = None
+
+
+class Journal:
+    """Append-only, tab separated log of per-contract cancel progress.
+
+    Writes are buffered and fsynced by a background thread every `flush_interval` seconds, or as soon as `flush_every`
+    records are pending, so a crash loses at most that window even while the run waits on something else; the last
+    state recorded for a contract wins on load.
+    """
+
+    def __init__(self, path: Path, flush_every: int = 256, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="journal-flush", daemon=True)
+        self._thread.start()
+
+    def record(
+        self, contract_id: Pubkey, state: State, signature: Signature | None = None, error: str | None = None
+    ) -> None:
+        error = " ".join(error.split()) if error else ""
+        line = f"{state}\t{contract_id}\t{signature or ''}\t{error}\n"
+        with self._lock:
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._lock:
+                if not self._pending:
+                    continue
+                self._file.flush()
+                self._pending = 0
+            # outside the lock, so records keep going to the buffer while the disk catches up
+            os.fsync(self._file.fileno())
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def sync(self) -> None:
+        with self._lock:
+            self._sync()
+
+    def close(self) -> None:
+        # the flusher is stopped first, it fsyncs the file without holding the lock
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    @staticmethod
+    def load(path: Path) -> dict[Pubkey, JournalEntry]:
+        entries: dict[Pubkey, JournalEntry] = {}
+        if not path.exists():
+            return entries
+        with open(path, encoding="utf-8") as r:
+            for line in r:
+                # a torn last line from a crash mid-write is ignored
+                if not line.endswith("\n"):
+                    break
+                try:
+                    state, contract_id, signature, error = line.rstrip("\n").split("\t", 3)
+                    entries[Pubkey.from_string(contract_id)] = JournalEntry(
+                        State(state), Signature.from_string(signature) if signature else None, error or None
+                    )
+                except ValueError:
+                    continue
+        return entries
@@ -0,0 +1,56 @@
+import struct
+from typing import Sequence
+
+from solders.address_lookup_table_account import AddressLookupTableAccount
+from solders.instruction import AccountMeta, Instruction
+from solders.pubkey import Pubkey
+from solders.system_program import ID as SYS_PROGRAM_ID
+
+ADDRESS_LOOKUP_TABLE_PROGRAM_ID = Pubkey.from_string("AddressLookupTab1e1111111111111111111111111")
+LOOKUP_TABLE_META_SIZE = 56
+MAX_ADDRESSES_PER_EXTEND = 20
+
+_CREATE_LOOKUP_TABLE = 0
+_EXTEND_LOOKUP_TABLE = 2
+_DEACTIVATION_SLOT = struct.Struct("<Q")
+_ACTIVE_DEACTIVATION_SLOT = 2**64 - 1
+
+
+def derive_lookup_table_address(authority: Pubkey, recent_slot: int) -> tuple[Pubkey, int]:
+    return Pubkey.find_program_address(
+        [bytes(authority), recent_slot.to_bytes(8, "little")], ADDRESS_LOOKUP_TABLE_PROGRAM_ID
+    )
+
+
+def _table_accounts(lookup_table: Pubkey, authority: Pubkey, payer: Pubkey) -> list[AccountMeta]:
+    return [
+        AccountMeta(pubkey=lookup_table, is_signer=False, is_writable=True),
+        AccountMeta(pubkey=authority, is_signer=True, is_writable=False),
+        AccountMeta(pubkey=payer, is_signer=True, is_writable=True),
+        AccountMeta(pubkey=SYS_PROGRAM_ID, is_signer=False, is_writable=False),
+    ]
+
+
+def create_lookup_table(authority: Pubkey, payer: Pubkey, recent_slot: int) -> tuple[Instruction, Pubkey]:
+    lookup_table, bump = derive_lookup_table_address(authority, recent_slot)
+    data = struct.pack("<IQB", _CREATE_LOOKUP_TABLE, recent_slot, bump)
+    return (
+        Instruction(ADDRESS_LOOKUP_TABLE_PROGRAM_ID, data, _table_accounts(lookup_table, authority, payer)),
+        lookup_table,
+    )
+
+
+def extend_lookup_table(
+    lookup_table: Pubkey, authority: Pubkey, payer: Pubkey, addresses: Sequence[Pubkey]
+) -> Instruction:
+    data = struct.pack("<IQ", _EXTEND_LOOKUP_TABLE, len(addresses)) + b"".join(bytes(a) for a in addresses)
+    return Instruction(ADDRESS_LOOKUP_TABLE_PROGRAM_ID, data, _table_accounts(lookup_table, authority, payer))
+
+
+def decode_lookup_table(key: Pubkey, data: bytes) -> AddressLookupTableAccount:
+    (deactivation_slot,) = _DEACTIVATION_SLOT.unpack_from(data, 4)
+    if deactivation_slot != _ACTIVE_DEACTIVATION_SLOT:
+        raise ValueError(f"Lookup table {key} is deactivated")
+    raw = data[LOOKUP_TABLE_META_SIZE:]
+    addresses = [Pubkey(raw[i : i + 32]) for i in range(0, len(raw) - len(raw) % 32, 32)]
+    return AddressLookupTableAccount(key, addresses)
@@ -0,0 +1,162 @@
+import bisect
+import json
+import math
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from batch_cancel_cli.profiling import StageProfiler
+
+# Histogram bucket upper bounds in seconds, 10us growing by sqrt(2) up to ~2 minutes
+BUCKETS = tuple(0.00001 * 2 ** (i / 2) for i in range(48))
+PERCENTILES = (50, 95, 99)
+# Stages the runners time, see `Metrics.stage`
+STAGES = ("fetch", "blockhash", "fees", "build", "sign", "simulate", "send", "statuses")
+
+
+class Histogram:
+    """Latency histogram with fixed exponential buckets, percentiles are interpolated within a bucket."""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                # the observed extremes narrow down the first and last buckets
+                lower = max(BUCKETS[i - 1] if i else 0.0, self.min)
+                upper = min(BUCKETS[i] if i < len(BUCKETS) else self.max, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+
+class Series:
+    # one stage or RPC method: its latencies, errors by type and the bytes it received
+    def __init__(self) -> None:
+        self.latency = Histogram()
+        self.errors: Counter[str] = Counter()
+        self.received = 0
+
+    def summary(self) -> dict[str, Any]:
+        latency = self.latency
+        summary: dict[str, Any] = {"calls": latency.count, "errors": dict(self.errors)}
+        summary["total_s"] = round(latency.total, 6)
+        summary |= {f"p{q}_ms": round(latency.percentile(q) * 1000, 3) for q in PERCENTILES}
+        summary["max_ms"] = round(latency.max * 1000, 3)
+        return summary
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> None:
+        if (profiler := self.metrics.profiler) is not None and self.name in profiler.stages:
+            profiler.enter(self.name, sys._getframe(1))
+        self.started = time.perf_counter()
+
+    def __exit__(self, exc_type: type[BaseException] | None, *_: Any) -> None:
+        self.metrics.observe_stage(self.name, time.perf_counter() - self.started, exc_type)
+        if (profiler := self.metrics.profiler) is not None and self.name in profiler.stages:
+            profiler.exit(self.name, sys._getframe(1))
+
+
+class Metrics:
+    """Latency histograms and counters per stage (fetch, blockhash, build, sign, send, ...) and per RPC method.
+
+    Shared by sync and async runners through their `RpcPool`. `summary()` is the machine-readable report of a run,
+    `write_prometheus` writes the same numbers in the Prometheus text format. A `profiler` is told about every stage
+    it selected as it is entered and exited.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.stages: dict[str, Series] = {}
+        self.rpc: dict[str, Series] = {}
+        self.profiler: "StageProfiler | None" = None
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def observe_stage(self, name: str, seconds: float, error: type[BaseException] | None = None) -> None:
+        with self._lock:
+            if (series := self.stages.get(name)) is None:
+                series = self.stages[name] = Series()
+            series.latency.observe(seconds)
+            if error is not None:
+                series.errors[error.__name__] += 1
+
+    def observe_rpc(self, method: str, seconds: float, received: int, error: str | None = None) -> None:
+        with self._lock:
+            if (series := self.rpc.get(method)) is None:
+                series = self.rpc[method] = Series()
+            series.latency.observe(seconds)
+            series.received += received
+            if error is not None:
+                series.errors[error] += 1
+
+    def summary(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "elapsed_s": round(time.monotonic() - self.started, 3),
+                "stages": {name: series.summary() for name, series in self.stages.items()},
+                "rpc": {
+                    method: series.summary() | {"bytes_received": series.received}
+                    for method, series in self.rpc.items()
+                },
+            }
+
+    def write_json(self, path: Path, extra: dict[str, Any] | None = None) -> None:
+        with open(path, "w") as w:
+            json.dump(self.summary() | (extra or {}), w, indent=2)
+            w.write("\n")
+
+    def write_prometheus(self, path: Path, prefix: str = "batch_cancel") -> None:
+        lines: list[str] = []
+        with self._lock:
+            for kind, label, series in (("stage", "stage", self.stages), ("rpc", "method", self.rpc)):
+                name = f"{prefix}_{kind}_seconds"
+                lines += [f"# HELP {name} Latency per {label}", f"# TYPE {name} histogram"]
+                for value, s in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip((*BUCKETS, math.inf), s.latency.counts, strict=True):
+                        cumulative += count
+                        le = "+Inf" if math.isinf(bound) else f"{bound:g}"
+                        lines.append(f'{name}_bucket{{{label}="{value}",le="{le}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label}="{value}"}} {s.latency.total}')
+                    lines.append(f'{name}_count{{{label}="{value}"}} {s.latency.count}')
+                name = f"{prefix}_{kind}_errors_total"
+                lines += [f"# HELP {name} Errors per {label} and type", f"# TYPE {name} counter"]
+                for value, s in sorted(series.items()):
+                    lines += [
+                        f'{name}{{{label}="{value}",type="{error}"}} {count}'
+                        for error, count in sorted(s.errors.items())
+                    ]
+            name = f"{prefix}_rpc_received_bytes_total"
+            lines += [f"# HELP {name} Response bytes per method", f"# TYPE {name} counter"]
+            lines += [f'{name}{{method="{method}"}} {s.received}' for method, s in sorted(self.rpc.items())]
+        path.write_text("\n".join(lines) + "\n")
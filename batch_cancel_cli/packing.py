@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from typing import Callable, Hashable, Iterable, Iterator, Sequence, TypeVar
+
+from solders.address_lookup_table_account import AddressLookupTableAccount
+from solders.hash import Hash
+from solders.instruction import Instruction
+from solders.message import Message, MessageV0, to_bytes_versioned
+from solders.pubkey import Pubkey
+
+PACKET_DATA_SIZE = 1232
+MAX_TX_ACCOUNT_LOCKS = 64
+MAX_COMPUTE_UNIT_LIMIT = 1_400_000
+# Compute units requested for one transfer + cancel pair when they aren't simulated
+COMPUTE_UNITS_PER_PAIR = 320_000
+SIGNATURE_SIZE = 64
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class TxMeasure:
+    size: int
+    accounts: int
+
+    def fits(self) -> bool:
+        return self.size <= PACKET_DATA_SIZE and self.accounts <= MAX_TX_ACCOUNT_LOCKS
+
+
+def short_vec_len(n: int) -> int:
+    size = 1
+    while n >= 0x80:
+        n >>= 7
+        size += 1
+    return size
+
+
+def measure_legacy_tx(payer: Pubkey, ixs: Sequence[Instruction]) -> TxMeasure:
+    message = Message.new_with_blockhash(ixs, payer, Hash.default())
+    signatures = message.header.num_required_signatures
+    size = short_vec_len(signatures) + signatures * SIGNATURE_SIZE + len(bytes(message))
+    return TxMeasure(size, len(message.account_keys))
+
+
+def measure_v0_tx(
+    payer: Pubkey, ixs: Sequence[Instruction], lookup_tables: Sequence[AddressLookupTableAccount]
+) -> TxMeasure:
+    message = MessageV0.try_compile(payer, ixs, lookup_tables, Hash.default())
+    signatures = message.header.num_required_signatures
+    size = short_vec_len(signatures) + signatures * SIGNATURE_SIZE + len(to_bytes_versioned(message))
+    loaded = sum(
+        len(lookup.writable_indexes) + len(lookup.readonly_indexes) for lookup in message.address_table_lookups
+    )
+    return TxMeasure(size, len(message.account_keys) + loaded)
+
+
+def pack(
+    items: Iterable[T],
+    build: Callable[[T], Sequence[Instruction]],
+    measure: Callable[[Sequence[Instruction], int], TxMeasure],
+    compute_units_per_item: int,
+    key: Callable[[T], Hashable],
+    max_items: int | None = None,
+) -> Iterator[list[T]]:
+    """Greedily group `items` into batches whose instructions fit into a single transaction.
+
+    `measure` receives the candidate instructions and the number of items in the batch and must return the exact
+    serialized size of the resulting transaction. An item whose instructions do not fit even on their own is still
+    yielded as a batch of one, so the send stage reports the error for it.
+    """
+    max_by_compute = max(MAX_COMPUTE_UNIT_LIMIT // compute_units_per_item, 1)
+    max_items = min(max_items or max_by_compute, max_by_compute)
+    batch: list[T] = []
+    batch_ixs: list[Instruction] = []
+    keys: set[Hashable] = set()
+    for item in items:
+        ixs = build(item)
+        item_key = key(item)
+        if batch and (
+            len(batch) >= max_items or item_key in keys or not measure([*batch_ixs, *ixs], len(batch) + 1).fits()
+        ):
+            yield batch
+            batch, batch_ixs, keys = [], [], set()
+        batch.append(item)
+        batch_ixs.extend(ixs)
+        keys.add(item_key)
+    if batch:
+        yield batch
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Sequence
+
+from solders.pubkey import Pubkey
+from spl.token.constants import ASSOCIATED_TOKEN_PROGRAM_ID, TOKEN_PROGRAM_ID
+
+_Key = tuple[bytes, tuple[bytes, ...]]
+
+# Limits of the runtime's program address derivation, the bump seed counts towards MAX_SEEDS
+MAX_SEEDS = 16
+MAX_SEED_LEN = 32
+
+
+def create_program_address(seeds: Sequence[bytes], bump: int, program_id: Pubkey) -> Pubkey | None:
+    # `Pubkey.create_program_address` panics, not raises, on seeds it cannot derive from, so a tampered file would
+    # take the run down; the same derivation here returns None instead
+    if len(seeds) >= MAX_SEEDS or any(len(seed) > MAX_SEED_LEN for seed in seeds):
+        return None
+    digest = hashlib.sha256(b"".join(seeds) + bytes([bump]) + bytes(program_id) + b"ProgramDerivedAddress").digest()
+    address = Pubkey(digest)
+    return None if address.is_on_curve() else address
+
+
+class PdaCache:
+    """Bounded LRU cache for program derived addresses, ATAs included.
+
+    Entries keep the bump seed, so a persisted cache is re-checked on load with a single `create_program_address`
+    instead of trusting the file or repeating the bump search; entries that don't check out are dropped.
+    """
+
+    def __init__(self, maxsize: int = 65536):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[_Key, tuple[Pubkey, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _put(self, key: _Key, value: tuple[Pubkey, int]) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def find_program_address(self, seeds: Sequence[bytes], program_id: Pubkey) -> tuple[Pubkey, int]:
+        key = (bytes(program_id), tuple(seeds))
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        value = Pubkey.find_program_address(list(seeds), program_id)
+        with self._lock:
+            self.misses += 1
+            self._put(key, value)
+        return value
+
+    def derive_ata(self, owner: Pubkey, mint: Pubkey, token_program: Pubkey = TOKEN_PROGRAM_ID) -> Pubkey:
+        return self.find_program_address(
+            [bytes(owner), bytes(token_program), bytes(mint)], ASSOCIATED_TOKEN_PROGRAM_ID
+        )[0]
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self)}
+
+    def load(self, path: Path) -> int:
+        if not path.exists():
+            return 0
+        with open(path) as r:
+            entries = json.load(r)
+        loaded = 0
+        with self._lock:
+            for entry in entries:
+                try:
+                    program_id = Pubkey.from_string(entry["program"])
+                    seeds = tuple(bytes.fromhex(seed) for seed in entry["seeds"])
+                    address, bump = Pubkey.from_string(entry["address"]), entry["bump"]
+                    if create_program_address(seeds, bump, program_id) != address:
+                        continue
+                except (KeyError, TypeError, ValueError):
+                    continue
+                self._put((bytes(program_id), seeds), (address, bump))
+                loaded += 1
+        return loaded
+
+    def save(self, path: Path) -> None:
+        with self._lock:
+            entries = [
+                {
+                    "program": str(Pubkey(program_id)),
+                    "seeds": [seed.hex() for seed in seeds],
+                    "address": str(address),
+                    "bump": bump,
+                }
+                for (program_id, seeds), (address, bump) in self._entries.items()
+            ]
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w") as w:
+            json.dump(entries, w)
+        os.replace(tmp, path)
@@ -0,0 +1,376 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import cached_property
+from typing import Any, Callable, Sequence
+
+import httpx
+from solana.rpc.providers.async_http import AsyncHTTPProvider
+from solana.rpc.providers.core import _after_request_unparsed
+from solana.rpc.providers.http import HTTPProvider
+from solders.rpc.requests import Body, GetMultipleAccounts, SendRawTransaction
+
+from batch_cancel_cli.metrics import Metrics
+from batch_cancel_cli.ratelimit import RateLimiter, TokenBucket, parse_retry_after
+
+# Weight of the newest sample in the latency and error rate moving averages
+EWMA_ALPHA = 0.2
+# Seconds for the weight of older samples to halve while an endpoint gets no requests
+EWMA_HALF_LIFE = 10.0
+# A failed request counts as taking at least this long, so endpoints that fail fast don't rank as fast ones
+FAILURE_LATENCY = 1.0
+# Score multiplier per unit of error rate, an endpoint failing half its requests ranks like one 6x slower
+ERROR_PENALTY = 10.0
+# Seconds after which an endpoint that got no requests is given one read, so a recovered endpoint can win its place back
+REPROBE_AFTER = 30.0
+MAX_THROTTLE_RETRIES = 5
+
+
+class Endpoint:
+    def __init__(self, url: str, limiter: RateLimiter):
+        self.url = url
+        self.limiter = limiter
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self._observed_at = self._probed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed: float, ok: bool) -> None:
+        with self._lock:
+            now = time.monotonic()
+            sample = elapsed if ok else max(elapsed, FAILURE_LATENCY)
+            keep = (1 - EWMA_ALPHA) * 0.5 ** ((now - self._observed_at) / EWMA_HALF_LIFE)
+            self.latency = sample if not self.requests else keep * self.latency + (1 - keep) * sample
+            self.error_rate = keep * self.error_rate + (1 - keep) * (not ok)
+            self.requests += 1
+            self.failures += not ok
+            self._observed_at = now
+
+    def score(self) -> float:
+        # untried endpoints score 0 so every endpoint gets probed once
+        return self.latency * (1 + ERROR_PENALTY * self.error_rate)
+
+    def probe_due(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if not self.requests or now - max(self._observed_at, self._probed_at) < REPROBE_AFTER:
+                return False
+            self._probed_at = now
+            return True
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "url": self.url,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ms": round(self.latency * 1000, 1),
+            "error_rate": round(self.error_rate, 3),
+        }
+
+
+class RpcPool:
+    """Set of RPC endpoints ranked by latency and error rate, each with its own rate limiter.
+
+    Reads go to the best ranked endpoint and fail over down the ranking; `getMultipleAccounts` calls still running after
+    `hedge_after` seconds are duplicated to the runner-up and the first answer wins. Transactions are sent to every
+    endpoint at once.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        limiter_factory: Callable[[], RateLimiter] = RateLimiter,
+        hedge_after: float | None = None,
+    ):
+        if not urls:
+            raise ValueError("At least one RPC endpoint is required")
+        self.endpoints = [Endpoint(url, limiter_factory()) for url in dict.fromkeys(urls)]
+        self.hedge_after = hedge_after
+        self.hedged = 0
+        self.metrics = Metrics()
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> str:
+        return self.endpoints[0].url
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=8 * len(self.endpoints), thread_name_prefix="rpc-pool")
+            return self._executor
+
+    def ranked(self) -> list[Endpoint]:
+        # an endpoint left alone for REPROBE_AFTER goes first for one read, a failed probe falls over to the next
+        best, *others = sorted(self.endpoints, key=Endpoint.score)
+        probes = [endpoint for endpoint in others if endpoint.probe_due()]
+        return [*probes, best, *(endpoint for endpoint in others if endpoint not in probes)]
+
+    def send_targets(self) -> list[Endpoint]:
+        # the best endpoint always gets the transaction, the others only when their send budget has room right away
+        best, *others = sorted(self.endpoints, key=Endpoint.score)
+        return [best, *(endpoint for endpoint in others if endpoint.limiter.sends.try_acquire())]
+
+    def hedges(self, body: Body) -> bool:
+        return self.hedge_after is not None and len(self.endpoints) > 1 and isinstance(body, GetMultipleAccounts)
+
+    def stats(self) -> dict[str, Any]:
+        limiters = [endpoint.limiter.stats() for endpoint in self.endpoints]
+        return {
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints],
+            "hedged": self.hedged,
+            "throttled": sum(limiter["throttled"] for limiter in limiters),
+            "waited": sum(limiter["waited"] for limiter in limiters),
+        }
+
+
+def _throttled(response: httpx.Response, bucket: TokenBucket) -> bool:
+    if response.status_code != httpx.codes.TOO_MANY_REQUESTS:
+        return False
+    bucket.throttle(parse_retry_after(response.headers.get("Retry-After")))
+    return True
+
+
+def _method(body: Body) -> str:
+    # GetMultipleAccounts -> getMultipleAccounts, both simulate bodies and SendRawTransaction have their own method name
+    name = type(body).__name__
+    if name.startswith("Simulate"):
+        return "simulateTransaction"
+    if name == "SendRawTransaction":
+        return "sendTransaction"
+    return name[0].lower() + name[1:]
+
+
+def _rpc_error_type(raw: str) -> str | None:
+    # JSON-RPC errors put "error" right after "jsonrpc" (and "id"), large results are only parsed when they don't
+    if '"error"' not in raw[:64]:
+        return None
+    try:
+        return f"rpc {json.loads(raw)['error']['code']}"
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _is_rpc_error(raw: str) -> bool:
+    try:
+        return "error" in json.loads(raw)
+    except ValueError:
+        return True
+
+
+def _retrieve_exception(task: "asyncio.Future[str]") -> None:
+    # losing hedges and fan-out copies are left running, their failures must not be logged as unretrieved
+    if not task.cancelled():
+        task.exception()
+
+
+class PooledHTTPProvider(HTTPProvider):
+    """HTTP provider that spreads requests over an `RpcPool` and passes each through the endpoint's rate limiter.
+
+    Extra copies of a request (hedges and fan-out sends) take their token up front and are not replayed when throttled,
+    so a saturated endpoint never holds up the others.
+    """
+
+    def __init__(self, pool: RpcPool, timeout: float = 10):
+        super().__init__(pool.primary, timeout=timeout)
+        self.pool = pool
+
+    @cached_property
+    def session(self) -> httpx.Client:
+        # one keep-alive session instead of a new client, TLS context included, per `httpx.post`; made on the first
+        # request, loading the certificates takes longer than the rest of the start-up and `-h` never sends one
+        return httpx.Client(timeout=self.timeout)
+
+    def _post(self, endpoint: Endpoint, bucket: TokenBucket, n: int, request_kwargs: dict, extra: bool = False) -> str:
+        request_kwargs = {**request_kwargs, "url": endpoint.url}
+        started = time.monotonic()
+        try:
+            for _ in range(1 if extra else MAX_THROTTLE_RETRIES):
+                if not extra:
+                    bucket.acquire(n)
+                raw_response = self.session.post(**request_kwargs)
+                if not _throttled(raw_response, bucket):
+                    break
+            raw = _after_request_unparsed(raw_response)
+        except httpx.HTTPError:
+            endpoint.observe(time.monotonic() - started, ok=False)
+            raise
+        endpoint.observe(time.monotonic() - started, ok=True)
+        return raw
+
+    def _failover(
+        self, endpoints: Sequence[Endpoint], n: int, request_kwargs: dict, error: BaseException | None
+    ) -> str:
+        for endpoint in endpoints:
+            try:
+                return self._post(endpoint, endpoint.limiter.reads, n, request_kwargs)
+            except httpx.HTTPError as e:
+                error = e
+        raise error  # type: ignore[misc]
+
+    def _hedged(self, ranked: list[Endpoint], request_kwargs: dict) -> str:
+        submit = self.pool.executor.submit
+        futures = [submit(self._post, ranked[0], ranked[0].limiter.reads, 1, request_kwargs)]
+        done, _ = wait(futures, timeout=self.pool.hedge_after)
+        if not done and ranked[1].limiter.reads.try_acquire():
+            self.pool.hedged += 1
+            futures.append(submit(self._post, ranked[1], ranked[1].limiter.reads, 1, request_kwargs, True))
+        error = None
+        pending: set[Future[str]] = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if (error := future.exception()) is None:
+                    return future.result()
+        return self._failover(ranked[len(futures) :], 1, request_kwargs, error)
+
+    def _fan_out(self, request_kwargs: dict) -> str:
+        # the first endpoint to accept the transaction wins, RPC errors only count when every endpoint returned one
+        best, *extras = self.pool.send_targets()
+        if not extras:
+            return self._post(best, best.limiter.sends, 1, request_kwargs)
+        submit = self.pool.executor.submit
+        futures = [submit(self._post, best, best.limiter.sends, 1, request_kwargs)]
+        futures += [
+            submit(self._post, endpoint, endpoint.limiter.sends, 1, request_kwargs, True) for endpoint in extras
+        ]
+        rejected: str | None = None
+        pending: set[Future[str]] = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    continue
+                if not _is_rpc_error(raw := future.result()):
+                    return raw
+                rejected = rejected or raw
+        if rejected is not None:
+            return rejected
+        raise futures[0].exception()  # type: ignore[misc]
+
+    def _request(self, body: Body) -> str:
+        request_kwargs = self._before_request(body=body)
+        if isinstance(body, SendRawTransaction):
+            return self._fan_out(request_kwargs)
+        ranked = self.pool.ranked()
+        if self.pool.hedges(body):
+            return self._hedged(ranked, request_kwargs)
+        return self._failover(ranked, 1, request_kwargs, None)
+
+    def make_request_unparsed(self, body: Body) -> str:
+        started = time.perf_counter()
+        try:
+            raw = self._request(body)
+        except Exception as e:
+            self.pool.metrics.observe_rpc(_method(body), time.perf_counter() - started, 0, type(e).__name__)
+            raise
+        self.pool.metrics.observe_rpc(_method(body), time.perf_counter() - started, len(raw), _rpc_error_type(raw))
+        return raw
+
+    def make_batch_request_unparsed(self, reqs: tuple[Body, ...]) -> str:
+        return self._failover(self.pool.ranked(), len(reqs), self._before_batch_request(reqs), None)
+
+
+class AsyncPooledHTTPProvider(AsyncHTTPProvider):
+    """Async counterpart of `PooledHTTPProvider`, sharing the same pool and rate limiters."""
+
+    def __init__(self, pool: RpcPool, timeout: float = 10):
+        super().__init__(pool.primary, timeout=timeout)
+        self.pool = pool
+
+    async def _post(
+        self, endpoint: Endpoint, bucket: TokenBucket, n: int, request_kwargs: dict, extra: bool = False
+    ) -> str:
+        request_kwargs = {**request_kwargs, "url": endpoint.url}
+        started = time.monotonic()
+        try:
+            for _ in range(1 if extra else MAX_THROTTLE_RETRIES):
+                if not extra:
+                    await bucket.acquire_async(n)
+                raw_response = await self.session.post(**request_kwargs)
+                if not _throttled(raw_response, bucket):
+                    break
+            raw = _after_request_unparsed(raw_response)
+        except httpx.HTTPError:
+            endpoint.observe(time.monotonic() - started, ok=False)
+            raise
+        endpoint.observe(time.monotonic() - started, ok=True)
+        return raw
+
+    def _spawn(self, endpoint: Endpoint, bucket: TokenBucket, request_kwargs: dict, extra: bool) -> "asyncio.Task[str]":
+        task = asyncio.ensure_future(self._post(endpoint, bucket, 1, request_kwargs, extra))
+        task.add_done_callback(_retrieve_exception)
+        return task
+
+    async def _failover(
+        self, endpoints: Sequence[Endpoint], n: int, request_kwargs: dict, error: BaseException | None
+    ) -> str:
+        for endpoint in endpoints:
+            try:
+                return await self._post(endpoint, endpoint.limiter.reads, n, request_kwargs)
+            except httpx.HTTPError as e:
+                error = e
+        raise error  # type: ignore[misc]
+
+    async def _hedged(self, ranked: list[Endpoint], request_kwargs: dict) -> str:
+        tasks = [self._spawn(ranked[0], ranked[0].limiter.reads, request_kwargs, False)]
+        done, _ = await asyncio.wait(tasks, timeout=self.pool.hedge_after)
+        if not done and ranked[1].limiter.reads.try_acquire():
+            self.pool.hedged += 1
+            tasks.append(self._spawn(ranked[1], ranked[1].limiter.reads, request_kwargs, True))
+        error = None
+        pending: set[asyncio.Task[str]] = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if (error := task.exception()) is None:
+                    return task.result()
+        return await self._failover(ranked[len(tasks) :], 1, request_kwargs, error)
+
+    async def _fan_out(self, request_kwargs: dict) -> str:
+        best, *extras = self.pool.send_targets()
+        if not extras:
+            return await self._post(best, best.limiter.sends, 1, request_kwargs)
+        tasks = [self._spawn(best, best.limiter.sends, request_kwargs, False)]
+        tasks += [self._spawn(endpoint, endpoint.limiter.sends, request_kwargs, True) for endpoint in extras]
+        rejected: str | None = None
+        pending: set[asyncio.Task[str]] = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    continue
+                if not _is_rpc_error(raw := task.result()):
+                    return raw
+                rejected = rejected or raw
+        if rejected is not None:
+            return rejected
+        raise tasks[0].exception()  # type: ignore[misc]
+
+    async def _request(self, body: Body) -> str:
+        request_kwargs = self._before_request(body=body)
+        if isinstance(body, SendRawTransaction):
+            return await self._fan_out(request_kwargs)
+        ranked = self.pool.ranked()
+        if self.pool.hedges(body):
+            return await self._hedged(ranked, request_kwargs)
+        return await self._failover(ranked, 1, request_kwargs, None)
+
+    async def make_request_unparsed(self, body: Body) -> str:
+        started = time.perf_counter()
+        try:
+            raw = await self._request(body)
+        except Exception as e:
+            self.pool.metrics.observe_rpc(_method(body), time.perf_counter() - started, 0, type(e).__name__)
+            raise
+        self.pool.metrics.observe_rpc(_method(body), time.perf_counter() - started, len(raw), _rpc_error_type(raw))
+        return raw
+
+    async def make_batch_request_unparsed(self, reqs: tuple[Body, ...]) -> str:
+        return await self._failover(self.pool.ranked(), len(reqs), self._before_batch_request(reqs), None)
@@ -0,0 +1,138 @@
+import cProfile
+import os
+import pstats
+import threading
+import tracemalloc
+from abc import ABC, abstractmethod
+from collections import Counter
+from pathlib import Path
+from types import CodeType, FrameType
+
+DEFAULT_STAGES = ("fetch", "build", "sign", "send")
+# Frames kept per allocation traceback
+ALLOC_FRAMES = 32
+
+
+class StageProfiler(ABC):
+    """Collects a profile only while one of `stages` runs, entered and exited from `Metrics.stage`."""
+
+    extension = ""
+
+    def __init__(self, stages: tuple[str, ...] = DEFAULT_STAGES):
+        self.stages = frozenset(stages)
+
+    @abstractmethod
+    def enter(self, stage: str, frame: FrameType) -> None:
+        ...
+
+    @abstractmethod
+    def exit(self, stage: str, frame: FrameType) -> None:
+        ...
+
+    @abstractmethod
+    def write(self, path: Path) -> str:
+        """Writes the profile to `path` and returns a summary of it for the run output."""
+
+
+class CpuProfiler(StageProfiler):
+    """cProfile per thread, enabled while the thread is inside a selected stage and written as one pstats file.
+
+    Stages that await, like `send` with `--concurrency`, also record whatever the event loop runs until they resume.
+    """
+
+    extension = ".pstats"
+
+    def __init__(self, stages: tuple[str, ...] = DEFAULT_STAGES):
+        super().__init__(stages)
+        self.profiles: list[cProfile.Profile] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _profile(self) -> cProfile.Profile:
+        if (profile := getattr(self._local, "profile", None)) is None:
+            profile = self._local.profile = cProfile.Profile()
+            self._local.depth = 0
+            with self._lock:
+                self.profiles.append(profile)
+        return profile
+
+    def enter(self, stage: str, frame: FrameType) -> None:
+        profile = self._profile()
+        self._local.depth += 1
+        if self._local.depth == 1:
+            profile.enable()
+
+    def exit(self, stage: str, frame: FrameType) -> None:
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            self._local.profile.disable()
+
+    def write(self, path: Path) -> str:
+        with self._lock:
+            profiles = list(self.profiles)
+        if not profiles:
+            return "no selected stage ran"
+        stats = pstats.Stats(*profiles)
+        stats.dump_stats(path)
+        return f"{stats.total_calls} calls in {len(profiles)} threads"  # type: ignore[attr-defined]
+
+
+class AllocProfiler(StageProfiler):
+    """Samples what the selected stages allocate with tracemalloc and writes it as collapsed stacks.
+
+    One stage run at a time is traced from its start until just before it ends; the blocks allocated by the function
+    running the stage (and its callees) that are still alive at that point are added to the profile. Runs that start
+    while another one is traced are not sampled, but concurrent runs of the same function can still show up in a sample.
+    """
+
+    extension = ".folded"
+
+    def __init__(self, stages: tuple[str, ...] = DEFAULT_STAGES):
+        super().__init__(stages)
+        self.stacks: Counter[str] = Counter()
+        self.samples: Counter[str] = Counter()
+        self._tracing: FrameType | None = None
+        self._lines: dict[CodeType, tuple[str, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def enter(self, stage: str, frame: FrameType) -> None:
+        with self._lock:
+            if self._tracing is not None or tracemalloc.is_tracing():
+                return
+            self._tracing = frame
+        tracemalloc.start(ALLOC_FRAMES)
+
+    def _span(self, code: CodeType) -> tuple[str, int, int]:
+        if (span := self._lines.get(code)) is None:
+            lines = [line for *_, line in code.co_lines() if line is not None]
+            span = self._lines[code] = (code.co_filename, min(lines), max(lines))
+        return span
+
+    def exit(self, stage: str, frame: FrameType) -> None:
+        if self._tracing is not frame:
+            return
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        filename, first, last = self._span(frame.f_code)
+        for trace in snapshot.traces:
+            frames = list(trace.traceback)
+            # oldest frame first, the stack starts at the function that runs the stage
+            start = next(
+                (i for i, f in enumerate(frames) if f.filename == filename and first <= f.lineno <= last), None
+            )
+            if start is None:
+                continue
+            labels = [f"{os.path.basename(f.filename)}:{f.lineno}" for f in frames[start:]]
+            self.stacks[";".join([stage, *labels])] += trace.size
+        self.samples[stage] += 1
+        with self._lock:
+            self._tracing = None
+
+    def write(self, path: Path) -> str:
+        with open(path, "w") as w:
+            w.writelines(f"{stack} {size}\n" for stack, size in sorted(self.stacks.items()))
+        samples = ", ".join(f"{count} {stage}" for stage, count in sorted(self.samples.items()))
+        return f"{sum(self.stacks.values())} bytes from {samples or 'no'} samples"
+
+
+PROFILERS: dict[str, type[StageProfiler]] = {"cpu": CpuProfiler, "alloc": AllocProfiler}
@@ -0,0 +1,129 @@
+import asyncio
+import math
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# A throttled bucket drops to this share of its rate and then climbs back by ADDITIVE_INCREASE requests per second
+DECREASE_FACTOR = 0.5
+ADDITIVE_INCREASE = 5.0
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket with AIMD rate adaptation.
+
+    `rate` requests per second are allowed with bursts of up to `burst`; without a rate the bucket only enforces the
+    backoff it learns from throttling. `throttle` halves the current rate (or the observed one when unlimited) and
+    pauses the bucket for the `Retry-After` period, every granted request afterwards raises the rate back towards the
+    configured ceiling.
+    """
+
+    def __init__(self, rate: float | None = None, burst: int = 10, min_rate: float = 1.0):
+        self.max_rate = rate or math.inf
+        self.rate = self.max_rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.throttled = 0
+        self.waited = 0.0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._window_start = self._updated
+        self._window_grants = 0
+        self._observed_rate = 0.0
+        self._lock = threading.Lock()
+
+    def _observe(self, now: float, n: int) -> None:
+        self._window_grants += n
+        if (elapsed := now - self._window_start) >= 1.0:
+            self._observed_rate = self._window_grants / elapsed
+            self._window_start, self._window_grants = now, 0
+
+    def reserve(self, n: int = 1) -> float:
+        # takes the tokens right away and returns how long the caller has to wait for them, so callers queue up in order
+        with self._lock:
+            now = time.monotonic()
+            self._observe(now, n)
+            if math.isinf(self.rate):
+                wait = 0.0
+            else:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate) - n
+                wait = max(-self._tokens / self.rate, 0.0)
+            self._updated = now
+            if self.rate < self.max_rate and now >= self._blocked_until:
+                self.rate = min(self.max_rate, self.rate + ADDITIVE_INCREASE * n / self.rate)
+            wait = max(wait, self._blocked_until - now)
+            self.waited += wait
+            return wait
+
+    def try_acquire(self, n: int = 1) -> bool:
+        # takes the tokens only when they are available right away
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return False
+            if not math.isinf(self.rate):
+                tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                if tokens < n:
+                    return False
+                self._tokens, self._updated = tokens - n, now
+            self._observe(now, n)
+            return True
+
+    def acquire(self, n: int = 1) -> None:
+        if wait := self.reserve(n):
+            time.sleep(wait)
+
+    async def acquire_async(self, n: int = 1) -> None:
+        if wait := self.reserve(n):
+            await asyncio.sleep(wait)
+
+    def throttle(self, retry_after: float | None = None) -> float:
+        with self._lock:
+            now = time.monotonic()
+            current = self.rate
+            if math.isinf(current):
+                # unlimited so far, start from the rate the endpoint just refused
+                partial = self._window_grants / max(now - self._window_start, 0.1)
+                current = max(self._observed_rate, partial, self.min_rate)
+            self.rate = max(self.min_rate, current * DECREASE_FACTOR)
+            self._tokens = min(self._tokens, 0.0)
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self._blocked_until = max(self._blocked_until, now + pause)
+            self.throttled += 1
+            return pause
+
+
+class RateLimiter:
+    """Separate token buckets for reads and for `sendTransaction`, shared by every client of a run."""
+
+    def __init__(
+        self,
+        rps: float | None = None,
+        burst: int = 10,
+        send_rps: float | None = None,
+        send_burst: int | None = None,
+    ):
+        self.reads = TokenBucket(rps, burst)
+        self.sends = TokenBucket(send_rps or rps, send_burst or burst)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "read_rate": self.reads.rate,
+            "send_rate": self.sends.rate,
+            "throttled": self.reads.throttled + self.sends.throttled,
+            "waited": self.reads.waited + self.sends.waited,
+        }
@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Awaitable, Callable, TypeGuard, TypeVar
+
+import httpx
+from solana.exceptions import SolanaRpcException
+from solana.rpc.core import RPCException
+from solders.rpc.errors import (
+    BlockNotAvailableMessage,
+    MinContextSlotNotReachedMessage,
+    NodeUnhealthyMessage,
+    SendTransactionPreflightFailureMessage,
+)
+from solders.transaction_status import TransactionErrorFieldless, TransactionErrorInstructionError, TransactionErrorType
+
+T = TypeVar("T")
+
+# Preflight failures that depend on the cluster state rather than on the transaction itself
+_TRANSIENT_TX_ERRORS = (
+    TransactionErrorFieldless.AccountInUse,
+    TransactionErrorFieldless.ClusterMaintenance,
+    TransactionErrorFieldless.WouldExceedMaxAccountCostLimit,
+    TransactionErrorFieldless.WouldExceedMaxBlockCostLimit,
+)
+_TRANSIENT_RPC_ERRORS = (BlockNotAvailableMessage, MinContextSlotNotReachedMessage, NodeUnhealthyMessage)
+
+
+class ErrorKind(StrEnum):
+    TRANSIENT = "transient"
+    EXPIRED = "expired"
+    PERMANENT = "permanent"
+
+
+def _classify_transport(error: SolanaRpcException) -> ErrorKind:
+    cause = error.__cause__
+    if isinstance(cause, httpx.HTTPStatusError):
+        status = cause.response.status_code
+        return ErrorKind.TRANSIENT if status == httpx.codes.TOO_MANY_REQUESTS or status >= 500 else ErrorKind.PERMANENT
+    return ErrorKind.TRANSIENT if isinstance(cause, httpx.TransportError) else ErrorKind.PERMANENT
+
+
+def classify(error: Exception) -> ErrorKind:
+    if isinstance(error, SolanaRpcException):
+        return _classify_transport(error)
+    if not isinstance(error, RPCException) or not error.args:
+        return ErrorKind.PERMANENT
+    rpc_error = error.args[0]
+    if isinstance(rpc_error, _TRANSIENT_RPC_ERRORS):
+        return ErrorKind.TRANSIENT
+    if not isinstance(rpc_error, SendTransactionPreflightFailureMessage):
+        return ErrorKind.PERMANENT
+    return classify_tx_error(rpc_error.data.err)
+
+
+def classify_tx_error(tx_error: TransactionErrorType | None) -> ErrorKind:
+    if tx_error == TransactionErrorFieldless.BlockhashNotFound:
+        return ErrorKind.EXPIRED
+    # instruction errors are raised by the programs and fail the same way on every attempt
+    if isinstance(tx_error, TransactionErrorInstructionError) or tx_error not in _TRANSIENT_TX_ERRORS:
+        return ErrorKind.PERMANENT
+    return ErrorKind.TRANSIENT
+
+
+def is_program_error(tx_error: TransactionErrorType | None) -> TypeGuard[TransactionErrorInstructionError]:
+    # permanent and caused by the transaction's own instructions, not by the payer or the cluster
+    return classify_tx_error(tx_error) == ErrorKind.PERMANENT and isinstance(tx_error, TransactionErrorInstructionError)
+
+
+def _decode_program_error(error: RPCException) -> str | None:
+    try:
+        # the generated decoder needs anchorpy
+        from batch_cancel_cli.client.errors import from_tx_error
+    except ImportError:
+        return None
+    program_error = from_tx_error(error)
+    if program_error is None:
+        return None
+    return f"{program_error.name} ({program_error.code}): {program_error.msg}"
+
+
+def describe(error: Exception) -> str:
+    if isinstance(error, SolanaRpcException):
+        # the wrapper only names the endpoint, the transport error carries the details
+        cause = str(error.__cause__).splitlines()
+        return f"{error.error_msg}: {cause[0]}" if cause else error.error_msg
+    if not isinstance(error, RPCException) or not error.args:
+        return str(error)
+    if program_error := _decode_program_error(error):
+        return program_error
+    rpc_error = error.args[0]
+    if isinstance(rpc_error, SendTransactionPreflightFailureMessage):
+        return f"{rpc_error.message}: {rpc_error.data.err}"
+    return str(error)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 5
+    max_elapsed: float = 60.0
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def delay(self, attempt: int) -> float:
+        # "full jitter" exponential backoff, concurrent senders don't retry in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class RetryScheduler:
+    """Retries transient send failures with exponential backoff and jitter.
+
+    Every attempt calls the wrapped function again with the attempt number, so transactions are rebuilt and re-signed
+    each time; an expired blockhash additionally triggers `on_expired` so the next attempt signs with a fresh one.
+    Permanent errors, the attempt cap and the `max_elapsed` budget end the retries by re-raising the last error.
+    """
+
+    def __init__(
+        self,
+        policy: RetryPolicy | None = None,
+        on_expired: Callable[[], None] | None = None,
+        on_retry: Callable[[int, Exception, float], None] | None = None,
+    ):
+        self.policy = policy or RetryPolicy()
+        self.on_expired = on_expired
+        self.on_retry = on_retry
+        self.retries = 0
+        self.gave_up = 0
+
+    def _next_delay(self, attempt: int, started: float, error: Exception) -> float | None:
+        kind = classify(error)
+        if kind == ErrorKind.PERMANENT:
+            return None
+        if kind == ErrorKind.EXPIRED and self.on_expired:
+            self.on_expired()
+        delay = self.policy.delay(attempt)
+        if attempt >= self.policy.max_attempts or time.monotonic() - started + delay > self.policy.max_elapsed:
+            self.gave_up += 1
+            return None
+        self.retries += 1
+        if self.on_retry:
+            self.on_retry(attempt, error, delay)
+        return delay
+
+    def call(self, fn: Callable[[int], T]) -> T:
+        started = time.monotonic()
+        for attempt in itertools.count(1):
+            try:
+                return fn(attempt)
+            except Exception as e:
+                delay = self._next_delay(attempt, started, e)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def call_async(self, fn: Callable[[int], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        for attempt in itertools.count(1):
+            try:
+                return await fn(attempt)
+            except Exception as e:
+                delay = self._next_delay(attempt, started, e)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def stats(self) -> dict[str, int]:
+        return {"retries": self.retries, "gave_up": self.gave_up}
@@ -0,0 +1,1029 @@
+import asyncio
+import json
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterable, Iterator, Sequence, TextIO, TypeVar
+
+import click
+import httpx
+from click import Context
+from more_itertools import chunked, spy
+from solana.exceptions import SolanaRpcException, handle_exceptions
+from solana.rpc.api import Client
+from solana.rpc.async_api import AsyncClient
+from solana.rpc.commitment import Confirmed, Finalized
+from solana.rpc.core import RPCException
+from solana.rpc.types import MemcmpOpts
+from solana.transaction import Transaction
+from solders.address_lookup_table_account import AddressLookupTableAccount
+from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price
+from solders.hash import Hash
+from solders.instruction import Instruction
+from solders.keypair import Keypair
+from solders.message import MessageV0
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+from solders.system_program import ID as SYS_PROGRAM_ID
+from solders.sysvar import RENT
+from solders.transaction import VersionedTransaction
+from solders.transaction_status import TransactionErrorType, TransactionStatus
+from spl.token.constants import ASSOCIATED_TOKEN_PROGRAM_ID, TOKEN_PROGRAM_ID
+
+from batch_cancel_cli.blockhash import BlockhashCache
+from batch_cancel_cli.client.program_id import PROGRAM_ID
+from batch_cancel_cli.client.structures import CONTRACT_OFFSETS, CONTRACT_SIZE, ContractView
+from batch_cancel_cli.compute_units import ComputeUnitProfiler
+from batch_cancel_cli.confirmation import (
+    MAX_SIGNATURE_STATUSES,
+    ConfirmationTracker,
+    Outcome,
+    PendingTransaction,
+    reached_commitment,
+)
+from batch_cancel_cli.fees import GetRecentPrioritizationFees, PriorityFeePolicy
+from batch_cancel_cli.journal import FINISHED_STATES, Journal, JournalEntry, State
+from batch_cancel_cli.lookup_table import (
+    MAX_ADDRESSES_PER_EXTEND,
+    create_lookup_table,
+    decode_lookup_table,
+    extend_lookup_table,
+)
+from batch_cancel_cli.metrics import Metrics
+from batch_cancel_cli.packing import COMPUTE_UNITS_PER_PAIR, TxMeasure, measure_legacy_tx, measure_v0_tx, pack
+from batch_cancel_cli.pda import PdaCache
+from batch_cancel_cli.pool import AsyncPooledHTTPProvider, PooledHTTPProvider, RpcPool
+from batch_cancel_cli.retry import RetryScheduler, describe, is_program_error
+from batch_cancel_cli.simulation import describe_tx_error
+from batch_cancel_cli.templates import TransferCancelTemplate
+
+if TYPE_CHECKING:
+    from batch_cancel_cli.client.instructions import CreateArgs
+    from batch_cancel_cli.columnar import ContractBatch
+    from batch_cancel_cli.subscriptions import SignatureSubscriber
+
+STREAMFLOW_TREASURY = Pubkey.from_string("5SEpbdjFK5FxwTvfsGMXVQTD2v4M2c5tyRTxhdsPkgDw")
+WITHDRAWOR = Pubkey.from_string("wdrwhnCv4pzW8beKsbPa4S2UDZrXenjg16KJdKSpb5u")
+FEE_ORACLE = Pubkey.from_string("B743wFVk2pCYhV91cn287e1xY7f1vt4gdY48hhNiuQmT")
+FETCH_CHUNK_SIZE = 100
+
+T = TypeVar("T")
+
+
+def read_contract_ids(stream: TextIO, dedup: bool = True) -> Iterator[Pubkey]:
+    # everything is streamed except the raw key bytes of the ids seen so far, which deduplication has to keep: about
+    # 100 bytes per unique id, 100MB for a million of them. Without `dedup` memory stays flat and repeats are sent again
+    seen: set[bytes] = set()
+    for line_number, line in enumerate(stream, 1):
+        value = line.strip()
+        if not value or value.startswith("#"):
+            continue
+        try:
+            contract_id = Pubkey.from_string(value)
+        except ValueError:
+            click.echo(f"Skipping invalid contract id on line {line_number}: {value}")
+            continue
+        if dedup:
+            key = bytes(contract_id)
+            if key in seen:
+                continue
+            seen.add(key)
+        yield contract_id
+
+
+def serialize_tx(tx: Transaction | VersionedTransaction) -> bytes:
+    return bytes(tx) if isinstance(tx, VersionedTransaction) else tx.serialize()
+
+
+def build_create_args(net_amount_deposited: int, period: int, amount_per_period: int, name: str) -> "CreateArgs":
+    from batch_cancel_cli.client.instructions import CreateArgs
+
+    encoded_name = name.encode()
+    name_byte_array = bytearray(64)
+    name_byte_array[0 : len(encoded_name)] = encoded_name
+    return CreateArgs(
+        start_time=0,
+        net_amount_deposited=net_amount_deposited,
+        period=period,
+        amount_per_period=amount_per_period,
+        cliff=0,
+        cliff_amount=0,
+        cancelable_by_sender=True,
+        cancelable_by_recipient=False,
+        automatic_withdrawal=False,
+        transferable_by_sender=True,
+        transferable_by_recipient=False,
+        can_topup=False,
+        stream_name=list(name_byte_array),
+        withdraw_frequency=0,
+        pausable=False,
+        can_update_rate=False,
+    )
+
+
+async def run_concurrently(items: Iterable[T], worker: Callable[[T], Awaitable[None]], concurrency: int) -> None:
+    # `items` is advanced in a worker thread, its fetches, simulations and journal writes block, and handed over
+    # through a queue of `concurrency` slots, so at most that many items wait beyond the ones in flight
+    iterator = iter(items)
+    workers = max(concurrency, 1)
+    queue: asyncio.Queue[T | object] = asyncio.Queue(workers)
+    done = object()
+
+    async def produce() -> None:
+        try:
+            while (item := await asyncio.to_thread(next, iterator, done)) is not done:
+                await queue.put(item)
+        finally:
+            for _ in range(workers):
+                await queue.put(done)
+
+    async def consume() -> None:
+        while (item := await queue.get()) is not done:
+            await worker(item)  # type: ignore[arg-type]
+
+    await asyncio.gather(produce(), *(consume() for _ in range(workers)))
+
+
+def create_client(pool: RpcPool) -> Client:
+    client = Client(pool.primary)
+    client._provider = PooledHTTPProvider(pool)
+    return client
+
+
+def create_async_client(pool: RpcPool) -> AsyncClient:
+    client = AsyncClient(pool.primary)
+    client._provider = AsyncPooledHTTPProvider(pool)
+    return client
+
+
+def create_blockhash_cache(client: Client, ttl: float = 20.0) -> BlockhashCache:
+    def fetch_blockhash() -> tuple[Hash, int]:
+        value = client.get_latest_blockhash().value
+        return value.blockhash, value.last_valid_block_height
+
+    return BlockhashCache(fetch_blockhash, lambda: client.get_block_height().value, ttl=ttl)
+
+
+class BaseRunner:
+    def __init__(
+        self,
+        rpc_url: str,
+        signer: Keypair,
+        program_id: Pubkey,
+        blockhash_cache: BlockhashCache,
+        metrics: Metrics | None = None,
+    ):
+        self.rpc_url = rpc_url
+        self.signer = signer
+        self.payer = signer.pubkey()
+        self.program_id = program_id
+        self.blockhash_cache = blockhash_cache
+        self.compute_units_per_pair = COMPUTE_UNITS_PER_PAIR
+        self.lookup_table: AddressLookupTableAccount | None = None
+        self.pda_cache = PdaCache()
+        self.retry = RetryScheduler(on_expired=blockhash_cache.invalidate)
+        self.priority_fees: PriorityFeePolicy | None = None
+        self.cu_profiler: ComputeUnitProfiler | None = None
+        self.templates: dict[Pubkey, TransferCancelTemplate] = {}
+        self.metrics = metrics or Metrics()
+
+    def generate_compute_budget_instructions(
+        self, units: int = COMPUTE_UNITS_PER_PAIR, price: int | None = None
+    ) -> list[Instruction]:
+        ixs = [set_compute_unit_limit(units)]
+        if price:
+            ixs.append(set_compute_unit_price(price))
+        return ixs
+
+    def generate_create_instruction(
+        self, args: "CreateArgs", contract_signer: Keypair, mint: Pubkey, recipient: Pubkey
+    ) -> Instruction:
+        from batch_cancel_cli.client.instructions import CreateAccounts
+        from batch_cancel_cli.client.instructions import create as build_create_ix
+
+        contract_metadata = contract_signer.pubkey()
+        escrow_tokens, _ = self.pda_cache.find_program_address([b"strm", bytes(contract_metadata)], self.program_id)
+        return build_create_ix(
+            args,
+            CreateAccounts(
+                mint=mint,
+                sender=self.payer,
+                sender_tokens=self.pda_cache.derive_ata(self.payer, mint),
+                recipient=recipient,
+                recipient_tokens=self.pda_cache.derive_ata(recipient, mint),
+                streamflow_treasury=STREAMFLOW_TREASURY,
+                streamflow_treasury_tokens=self.pda_cache.derive_ata(STREAMFLOW_TREASURY, mint),
+                partner=self.payer,
+                partner_tokens=self.pda_cache.derive_ata(self.payer, mint),
+                metadata=contract_metadata,
+                escrow_tokens=escrow_tokens,
+                fee_oracle=FEE_ORACLE,
+                withdrawor=WITHDRAWOR,
+                streamflow_program=self.program_id,
+            ),
+            self.program_id,
+        )
+
+    def generate_transfer_instruction(
+        self, new_recipient: Pubkey, contract_id: Pubkey, contract: ContractView
+    ) -> Instruction:
+        # the generated package builds the layouts of every instruction on import, commands that send none skip it
+        from batch_cancel_cli.client.instructions import transfer_recipient as build_transfer_recipient_ix
+
+        mint = contract.mint
+        return build_transfer_recipient_ix(
+            {
+                "authority": self.payer,
+                "new_recipient": new_recipient,
+                "new_recipient_tokens": self.pda_cache.derive_ata(new_recipient, mint),
+                "metadata": contract_id,
+                "mint": mint,
+            },
+            self.program_id,
+        )
+
+    def generate_cancel_instruction(
+        self, contract_id: Pubkey, contract: ContractView, recipient: Pubkey | None = None
+    ) -> Instruction:
+        from batch_cancel_cli.client.instructions import cancel as build_cancel_ix
+
+        mint = contract.mint
+        recipient = recipient or contract.recipient
+        return build_cancel_ix(
+            {
+                "authority": self.payer,
+                "sender": contract.sender,
+                "sender_tokens": contract.sender_tokens,
+                "recipient": recipient,
+                "recipient_tokens": self.pda_cache.derive_ata(recipient, mint),
+                "metadata": contract_id,
+                "escrow_tokens": contract.escrow_tokens,
+                "streamflow_treasury": contract.streamflow_treasury,
+                "streamflow_treasury_tokens": contract.streamflow_treasury_tokens,
+                "partner": contract.partner,
+                "partner_tokens": contract.partner_tokens,
+                "mint": mint,
+            },
+            self.program_id,
+        )
+
+    def transfer_cancel_template(self, new_recipient: Pubkey) -> TransferCancelTemplate:
+        if (template := self.templates.get(new_recipient)) is None:
+            template = TransferCancelTemplate(self.program_id, self.payer, new_recipient, self.pda_cache.derive_ata)
+            self.templates[new_recipient] = template
+        return template
+
+    def generate_transfer_cancel_instructions(
+        self, new_recipient: Pubkey, contract_id: Pubkey, contract: ContractView
+    ) -> list[Instruction]:
+        return self.transfer_cancel_template(new_recipient).build(contract_id, contract)
+
+    def build_tx(
+        self,
+        recent_blockhash: Hash,
+        *ixs: Instruction,
+        compute_units: int = COMPUTE_UNITS_PER_PAIR,
+        compute_unit_price: int | None = None,
+    ) -> Transaction:
+        return Transaction(
+            recent_blockhash=recent_blockhash,
+            fee_payer=self.payer,
+        ).add(*self.generate_compute_budget_instructions(compute_units, compute_unit_price), *ixs)
+
+    def compile_v0_message(
+        self,
+        recent_blockhash: Hash,
+        *ixs: Instruction,
+        compute_units: int = COMPUTE_UNITS_PER_PAIR,
+        compute_unit_price: int | None = None,
+    ) -> MessageV0:
+        return MessageV0.try_compile(
+            self.payer,
+            [*self.generate_compute_budget_instructions(compute_units, compute_unit_price), *ixs],
+            [self.lookup_table] if self.lookup_table else [],
+            recent_blockhash,
+        )
+
+    def build_v0_tx(
+        self,
+        recent_blockhash: Hash,
+        *ixs: Instruction,
+        compute_units: int = COMPUTE_UNITS_PER_PAIR,
+        compute_unit_price: int | None = None,
+    ) -> VersionedTransaction:
+        message = self.compile_v0_message(
+            recent_blockhash, *ixs, compute_units=compute_units, compute_unit_price=compute_unit_price
+        )
+        return VersionedTransaction(message, [self.signer])
+
+    def build_transfer_cancel_tx(
+        self,
+        recent_blockhash: Hash,
+        new_recipient: Pubkey,
+        batch: Sequence[tuple[Pubkey, ContractView]],
+        compute_unit_price: int | None = None,
+        compute_units: int | None = None,
+    ) -> Transaction | VersionedTransaction:
+        with self.metrics.stage("build"):
+            ixs = [
+                ix
+                for contract_id, contract in batch
+                for ix in self.generate_transfer_cancel_instructions(new_recipient, contract_id, contract)
+            ]
+            compute_units = compute_units or self.compute_units_per_pair * len(batch)
+            if self.lookup_table:
+                message = self.compile_v0_message(
+                    recent_blockhash, *ixs, compute_units=compute_units, compute_unit_price=compute_unit_price
+                )
+            else:
+                tx = self.build_tx(
+                    recent_blockhash, *ixs, compute_units=compute_units, compute_unit_price=compute_unit_price
+                )
+        with self.metrics.stage("sign"):
+            if self.lookup_table:
+                return VersionedTransaction(message, [self.signer])
+            tx.sign(self.signer)
+            return tx
+
+    def measure_transfer_cancel_tx(self, ixs: Sequence[Instruction], pairs: int) -> TxMeasure:
+        # the price is only known at send time, any non-zero one takes the same space
+        compute_budget_ixs = self.generate_compute_budget_instructions(
+            self.compute_units_per_pair * pairs, 1 if self.priority_fees else None
+        )
+        if self.lookup_table:
+            return measure_v0_tx(self.payer, [*compute_budget_ixs, *ixs], [self.lookup_table])
+        return measure_legacy_tx(self.payer, [*compute_budget_ixs, *ixs])
+
+    def transfer_cancel_shape(self, batch: Sequence[tuple[Pubkey, ContractView]]) -> tuple[str, int, bool]:
+        return "transfer+cancel", len(batch), self.lookup_table is not None
+
+    def fee_accounts(self, batch: Sequence[tuple[Pubkey, ContractView]]) -> list[Pubkey]:
+        # writable accounts other transactions compete for, escrows and metadata are only written by their own cancel
+        accounts = [
+            account
+            for _, contract in batch
+            for account in (contract.streamflow_treasury_tokens, contract.partner_tokens)
+        ]
+        return list(dict.fromkeys(accounts))
+
+    def lookup_table_addresses(self, new_recipient: Pubkey, contract: ContractView) -> list[Pubkey]:
+        # accounts shared by every transfer+cancel of a run, the invoked program itself has to stay a static key
+        mint = contract.mint
+        addresses = [
+            contract.streamflow_treasury,
+            contract.streamflow_treasury_tokens,
+            mint,
+            TOKEN_PROGRAM_ID,
+            new_recipient,
+            self.pda_cache.derive_ata(new_recipient, mint),
+            contract.sender,
+            contract.sender_tokens,
+            contract.partner,
+            contract.partner_tokens,
+            RENT,
+            ASSOCIATED_TOKEN_PROGRAM_ID,
+            SYS_PROGRAM_ID,
+        ]
+        return list(dict.fromkeys(addresses))
+
+    def packing_units_per_pair(self, new_recipient: Pubkey, item: tuple[Pubkey, ContractView]) -> int:
+        # the fixed budget leaves room for few pairs per transaction, a profiled pair packs by what it really uses
+        if self.cu_profiler:
+            units = self.cu_profiler.limit(
+                self.transfer_cancel_shape([item]),
+                lambda units: self.build_transfer_cancel_tx(
+                    self.blockhash_cache.get(), new_recipient, [item], None, units
+                ),
+            )
+            if units:
+                return units
+        return self.compute_units_per_pair
+
+    def pack_transfer_cancel(
+        self, new_recipient: Pubkey, items: Iterable[tuple[Pubkey, ContractView]], max_pairs: int | None = None
+    ) -> Iterator[list[tuple[Pubkey, ContractView]]]:
+        head, items = spy(items)
+        return pack(
+            items,
+            lambda item: self.generate_transfer_cancel_instructions(new_recipient, *item),
+            self.measure_transfer_cancel_tx,
+            self.packing_units_per_pair(new_recipient, head[0]) if head else self.compute_units_per_pair,
+            key=lambda item: item[0],
+            max_items=max_pairs,
+        )
+
+
+class Runner(BaseRunner):
+    def __init__(
+        self,
+        rpc_url: str,
+        signer: Keypair,
+        program_id: Pubkey = PROGRAM_ID,
+        blockhash_ttl: float = 20.0,
+        fetch_concurrency: int = 4,
+        fetch_retries: int = 3,
+        pool: RpcPool | None = None,
+    ):
+        # every RPC call of the run, sync and async, goes through the same endpoints and rate limiters
+        self.pool = pool or RpcPool([rpc_url])
+        self.client = create_client(self.pool)
+        super().__init__(
+            rpc_url, signer, program_id, create_blockhash_cache(self.client, blockhash_ttl), self.pool.metrics
+        )
+        self.fetch_concurrency = fetch_concurrency
+        self.fetch_retries = fetch_retries
+
+    def generate_tx(self, *ixs: Instruction) -> Transaction:
+        return self.build_tx(self.blockhash_cache.get(), *ixs)
+
+    def fetch_accounts(self, chunk: list[Pubkey]) -> list[bytes | None]:
+        # a timed out chunk is retried on its own, other chunks keep their results
+        for attempt in range(self.fetch_retries + 1):
+            try:
+                with self.metrics.stage("fetch"):
+                    res = self.client.get_multiple_accounts(chunk)
+            except SolanaRpcException as e:
+                if attempt < self.fetch_retries and isinstance(e.__cause__, httpx.TimeoutException):
+                    continue
+                raise
+            return [data.data if data else None for data in res.value]
+        raise AssertionError("unreachable")
+
+    def iter_accounts(self, contract_ids: Iterable[Pubkey]) -> Iterator[tuple[list[Pubkey], list[bytes | None]]]:
+        # keeps up to `fetch_concurrency` chunks in flight and yields them in input order
+        with ThreadPoolExecutor(max_workers=self.fetch_concurrency) as executor:
+            pending: deque[tuple[list[Pubkey], Future[list[bytes | None]]]] = deque()
+            for chunk in chunked(contract_ids, FETCH_CHUNK_SIZE):
+                pending.append((chunk, executor.submit(self.fetch_accounts, chunk)))
+                if len(pending) >= self.fetch_concurrency:
+                    chunk, future = pending.popleft()
+                    yield chunk, future.result()
+            while pending:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+
+    def iter_contracts(
+        self, contract_ids: Iterable[Pubkey], filter_: Callable[[ContractView], bool] | None = None
+    ) -> Iterator[tuple[Pubkey, ContractView | None]]:
+        for chunk, datas in self.iter_accounts(contract_ids):
+            for contract_id, data in zip(chunk, datas, strict=True):
+                if (
+                    not data
+                    or (contract := ContractView.from_bytes(data))
+                    and ((filter_ and not filter_(contract)) or contract.closed)
+                ):
+                    yield contract_id, None
+                    continue
+                yield contract_id, contract
+
+    def find_contracts(
+        self, sender: Pubkey, mint: Pubkey | None = None, unclaimed_only: bool = False
+    ) -> Iterator[tuple[Pubkey, ContractView]]:
+        # base58 encodes each leading zero byte as "1", so "1" * n matches n zero bytes
+        filters: list[int | MemcmpOpts] = [
+            MemcmpOpts(CONTRACT_OFFSETS["sender"], str(sender)),
+            MemcmpOpts(CONTRACT_OFFSETS["closed"], "1"),
+        ]
+        if mint:
+            filters.append(MemcmpOpts(CONTRACT_OFFSETS["mint"], str(mint)))
+        if unclaimed_only:
+            filters.append(MemcmpOpts(CONTRACT_OFFSETS["last_withdrawn"], "1" * 8))
+        res = self.client.get_program_accounts(self.program_id, encoding="base64", filters=filters)
+        for keyed in res.value:
+            data = keyed.account.data
+            if len(data) < CONTRACT_SIZE or (contract := ContractView.from_bytes(data)).closed:
+                continue
+            yield keyed.pubkey, contract
+
+    def get_signature_statuses(
+        self, signatures: Sequence[Signature], search_history: bool = True
+    ) -> list[TransactionStatus | None]:
+        statuses: list[TransactionStatus | None] = []
+        for chunk in chunked(signatures, MAX_SIGNATURE_STATUSES):
+            with self.metrics.stage("statuses"):
+                res = self.client.get_signature_statuses(chunk, search_transaction_history=search_history)
+            statuses.extend(res.value)
+        return statuses
+
+    def get_block_height(self) -> int:
+        return self.client.get_block_height().value
+
+    @handle_exceptions(SolanaRpcException, httpx.HTTPError)
+    def _make_request_unparsed(self, body: GetRecentPrioritizationFees) -> str:
+        # requests solana-py has no method for, wrapped like the client wraps its own
+        return self.client._provider.make_request_unparsed(body)  # type: ignore[arg-type]
+
+    def get_recent_prioritization_fees(self, accounts: Sequence[Pubkey]) -> list[int]:
+        raw = self._make_request_unparsed(GetRecentPrioritizationFees(tuple(accounts)))
+        response = json.loads(raw)
+        if "error" in response:
+            raise RPCException(response["error"])
+        return [fee["prioritizationFee"] for fee in response["result"]]
+
+    def get_contracts_batch(self, contract_ids: Sequence[Pubkey]) -> "ContractBatch":
+        from batch_cancel_cli.columnar import ContractBatch, decode_contracts
+
+        return ContractBatch.concatenate(
+            [decode_contracts(chunk, datas) for chunk, datas in self.iter_accounts(contract_ids)]
+        )
+
+    def create_contract(
+        self, args: "CreateArgs", contract_signer: Keypair, mint: Pubkey, recipient: Pubkey
+    ) -> Signature:
+        ix = self.generate_create_instruction(args, contract_signer, mint, recipient)
+        recent_blockhash = self.blockhash_cache.get()
+
+        def build(compute_units: int = COMPUTE_UNITS_PER_PAIR) -> Transaction:
+            tx = self.build_tx(recent_blockhash, ix, compute_units=compute_units)
+            tx.sign(self.signer, contract_signer)
+            return tx
+
+        compute_units = self.cu_profiler and self.cu_profiler.limit(("create",), build)
+        return self.client.send_raw_transaction(build(compute_units or COMPUTE_UNITS_PER_PAIR).serialize()).value
+
+    def transfer_cancel_batch(
+        self, new_recipient: Pubkey, batch: Sequence[tuple[Pubkey, ContractView]]
+    ) -> tuple[Signature, int]:
+        return self.retry.call(lambda attempt: self._send_transfer_cancel(new_recipient, batch, attempt))
+
+    def simulate_units(self, tx: Transaction | VersionedTransaction) -> int | None:
+        with self.metrics.stage("simulate"):
+            value = self.client.simulate_transaction(tx, sig_verify=False).value
+        return None if value.err else value.units_consumed
+
+    def simulate_transfer_cancel(
+        self, new_recipient: Pubkey, batch: Sequence[tuple[Pubkey, ContractView]]
+    ) -> TransactionErrorType | None:
+        tx = self.build_transfer_cancel_tx(self.blockhash_cache.get(), new_recipient, batch)
+        with self.metrics.stage("simulate"):
+            return self.client.simulate_transaction(tx, sig_verify=False).value.err
+
+    def iter_simulations(
+        self, new_recipient: Pubkey, items: Iterable[tuple[Pubkey, ContractView]], concurrency: int
+    ) -> Iterator[tuple[Pubkey, ContractView, "Future[TransactionErrorType | None]"]]:
+        # keeps up to `concurrency` simulations in flight and yields them in input order
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending: deque[tuple[Pubkey, ContractView, Future[TransactionErrorType | None]]] = deque()
+            for contract_id, contract in items:
+                future = executor.submit(self.simulate_transfer_cancel, new_recipient, [(contract_id, contract)])
+                pending.append((contract_id, contract, future))
+                if len(pending) >= concurrency:
+                    yield pending.popleft()
+            while pending:
+                yield pending.popleft()
+
+    def _send_transfer_cancel(
+        self, new_recipient: Pubkey, batch: Sequence[tuple[Pubkey, ContractView]], attempt: int = 1
+    ) -> tuple[Signature, int]:
+        # the last valid block height of the blockhash tells the confirmation tracker when the tx has expired
+        with self.metrics.stage("blockhash"):
+            blockhash = self.blockhash_cache.get_entry()
+        price = None
+        if self.priority_fees:
+            with self.metrics.stage("fees"):
+                price = self.priority_fees.price(self.fee_accounts(batch), attempt)
+        compute_units = None
+        if self.cu_profiler:
+            compute_units = self.cu_profiler.limit(
+                self.transfer_cancel_shape(batch),
+                lambda units: self.build_transfer_cancel_tx(blockhash.blockhash, new_recipient, batch, None, units),
+            )
+        tx = self.build_transfer_cancel_tx(blockhash.blockhash, new_recipient, batch, price, compute_units)
+        with self.metrics.stage("send"):
+            signature = self.client.send_raw_transaction(serialize_tx(tx)).value
+        return signature, blockhash.last_valid_block_height
+
+    def send_and_confirm(self, *ixs: Instruction) -> int:
+        tx = self.generate_tx(*ixs)
+        tx.sign(self.signer)
+        sig = self.client.send_raw_transaction(tx.serialize()).value
+        status = self.client.confirm_transaction(sig, Confirmed).value[0]
+        if status is None or status.err:
+            raise RuntimeError(f"Transaction {sig} failed: {status and status.err}")
+        return status.slot
+
+    def wait_for_slot(self, slot: int) -> None:
+        while self.client.get_slot(Confirmed).value <= slot:
+            time.sleep(0.4)
+
+    def get_lookup_table(self, address: Pubkey) -> AddressLookupTableAccount:
+        res = self.client.get_account_info(address)
+        if not res.value:
+            raise ValueError(f"Lookup table {address} does not exist")
+        return decode_lookup_table(address, res.value.data)
+
+    def extend_lookup_table(self, address: Pubkey, addresses: Sequence[Pubkey]) -> int:
+        slot = 0
+        for chunk in chunked(addresses, MAX_ADDRESSES_PER_EXTEND):
+            slot = self.send_and_confirm(extend_lookup_table(address, self.payer, self.payer, chunk))
+        return slot
+
+    def create_lookup_table(self, addresses: Sequence[Pubkey]) -> AddressLookupTableAccount:
+        create_ix, address = create_lookup_table(self.payer, self.payer, self.client.get_slot(Finalized).value)
+        self.send_and_confirm(create_ix)
+        # extended addresses can only be looked up from the next slot on
+        self.wait_for_slot(self.extend_lookup_table(address, addresses))
+        return AddressLookupTableAccount(address, list(addresses))
+
+    def prepare_lookup_table(
+        self, new_recipient: Pubkey, contract: ContractView, address: Pubkey | None = None
+    ) -> AddressLookupTableAccount:
+        addresses = self.lookup_table_addresses(new_recipient, contract)
+        if not address:
+            self.lookup_table = self.create_lookup_table(addresses)
+            return self.lookup_table
+        table = self.get_lookup_table(address)
+        if missing := [a for a in addresses if a not in table.addresses]:
+            self.wait_for_slot(self.extend_lookup_table(address, missing))
+            table = AddressLookupTableAccount(address, [*table.addresses, *missing])
+        self.lookup_table = table
+        return table
+
+
+class AsyncRunner(BaseRunner):
+    def __init__(
+        self,
+        rpc_url: str,
+        signer: Keypair,
+        program_id: Pubkey = PROGRAM_ID,
+        blockhash_cache: BlockhashCache | None = None,
+        pool: RpcPool | None = None,
+    ):
+        self.pool = pool or RpcPool([rpc_url])
+        super().__init__(
+            rpc_url,
+            signer,
+            program_id,
+            blockhash_cache or create_blockhash_cache(create_client(self.pool)),
+            self.pool.metrics,
+        )
+        self.client = create_async_client(self.pool)
+
+    @classmethod
+    def from_runner(cls, runner: Runner) -> "AsyncRunner":
+        async_runner = cls(runner.rpc_url, runner.signer, runner.program_id, runner.blockhash_cache, runner.pool)
+        async_runner.compute_units_per_pair = runner.compute_units_per_pair
+        async_runner.lookup_table = runner.lookup_table
+        async_runner.pda_cache = runner.pda_cache
+        async_runner.retry = runner.retry
+        async_runner.priority_fees = runner.priority_fees
+        async_runner.cu_profiler = runner.cu_profiler
+        async_runner.templates = runner.templates
+        return async_runner
+
+    async def generate_tx(self, *ixs: Instruction) -> Transaction:
+        return self.build_tx(await self.blockhash_cache.get_async(), *ixs)
+
+    async def transfer_cancel_batch(
+        self, new_recipient: Pubkey, batch: Sequence[tuple[Pubkey, ContractView]]
+    ) -> tuple[Signature, int]:
+        return await self.retry.call_async(lambda attempt: self._send_transfer_cancel(new_recipient, batch, attempt))
+
+    async def _send_transfer_cancel(
+        self, new_recipient: Pubkey, batch: Sequence[tuple[Pubkey, ContractView]], attempt: int = 1
+    ) -> tuple[Signature, int]:
+        with self.metrics.stage("blockhash"):
+            blockhash = await self.blockhash_cache.get_entry_async()
+        price = None
+        if self.priority_fees:
+            with self.metrics.stage("fees"):
+                price = await self.priority_fees.price_async(self.fee_accounts(batch), attempt)
+        compute_units = None
+        if self.cu_profiler:
+            compute_units = await self.cu_profiler.limit_async(
+                self.transfer_cancel_shape(batch),
+                lambda units: self.build_transfer_cancel_tx(blockhash.blockhash, new_recipient, batch, None, units),
+            )
+        tx = self.build_transfer_cancel_tx(blockhash.blockhash, new_recipient, batch, price, compute_units)
+        with self.metrics.stage("send"):
+            signature = (await self.client.send_raw_transaction(serialize_tx(tx))).value
+        return signature, blockhash.last_valid_block_height
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class Reporter:
+    def __init__(self, journal: Journal | None = None, tracker: ConfirmationTracker | None = None):
+        self.journal = journal
+        self.tracker = tracker
+        self.simulated = 0
+        self.doomed: Counter[str] = Counter()
+
+    def _record(
+        self, contract_id: Pubkey, state: State, signature: Signature | None = None, error: str | None = None
+    ) -> None:
+        if self.journal:
+            self.journal.record(contract_id, state, signature, error)
+
+    def skip_missing(
+        self, items: Iterable[tuple[Pubkey, ContractView | None]]
+    ) -> Iterator[tuple[Pubkey, ContractView]]:
+        for contract_id, contract in items:
+            if not contract:
+                click.echo(f"Skipping contract {contract_id}")
+                self._record(contract_id, State.SKIPPED)
+                continue
+            self._record(contract_id, State.FETCHED)
+            yield contract_id, contract
+
+    def skip_doomed(
+        self, simulations: Iterable[tuple[Pubkey, ContractView, "Future[TransactionErrorType | None]"]]
+    ) -> Iterator[tuple[Pubkey, ContractView]]:
+        for contract_id, contract, simulation in simulations:
+            try:
+                error = simulation.result()
+            except Exception as e:
+                click.echo(f"Failed to simulate contract {contract_id}, sending it anyway: {describe(e)}")
+                yield contract_id, contract
+                continue
+            self.simulated += 1
+            # only program errors doom a contract, the rest can pass on another blockhash, node or attempt
+            if not is_program_error(error):
+                yield contract_id, contract
+                continue
+            reason = describe_tx_error(error)
+            self.doomed[reason] += 1
+            click.echo(f"Skipping contract {contract_id}, simulation failed: {reason}")
+            self._record(contract_id, State.SKIPPED, error=reason)
+
+    def simulation_summary(self) -> None:
+        if not self.simulated:
+            return
+        skipped = sum(self.doomed.values())
+        click.echo(f"Simulation: {self.simulated - skipped} of {self.simulated} contracts passed, {skipped} skipped")
+        for reason, count in self.doomed.most_common():
+            click.echo(f"  {reason}: {count}")
+
+    def cancelled(
+        self, batch: Sequence[tuple[Pubkey, ContractView]], sig: Signature, last_valid_block_height: int
+    ) -> None:
+        for contract_id, _ in batch:
+            click.echo(f"Cancel tx for contract {contract_id}: {sig}")
+            self._record(contract_id, State.SENT, sig)
+        if self.tracker is not None:
+            self.tracker.add(sig, [contract_id for contract_id, _ in batch], last_valid_block_height)
+
+    def resolved(self, pending: PendingTransaction, outcome: Outcome, error: str | None) -> None:
+        for contract_id in pending.contract_ids:
+            click.echo(f"{outcome.capitalize()} cancel tx for contract {contract_id}: {pending.signature}")
+            if outcome != Outcome.UNKNOWN:
+                # an unknown outcome stays sent, resume checks the signature again
+                self._record(contract_id, State(outcome), pending.signature, error)
+
+    def failed(self, contract_id: Pubkey, error: Exception) -> None:
+        message = describe(error)
+        click.echo(f"Failed to cancel contract {contract_id}: {message}")
+        self._record(contract_id, State.FAILED, error=message)
+
+    def pack_failed(self, batch: Sequence[tuple[Pubkey, ContractView]], error: Exception) -> None:
+        click.echo(f"Packed tx for {len(batch)} contracts failed, sending them one by one: {describe(error)}")
+
+    def retrying(self, attempt: int, error: Exception, delay: float) -> None:
+        click.echo(f"Attempt {attempt} failed, retrying in {delay:.1f}s: {describe(error)}")
+
+
+def cancel_batch(
+    runner: Runner, reporter: Reporter, new_recipient: Pubkey, batch: Sequence[tuple[Pubkey, ContractView]]
+) -> None:
+    try:
+        sig, last_valid_block_height = runner.transfer_cancel_batch(new_recipient, batch)
+    except Exception as e:
+        if len(batch) == 1:
+            reporter.failed(batch[0][0], e)
+            return
+        reporter.pack_failed(batch, e)
+        for item in batch:
+            cancel_batch(runner, reporter, new_recipient, [item])
+        return
+    reporter.cancelled(batch, sig, last_valid_block_height)
+
+
+async def cancel_batch_async(
+    runner: AsyncRunner, reporter: Reporter, new_recipient: Pubkey, batch: Sequence[tuple[Pubkey, ContractView]]
+) -> None:
+    try:
+        sig, last_valid_block_height = await runner.transfer_cancel_batch(new_recipient, batch)
+    except Exception as e:
+        if len(batch) == 1:
+            reporter.failed(batch[0][0], e)
+            return
+        reporter.pack_failed(batch, e)
+        for item in batch:
+            await cancel_batch_async(runner, reporter, new_recipient, [item])
+        return
+    reporter.cancelled(batch, sig, last_valid_block_height)
+
+
+async def cancel_concurrently(
+    runner: AsyncRunner,
+    reporter: Reporter,
+    new_recipient: Pubkey,
+    batches: Iterable[Sequence[tuple[Pubkey, ContractView]]],
+    concurrency: int,
+) -> None:
+    try:
+        await run_concurrently(
+            batches, lambda batch: cancel_batch_async(runner, reporter, new_recipient, batch), concurrency
+        )
+    finally:
+        await runner.close()
+
+
+def resume_journal(runner: Runner, journal: Journal, entries: dict[Pubkey, JournalEntry]) -> set[Pubkey]:
+    # contracts whose last transaction is known to have landed are finished, the rest is fetched and sent again
+    finished = {contract_id for contract_id, entry in entries.items() if entry.state in FINISHED_STATES}
+    in_flight = [
+        (contract_id, entry.signature)
+        for contract_id, entry in entries.items()
+        if entry.state == State.SENT and entry.signature
+    ]
+    statuses = runner.get_signature_statuses([signature for _, signature in in_flight])
+    confirmed = 0
+    for (contract_id, signature), status in zip(in_flight, statuses, strict=True):
+        if status is None:
+            continue
+        if status.err:
+            journal.record(contract_id, State.FAILED, signature, str(status.err))
+        elif reached_commitment(status, "confirmed"):
+            journal.record(contract_id, State.CONFIRMED, signature)
+            finished.add(contract_id)
+            confirmed += 1
+    click.echo(
+        f"Resuming from {journal.path}: {len(finished)} contracts finished, "
+        f"{confirmed} of {len(in_flight)} in-flight transactions confirmed"
+    )
+    return finished
+
+
+def start_tracking(
+    runner: Runner, reporter: Reporter, commitment: str, websocket: bool, max_subscriptions: int
+) -> "SignatureSubscriber | None":
+    reporter.tracker = ConfirmationTracker(
+        lambda signatures: runner.get_signature_statuses(signatures, search_history=False),
+        runner.get_block_height,
+        reporter.resolved,
+        commitment,
+    )
+    subscriber = None
+    if websocket:
+        from batch_cancel_cli.subscriptions import SignatureSubscriber
+
+        urls = [endpoint.url for endpoint in runner.pool.endpoints]
+        subscriber = SignatureSubscriber(urls, reporter.tracker, max_subscriptions)
+        subscriber.start()
+    reporter.tracker.start()
+    return subscriber
+
+
+def wait_for_confirmations(tracker: ConfirmationTracker, subscriber: "SignatureSubscriber | None") -> None:
+    click.echo(f"Waiting for {len(tracker)} transactions to reach {tracker.commitment}")
+    tracker.wait()
+    counts = tracker.counts
+    click.echo(
+        f"Transactions: {counts[Outcome.CONFIRMED]} confirmed, {counts[Outcome.FAILED]} failed, "
+        f"{counts[Outcome.EXPIRED]} expired, {counts[Outcome.UNKNOWN]} unknown"
+    )
+    if subscriber is not None:
+        subscriber.stop()
+        stats = subscriber.stats()
+        click.echo(f"Subscriptions: {stats['notifications']} notifications, {stats['reconnects']} reconnects")
+
+
+def print_run_stats(runner: Runner) -> None:
+    stats = runner.blockhash_cache.stats()
+    click.echo(f"Blockhash cache: {stats['hits']} hits, {stats['misses']} misses, {stats['refreshes']} refreshes")
+    pool_stats = runner.pool.stats()
+    click.echo(
+        f"RPC pool: {pool_stats['throttled']} throttled responses, {pool_stats['waited']:.1f}s waited, "
+        f"{pool_stats['hedged']} hedged reads"
+    )
+    for endpoint in pool_stats["endpoints"]:
+        click.echo(
+            f"  {endpoint['url']}: {endpoint['requests']} requests, {endpoint['failures']} failed, "
+            f"{endpoint['latency_ms']}ms latency"
+        )
+    stats = runner.retry.stats()
+    click.echo(f"Retries: {stats['retries']} retried attempts, gave up on {stats['gave_up']} transactions")
+    if runner.cu_profiler is not None:
+        stats = runner.cu_profiler.stats()
+        click.echo(
+            f"Compute unit profiles: {stats['shapes']} shapes from {stats['simulations']} simulations, "
+            f"{stats['hits']} transactions sized from cache"
+        )
+    if runner.priority_fees is not None:
+        stats = runner.priority_fees.stats()
+        click.echo(
+            f"Priority fees: {stats['fetches']} fee lookups, {stats['failures']} failed, "
+            f"up to {stats['highest']} micro-lamports per CU"
+        )
+    stats = runner.pda_cache.stats()
+    click.echo(f"Derivation cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions")
+    summary = runner.metrics.summary()
+    for title, series in (("Stages", summary["stages"]), ("RPC methods", summary["rpc"])):
+        click.echo(f"{title}:")
+        for name, latency in series.items():
+            errors = sum(latency["errors"].values())
+            click.echo(
+                f"  {name}: {latency['calls']} calls, {errors} errors, p50 {latency['p50_ms']}ms, "
+                f"p95 {latency['p95_ms']}ms, p99 {latency['p99_ms']}ms"
+            )
+
+
+def run_stats(runner: Runner) -> dict[str, Any]:
+    stats = {
+        "blockhash_cache": runner.blockhash_cache.stats(),
+        "pool": runner.pool.stats(),
+        "retries": runner.retry.stats(),
+        "derivation_cache": runner.pda_cache.stats(),
+    }
+    if runner.cu_profiler is not None:
+        stats["compute_unit_profiles"] = runner.cu_profiler.stats()
+    if runner.priority_fees is not None:
+        stats["priority_fees"] = runner.priority_fees.stats()
+    return stats
+
+
+def start_profiler(ctx: Context, runner: Runner, kind: str, stages: tuple[str, ...], path: Path | None) -> None:
+    from batch_cancel_cli.profiling import PROFILERS
+
+    profiler = PROFILERS[kind](stages)
+    path = path or Path(f"profile-{kind}{profiler.extension}")
+    runner.metrics.profiler = profiler
+
+    def write() -> None:
+        runner.metrics.profiler = None
+        click.echo(f"Wrote {kind} profile of {', '.join(stages)} to {path}: {profiler.write(path)}")
+
+    ctx.call_on_close(write)
+
+
+def write_metrics(runner: Runner, metrics_file: Path | None, prometheus_file: Path | None) -> None:
+    if metrics_file:
+        runner.metrics.write_json(metrics_file, run_stats(runner))
+    if prometheus_file:
+        runner.metrics.write_prometheus(prometheus_file)
+
+
+def iter_cancel_items(
+    runner: Runner,
+    reporter: Reporter,
+    contract_ids: tuple[Pubkey, ...],
+    ids_file: TextIO | None,
+    sender: Pubkey | None,
+    mint: Pubkey | None,
+    check_claims: bool,
+    finished: set[Pubkey],
+    dedup: bool = True,
+) -> Iterable[tuple[Pubkey, ContractView]]:
+    def claim_filter(c: ContractView) -> bool:
+        return not c.last_withdrawn
+
+    if sender:
+        click.echo(f"Processing contracts of sender {sender}" + (f" and mint {mint}" if mint else ""))
+        found = runner.find_contracts(sender, mint, check_claims)
+        return reporter.skip_missing((cid, contract) for cid, contract in found if cid not in finished)
+    if ids_file:
+        click.echo(f"Processing contracts from {ids_file.name}")
+        ids: Iterable[Pubkey] = read_contract_ids(ids_file, dedup)
+    else:
+        click.echo(f"Processing {len(contract_ids)} contracts")
+        ids = contract_ids
+    if finished:
+        ids = (contract_id for contract_id in ids if contract_id not in finished)
+    return reporter.skip_missing(runner.iter_contracts(ids, claim_filter if check_claims else None))
+
+
+def use_lookup_table(
+    runner: Runner,
+    new_recipient: Pubkey,
+    items: Iterable[tuple[Pubkey, ContractView]],
+    address: Pubkey | None,
+) -> Iterable[tuple[Pubkey, ContractView]]:
+    head, items = spy(items)
+    if not head:
+        return items
+    try:
+        table = runner.prepare_lookup_table(new_recipient, head[0][1], address)
+    except Exception as e:
+        raise click.ClickException(f"Failed to prepare lookup table: {e}") from e
+    click.echo(f"Using lookup table {table.key} with {len(table.addresses)} addresses")
+    return items
+
+
+def cancel_contracts(
+    runner: Runner,
+    reporter: Reporter,
+    new_recipient: Pubkey,
+    items: Iterable[tuple[Pubkey, ContractView]],
+    concurrency: int,
+    pack: bool,
+) -> None:
+    batches = runner.pack_transfer_cancel(new_recipient, items) if pack else ([item] for item in items)
+    if concurrency > 1:
+        async_runner = AsyncRunner.from_runner(runner)
+        asyncio.run(cancel_concurrently(async_runner, reporter, new_recipient, batches, concurrency))
+        return
+    for batch in batches:
+        cancel_batch(runner, reporter, new_recipient, batch)
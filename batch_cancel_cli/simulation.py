@@ -0,0 +1,19 @@
+from solders.transaction_status import InstructionErrorCustom, TransactionErrorInstructionError, TransactionErrorType
+
+
+def _decode_program_error(code: int) -> str | None:
+    try:
+        # the generated decoder needs anchorpy
+        from batch_cancel_cli.client.errors.anchor import from_code
+    except ImportError:
+        return None
+    program_error = from_code(code)
+    return program_error and f"{program_error.name} ({program_error.code})"
+
+
+def describe_tx_error(error: TransactionErrorType) -> str:
+    if not isinstance(error, TransactionErrorInstructionError):
+        return str(error)
+    if isinstance(error.err, InstructionErrorCustom):
+        return _decode_program_error(error.err.code) or f"custom program error {error.err.code:#x}"
+    return str(error.err)
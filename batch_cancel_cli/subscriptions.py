@@ -0,0 +1,221 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Callable, cast
+from urllib.parse import urlsplit, urlunsplit
+
+from solana.rpc.websocket_api import SolanaWsClientProtocol, connect
+from solders.commitment_config import CommitmentLevel
+from solders.errors import SerdeJSONError
+from solders.rpc.config import RpcSignatureSubscribeConfig
+from solders.rpc.requests import SignatureSubscribe, SignatureUnsubscribe
+from solders.rpc.responses import SignatureNotification, SubscriptionError, SubscriptionResult, parse_websocket_message
+from solders.signature import Signature
+from websockets.exceptions import WebSocketException
+from websockets.legacy.client import WebSocketClientProtocol
+
+from batch_cancel_cli.confirmation import ConfirmationTracker, PendingTransaction
+
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+
+def websocket_url(rpc_url: str) -> str:
+    # same rule as web3.js: switch the scheme and, when a port is given, use the next one
+    parts = urlsplit(rpc_url)
+    scheme = {"https": "wss", "http": "ws"}.get(parts.scheme, parts.scheme)
+    netloc = parts.netloc
+    if parts.port is not None:
+        netloc = netloc.rsplit(":", 1)[0] + f":{parts.port + 1}"
+    return urlunsplit((scheme, netloc, parts.path, parts.query, parts.fragment))
+
+
+class _Connection:
+    def __init__(self, ws: SolanaWsClientProtocol):
+        self.ws = ws
+        self.requests: dict[int, Signature] = {}
+        self.subscriptions: dict[Signature, int] = {}
+        self.signatures: dict[int, Signature] = {}
+        self.backlog: deque[Signature] = deque()
+        self.wakeup = asyncio.Event()
+
+    def in_use(self) -> int:
+        return len(self.requests) + len(self.subscriptions)
+
+
+class SignatureSubscriber:
+    """Settles tracked transactions from `signatureSubscribe` notifications.
+
+    Keeps one WebSocket per endpoint on a background event loop and subscribes every signature the tracker gets on each
+    of them, with at most `max_subscriptions` open per connection. Signatures without a live subscription, because of
+    the cap or a dropped socket, stay with the tracker's batched polling until a connection picks them up.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        tracker: ConfirmationTracker,
+        max_subscriptions: int = 1000,
+    ):
+        self.urls = [websocket_url(url) for url in urls]
+        self.tracker = tracker
+        self.max_subscriptions = max_subscriptions
+        self._config = RpcSignatureSubscribeConfig(CommitmentLevel.from_string(tracker.commitment))
+        self.notifications = 0
+        self.reconnects = 0
+        self._connections: set[_Connection] = set()
+        self._loop = asyncio.new_event_loop()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        tracker.on_add = self._added
+        tracker.on_resolve = self._resolved
+
+    def _call_soon(self, callback: Callable[[Signature], None], signature: Signature) -> None:
+        try:
+            self._loop.call_soon_threadsafe(callback, signature)
+        except RuntimeError:
+            # the loop is closed, polling settles what is left
+            pass
+
+    def _added(self, pending: PendingTransaction) -> None:
+        self._call_soon(self._enqueue, pending.signature)
+
+    def _resolved(self, pending: PendingTransaction) -> None:
+        self._call_soon(self._release, pending.signature)
+
+    def _enqueue(self, signature: Signature) -> None:
+        for connection in self._connections:
+            connection.backlog.append(signature)
+            connection.wakeup.set()
+
+    def _release(self, signature: Signature) -> None:
+        # settled elsewhere, free the slot on every connection still subscribed to it
+        for connection in self._connections:
+            if (subscription := connection.subscriptions.pop(signature, None)) is not None:
+                connection.signatures.pop(subscription, None)
+                request = SignatureUnsubscribe(subscription, connection.ws.increment_counter_and_get_id())
+                self._loop.create_task(self._unsubscribe(connection, request))
+                connection.wakeup.set()
+
+    async def _unsubscribe(self, connection: _Connection, request: SignatureUnsubscribe) -> None:
+        try:
+            await connection.ws.send(request.to_json())
+        except WebSocketException:
+            # the subscriptions went away with the socket
+            pass
+
+    async def _subscribe(self, connection: _Connection) -> None:
+        while not self._stopping:
+            await connection.wakeup.wait()
+            connection.wakeup.clear()
+            while connection.backlog and connection.in_use() < self.max_subscriptions:
+                signature = connection.backlog.popleft()
+                if not self.tracker.is_pending(signature) or signature in connection.subscriptions:
+                    continue
+                request = SignatureSubscribe(signature, self._config, connection.ws.increment_counter_and_get_id())
+                connection.requests[request.id] = signature
+                try:
+                    await connection.ws.send(request.to_json())
+                except WebSocketException:
+                    # the receive loop sees the closed socket and reconnects
+                    return
+
+    def _handle(self, connection: _Connection, raw: str | bytes) -> None:
+        try:
+            messages = parse_websocket_message(raw if isinstance(raw, str) else raw.decode())
+        except (ValueError, SerdeJSONError):
+            # unsubscribe acknowledgements and anything else we did not ask for
+            return
+        for message in messages:
+            if isinstance(message, SubscriptionResult):
+                if (signature := connection.requests.pop(message.id, None)) is None:
+                    continue
+                connection.subscriptions[signature] = message.result
+                connection.signatures[message.result] = signature
+                if not self.tracker.watch(signature):
+                    # settled while the subscription was on its way
+                    self._release(signature)
+            elif isinstance(message, SignatureNotification):
+                if (signature := connection.signatures.pop(message.subscription, None)) is None:
+                    continue
+                # the server drops signature subscriptions once they notify
+                connection.subscriptions.pop(signature, None)
+                self.notifications += 1
+                error = message.result.value.err
+                self.tracker.resolve(signature, str(error) if error else None)
+                connection.wakeup.set()
+            elif isinstance(message, SubscriptionError):
+                connection.requests.pop(message.id, None)
+                connection.wakeup.set()
+
+    async def _serve(self, url: str) -> None:
+        async with connect(url, max_size=None) as ws:
+            # `connect` builds its connections with the solana protocol, the stubs only know the websockets one
+            connection = _Connection(cast(SolanaWsClientProtocol, ws))
+            connection.backlog.extend(pending.signature for pending in self.tracker.pending())
+            connection.wakeup.set()
+            self._connections.add(connection)
+            subscriber = asyncio.create_task(self._subscribe(connection))
+            try:
+                while True:
+                    # parse the raw frames here, `SolanaWsClientProtocol.recv` raises on unsubscribe acknowledgements
+                    self._handle(connection, await WebSocketClientProtocol.recv(ws))
+            finally:
+                subscriber.cancel()
+                self._connections.discard(connection)
+                for signature in connection.subscriptions:
+                    self.tracker.unwatch(signature)
+
+    async def _connect(self, url: str) -> None:
+        delay = RECONNECT_DELAY
+        while not self._stopping:
+            try:
+                await self._serve(url)
+            except (OSError, WebSocketException, asyncio.TimeoutError):
+                pass
+            if self._stopping:
+                return
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _main(self) -> None:
+        await asyncio.gather(*(self._connect(url) for url in self.urls))
+
+    def _run(self) -> None:
+        try:
+            self._loop.run_until_complete(self._main())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # let the sockets finish closing before the loop goes, as `asyncio.run` does
+            if leftover := asyncio.all_tasks(self._loop):
+                for task in leftover:
+                    task.cancel()
+                self._loop.run_until_complete(asyncio.gather(*leftover, return_exceptions=True))
+            self._loop.close()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="signature-subscriber", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping = True
+
+        def cancel() -> None:
+            for task in asyncio.all_tasks(self._loop):
+                task.cancel()
+
+        if self._thread is None:
+            self._loop.close()
+            return
+        try:
+            self._loop.call_soon_threadsafe(cancel)
+        except RuntimeError:
+            # every connection already ended and closed the loop
+            pass
+        self._thread.join(timeout=5)
+
+    def stats(self) -> dict[str, int]:
+        return {"notifications": self.notifications, "reconnects": self.reconnects}
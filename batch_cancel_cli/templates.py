@@ -0,0 +1,130 @@
+import struct
+from typing import Callable
+
+from solders.instruction import AccountMeta, Instruction
+from solders.pubkey import Pubkey
+
+from batch_cancel_cli.client.structures import CONTRACT_OFFSETS, ContractView
+
+# sender through streamflow_treasury_tokens and partner, partner_tokens are adjacent in the contract layout
+_ACCOUNTS = struct.Struct("<" + "32s" * 8)
+_ACCOUNTS_OFFSET = CONTRACT_OFFSETS["sender"]
+_PARTNER = struct.Struct("<32s32s")
+_PARTNER_OFFSET = CONTRACT_OFFSETS["partner"]
+
+# Shared metas are interned by key bytes, a run with more distinct senders or mints than this starts over
+MAX_INTERNED = 4096
+
+
+class TransferCancelTemplate:
+    """Builds the transfer_recipient + cancel instruction pair of a contract from precompiled parts.
+
+    Program id, discriminators and the metas of the run-wide accounts (authority, new recipient, programs, sysvars)
+    come from one call to each generated builder. Accounts shared by many contracts, like the mint, the treasury or
+    the sender, are kept as ready `AccountMeta`s keyed by their raw bytes, so a contract only costs the metas of its
+    own metadata and escrow accounts.
+    """
+
+    def __init__(
+        self,
+        program_id: Pubkey,
+        authority: Pubkey,
+        new_recipient: Pubkey,
+        derive_ata: Callable[[Pubkey, Pubkey], Pubkey],
+    ):
+        # imported when a run builds its first template, the generated package loads every instruction at once
+        from batch_cancel_cli.client.instructions import cancel as build_cancel_ix
+        from batch_cancel_cli.client.instructions import transfer_recipient as build_transfer_recipient_ix
+
+        self.program_id = program_id
+        self.new_recipient = new_recipient
+        self.derive_ata = derive_ata
+        placeholder = Pubkey.default()
+        transfer = build_transfer_recipient_ix(
+            {
+                "authority": authority,
+                "new_recipient": new_recipient,
+                "new_recipient_tokens": placeholder,
+                "metadata": placeholder,
+                "mint": placeholder,
+            },
+            program_id,
+        )
+        cancel = build_cancel_ix(
+            {
+                "authority": authority,
+                "sender": placeholder,
+                "sender_tokens": placeholder,
+                "recipient": new_recipient,
+                "recipient_tokens": placeholder,
+                "metadata": placeholder,
+                "escrow_tokens": placeholder,
+                "streamflow_treasury": placeholder,
+                "streamflow_treasury_tokens": placeholder,
+                "partner": placeholder,
+                "partner_tokens": placeholder,
+                "mint": placeholder,
+            },
+            program_id,
+        )
+        self.transfer_data = bytes(transfer.data)
+        self.cancel_data = bytes(cancel.data)
+        self.transfer_metas = list(transfer.accounts)
+        self.cancel_metas = list(cancel.accounts)
+        self._writable: dict[bytes, AccountMeta] = {}
+        self._mints: dict[bytes, tuple[AccountMeta, AccountMeta]] = {}
+
+    def _meta(self, key: bytes) -> AccountMeta:
+        if (meta := self._writable.get(key)) is None:
+            if len(self._writable) >= MAX_INTERNED:
+                self._writable.clear()
+            meta = self._writable[key] = AccountMeta(Pubkey(key), is_signer=False, is_writable=True)
+        return meta
+
+    def _mint(self, key: bytes) -> tuple[AccountMeta, AccountMeta]:
+        # the mint itself and the new recipient's token account for it
+        if (metas := self._mints.get(key)) is None:
+            if len(self._mints) >= MAX_INTERNED:
+                self._mints.clear()
+            mint = Pubkey(key)
+            metas = self._mints[key] = (
+                AccountMeta(mint, is_signer=False, is_writable=False),
+                AccountMeta(self.derive_ata(self.new_recipient, mint), is_signer=False, is_writable=True),
+            )
+        return metas
+
+    def build(self, contract_id: Pubkey, contract: ContractView) -> list[Instruction]:
+        (
+            sender,
+            sender_tokens,
+            _,
+            _,
+            mint,
+            escrow_tokens,
+            treasury,
+            treasury_tokens,
+        ) = _ACCOUNTS.unpack_from(contract.buffer, _ACCOUNTS_OFFSET)
+        partner, partner_tokens = _PARTNER.unpack_from(contract.buffer, _PARTNER_OFFSET)
+        mint_meta, recipient_tokens_meta = self._mint(mint)
+        metadata_meta = AccountMeta(contract_id, is_signer=False, is_writable=True)
+
+        transfer_metas = self.transfer_metas.copy()
+        transfer_metas[2] = recipient_tokens_meta
+        transfer_metas[3] = metadata_meta
+        transfer_metas[4] = mint_meta
+
+        cancel_metas = self.cancel_metas.copy()
+        cancel_metas[1] = self._meta(sender)
+        cancel_metas[2] = self._meta(sender_tokens)
+        cancel_metas[4] = recipient_tokens_meta
+        cancel_metas[5] = metadata_meta
+        cancel_metas[6] = AccountMeta(Pubkey(escrow_tokens), is_signer=False, is_writable=True)
+        cancel_metas[7] = self._meta(treasury)
+        cancel_metas[8] = self._meta(treasury_tokens)
+        cancel_metas[9] = self._meta(partner)
+        cancel_metas[10] = self._meta(partner_tokens)
+        cancel_metas[11] = mint_meta
+        return [
+            Instruction(self.program_id, self.transfer_data, transfer_metas),
+            Instruction(self.program_id, self.cancel_data, cancel_metas),
+        ]
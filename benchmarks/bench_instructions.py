@@ -0,0 +1,52 @@
+"""Per-contract cost of building the transfer_recipient + cancel pair, generated builders vs templates.
+
+    python -m benchmarks.bench_instructions [contracts]
+"""
+import sys
+import time
+from typing import Callable
+
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+
+from batch_cancel_cli.client.structures import ContractView
+from batch_cancel_cli.runner import Runner
+from benchmarks.common import make_contracts
+
+
+def measure(build: Callable[[Pubkey, ContractView], object], contracts: list[tuple[Pubkey, bytes]]) -> float:
+    # fresh views every round, decoding the contract is part of the per-contract cost
+    best = float("inf")
+    for _ in range(5):
+        views = [(contract_id, ContractView(data)) for contract_id, data in contracts]
+        started = time.perf_counter()
+        for contract_id, view in views:
+            build(contract_id, view)
+        best = min(best, time.perf_counter() - started)
+    return best / len(contracts)
+
+
+def main(n: int = 20_000) -> None:
+    runner = Runner("http://127.0.0.1:8899", Keypair())
+    new_recipient = Pubkey.new_unique()
+    contracts = make_contracts(n)
+
+    def generated(contract_id: Pubkey, contract: ContractView) -> object:
+        return [
+            runner.generate_transfer_instruction(new_recipient, contract_id, contract),
+            runner.generate_cancel_instruction(contract_id, contract, new_recipient),
+        ]
+
+    def template(contract_id: Pubkey, contract: ContractView) -> object:
+        return runner.generate_transfer_cancel_instructions(new_recipient, contract_id, contract)
+
+    baseline = measure(generated, contracts)
+    templated = measure(template, contracts)
+    print(f"{n} contracts, best of 5")
+    print(f"  generated builders: {baseline * 1e6:7.2f} us/contract {1 / baseline:10.0f} contracts/s")
+    print(f"  templates:          {templated * 1e6:7.2f} us/contract {1 / templated:10.0f} contracts/s")
+    print(f"  {1 - templated / baseline:.0%} less time per contract")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,28 @@
+import os
+
+from solders.pubkey import Pubkey
+from spl.token.constants import ASSOCIATED_TOKEN_PROGRAM_ID, TOKEN_PROGRAM_ID
+
+from batch_cancel_cli.client.structures import CONTRACT_OFFSETS, CONTRACT_SIZE
+
+MINTS = [bytes(Pubkey.new_unique()) for _ in range(4)]
+TREASURY = bytes(Pubkey.new_unique())
+
+
+def make_contracts(n: int) -> list[tuple[Pubkey, bytes]]:
+    # a handful of mints and one treasury, like a real run; every other key is unique
+    contracts = []
+    for i in range(n):
+        data = bytearray(os.urandom(CONTRACT_SIZE))
+        for name, value in (("mint", MINTS[i % len(MINTS)]), ("streamflow_treasury", TREASURY)):
+            offset = CONTRACT_OFFSETS[name]
+            data[offset : offset + 32] = value
+        contracts.append((Pubkey.new_unique(), bytes(data)))
+    return contracts
+
+
+def derive_ata(pubkey: Pubkey, mint: Pubkey) -> Pubkey:
+    # the uncached derivation, the baseline `PdaCache.derive_ata` is measured against
+    return Pubkey.find_program_address(
+        [bytes(pubkey), bytes(TOKEN_PROGRAM_ID), bytes(mint)], ASSOCIATED_TOKEN_PROGRAM_ID
+    )[0]
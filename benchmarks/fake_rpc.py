@@ -0,0 +1,326 @@
+"""A local stand-in for a Solana JSON-RPC node, enough of one to run `cancel` end to end.
+
+    python -m benchmarks.fake_rpc --port 8899 --latency 0.02 --drop-rate 0.01 --rps 200
+
+Every contract id resolves to a Contract generated from the id itself, so any list of random ids works and repeated
+fetches return the same bytes. Slots advance with the wall clock, sent transactions land on the next slot unless they
+are dropped and finalize 32 slots later. `GET /stats` returns the request counters as JSON.
+"""
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import click
+from solders.hash import Hash
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+from solders.transaction import VersionedTransaction
+
+from batch_cancel_cli.client.structures import CONTRACT_OFFSETS
+from batch_cancel_cli.ratelimit import TokenBucket
+
+# Streamflow allocates metadata accounts at this size, the Contract layout covers the first CONTRACT_SIZE bytes
+ACCOUNT_SIZE = 1104
+SLOT_TIME = 0.4
+BLOCKHASH_VALIDITY = 150
+FINALIZED_AFTER = 32
+UNITS_PER_INSTRUCTION = 30_000
+COMPUTE_BUDGET_PROGRAM = Pubkey.from_string("ComputeBudget111111111111111111111111111111")
+SYSTEM_PROGRAM = "11111111111111111111111111111111"
+
+
+class ContractFactory:
+    """Contract bytes derived from the contract id: one sender, treasury and partner, a few mints, unique escrows."""
+
+    def __init__(self, mints: int = 4, missing_rate: float = 0.0, seed: bytes = b"fake-rpc"):
+        def key(label: str) -> bytes:
+            return hashlib.sha256(seed + label.encode()).digest()
+
+        self.missing_rate = missing_rate
+        self.mints = [key(f"mint{i}") for i in range(mints)]
+        self.template = bytearray(ACCOUNT_SIZE)
+        for name in ("sender", "sender_tokens", "streamflow_treasury", "streamflow_treasury_tokens"):
+            self._put(self.template, name, key(name))
+        # the partner is the treasury itself, as in contracts created without a partner
+        self._put(self.template, "partner", key("streamflow_treasury"))
+        self._put(self.template, "partner_tokens", key("streamflow_treasury_tokens"))
+
+    @staticmethod
+    def _put(data: bytearray, name: str, value: bytes) -> None:
+        offset = CONTRACT_OFFSETS[name]
+        data[offset : offset + len(value)] = value
+
+    def build(self, contract_id: bytes) -> bytes | None:
+        digest = hashlib.blake2b(contract_id, digest_size=64).digest()
+        if int.from_bytes(digest[:4], "little") / 2**32 < self.missing_rate:
+            return None
+        data = self.template.copy()
+        self._put(data, "mint", self.mints[digest[4] % len(self.mints)])
+        self._put(data, "recipient", digest[:32])
+        self._put(data, "recipient_tokens", digest[32:])
+        self._put(data, "escrow_tokens", hashlib.blake2b(digest, digest_size=32).digest())
+        return bytes(data)
+
+
+def encode_account(data: bytes) -> dict[str, Any]:
+    return {
+        "data": [base64.b64encode(data).decode(), "base64"],
+        "executable": False,
+        "lamports": 8_574_720,
+        "owner": SYSTEM_PROGRAM,
+        "rentEpoch": 0,
+        "space": len(data),
+    }
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class FakeNode:
+    """The chain state and the JSON-RPC methods, shared by all request threads."""
+
+    def __init__(self, contracts: ContractFactory, drop_rate: float = 0.0, priority_fee: int = 0):
+        self.contracts = contracts
+        self.drop_rate = drop_rate
+        self.priority_fee = priority_fee
+        self.started = time.monotonic()
+        self.calls: Counter[str] = Counter()
+        self.dropped = 0
+        # signature bytes -> landing slot
+        self._landed: dict[bytes, int] = {}
+        self._lock = threading.Lock()
+
+    def slot(self) -> int:
+        return int((time.monotonic() - self.started) / SLOT_TIME) + 1
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        method = request.get("method", "")
+        with self._lock:
+            self.calls[method] += 1
+        handler = getattr(self, f"rpc_{method}", None)
+        try:
+            if handler is None:
+                raise RpcError(-32601, "Method not found")
+            return {"jsonrpc": "2.0", "id": request.get("id"), "result": handler(*request.get("params", []))}
+        except RpcError as e:
+            error = {"code": e.code, "message": e.message} | ({"data": e.data} if e.data is not None else {})
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": error}
+
+    def _context(self) -> dict[str, int]:
+        return {"slot": self.slot()}
+
+    def rpc_getSlot(self, *_: Any) -> int:  # noqa: N802
+        return self.slot()
+
+    def rpc_getBlockHeight(self, *_: Any) -> int:  # noqa: N802
+        return self.slot()
+
+    def rpc_getHealth(self, *_: Any) -> str:  # noqa: N802
+        return "ok"
+
+    def rpc_getLatestBlockhash(self, *_: Any) -> dict[str, Any]:  # noqa: N802
+        slot = self.slot()
+        blockhash = Hash(hashlib.sha256(slot.to_bytes(8, "little")).digest())
+        return {
+            "context": {"slot": slot},
+            "value": {"blockhash": str(blockhash), "lastValidBlockHeight": slot + BLOCKHASH_VALIDITY},
+        }
+
+    def _account(self, address: str) -> dict[str, Any] | None:
+        data = self.contracts.build(bytes(Pubkey.from_string(address)))
+        return None if data is None else encode_account(data)
+
+    def rpc_getAccountInfo(self, address: str, *_: Any) -> dict[str, Any]:  # noqa: N802
+        return {"context": self._context(), "value": self._account(address)}
+
+    def rpc_getMultipleAccounts(self, addresses: list[str], *_: Any) -> dict[str, Any]:  # noqa: N802
+        return {"context": self._context(), "value": [self._account(address) for address in addresses]}
+
+    @staticmethod
+    def _decode(encoded: str, config: dict[str, Any] | None) -> bytes:
+        if (config or {}).get("encoding", "base58") != "base64":
+            raise RpcError(-32602, "only base64 encoded transactions are supported")
+        return base64.b64decode(encoded)
+
+    def rpc_sendTransaction(self, encoded: str, config: dict[str, Any] | None = None) -> str:  # noqa: N802
+        raw = self._decode(encoded, config)
+        # the first signature follows the one-byte signature count of any tx with fewer than 128 signers
+        signature = raw[1:65]
+        with self._lock:
+            if random.random() < self.drop_rate:
+                self.dropped += 1
+            else:
+                self._landed.setdefault(signature, self.slot() + 1)
+        return str(Signature.from_bytes(signature))
+
+    def _status(self, signature: str, slot: int) -> dict[str, Any] | None:
+        landed = self._landed.get(bytes(Signature.from_string(signature)))
+        if landed is None or landed > slot:
+            return None
+        status = "finalized" if slot - landed >= FINALIZED_AFTER else "confirmed"
+        confirmations = None if status == "finalized" else slot - landed
+        return {
+            "slot": landed,
+            "confirmations": confirmations,
+            "err": None,
+            "confirmationStatus": status,
+            "status": {"Ok": None},
+        }
+
+    def rpc_getSignatureStatuses(self, signatures: list[str], *_: Any) -> dict[str, Any]:  # noqa: N802
+        slot = self.slot()
+        return {"context": {"slot": slot}, "value": [self._status(signature, slot) for signature in signatures]}
+
+    def rpc_simulateTransaction(self, encoded: str, config: dict[str, Any] | None = None) -> dict[str, Any]:  # noqa: N802
+        message = VersionedTransaction.from_bytes(self._decode(encoded, config)).message
+        keys = message.account_keys
+        instructions = sum(keys[ix.program_id_index] != COMPUTE_BUDGET_PROGRAM for ix in message.instructions)
+        return {
+            "context": self._context(),
+            "value": {
+                "err": None,
+                "logs": [],
+                "accounts": None,
+                "unitsConsumed": instructions * UNITS_PER_INSTRUCTION,
+                "returnData": None,
+            },
+        }
+
+    def rpc_getRecentPrioritizationFees(self, *_: Any) -> list[dict[str, int]]:  # noqa: N802
+        slot = self.slot()
+        return [{"slot": slot - i, "prioritizationFee": self.priority_fee} for i in range(BLOCKHASH_VALIDITY)]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "slot": self.slot(),
+                "calls": dict(self.calls),
+                "landed": len(self._landed),
+                "dropped": self.dropped,
+            }
+
+
+class FakeRpcServer(ThreadingHTTPServer):
+    """Serves a FakeNode over HTTP, answering with 429 once `rps` (all requests) or `send_rps` is exceeded."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        node: FakeNode,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rps: float | None = None,
+        send_rps: float | None = None,
+        retry_after: float = 1.0,
+    ):
+        super().__init__(address, FakeRpcHandler)
+        self.node = node
+        self.latency = latency
+        self.jitter = jitter
+        self.retry_after = retry_after
+        self.limiter = TokenBucket(rps, burst=max(int(rps or 0), 1)) if rps else None
+        self.send_limiter = TokenBucket(send_rps, burst=max(int(send_rps or 0), 1)) if send_rps else None
+        self.throttled = 0
+
+    def admit(self, requests: list[dict[str, Any]]) -> bool:
+        sends = sum(request.get("method") == "sendTransaction" for request in requests)
+        admitted = (self.limiter is None or self.limiter.try_acquire(len(requests))) and (
+            not sends or self.send_limiter is None or self.send_limiter.try_acquire(sends)
+        )
+        if not admitted:
+            self.throttled += 1
+        return admitted
+
+    def delay(self) -> float:
+        return self.latency + random.uniform(0, self.jitter) if self.jitter else self.latency
+
+    def stats(self) -> dict[str, Any]:
+        return self.node.stats() | {"throttled": self.throttled}
+
+
+class FakeRpcHandler(BaseHTTPRequestHandler):
+    # keep-alive, like a real node behind a load balancer; headers and body go out in separate writes, so without
+    # TCP_NODELAY every response waits for the client's delayed ACK
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: FakeRpcServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _reply(self, status: int, body: bytes = b"", headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path == "/stats":
+            self._reply(200, json.dumps(self.server.stats()).encode())
+        else:
+            self._reply(404)
+
+    def do_POST(self) -> None:  # noqa: N802
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        requests = body if isinstance(body, list) else [body]
+        if not self.server.admit(requests):
+            self._reply(429, headers={"Retry-After": f"{self.server.retry_after:g}"})
+            return
+        responses = [self.server.node.handle(request) for request in requests]
+        if delay := self.server.delay():
+            time.sleep(delay)
+        self._reply(200, json.dumps(responses if isinstance(body, list) else responses[0]).encode())
+
+
+@click.command(context_settings={"help_option_names": ["-h", "--help"]})
+@click.option("--host", show_default=True, default="127.0.0.1")
+@click.option("--port", show_default=True, default=8899)
+@click.option("--latency", show_default=True, default=0.0, help="Seconds every response is held back")
+@click.option("--jitter", show_default=True, default=0.0, help="Up to this many seconds added to --latency at random")
+@click.option("--drop-rate", show_default=True, default=0.0, help="Share of sent transactions that never land")
+@click.option("--missing-rate", show_default=True, default=0.0, help="Share of contract ids without an account")
+@click.option("--rps", type=float, help="Requests per second before answering 429, unlimited by default")
+@click.option("--send-rps", type=float, help="sendTransaction requests per second before answering 429")
+@click.option("--retry-after", show_default=True, default=1.0, help="Retry-After seconds sent with a 429")
+@click.option("--priority-fee", show_default=True, default=0, help="Recent prioritization fee of every slot")
+def main(
+    host: str,
+    port: int,
+    latency: float,
+    jitter: float,
+    drop_rate: float,
+    missing_rate: float,
+    rps: float | None,
+    send_rps: float | None,
+    retry_after: float,
+    priority_fee: int,
+) -> None:
+    node = FakeNode(ContractFactory(missing_rate=missing_rate), drop_rate, priority_fee)
+    server = FakeRpcServer((host, port), node, latency, jitter, rps, send_rps, retry_after)
+    click.echo(f"Serving fake RPC on http://{host}:{server.server_port}", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
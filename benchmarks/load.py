@@ -0,0 +1,117 @@
+"""End-to-end throughput of `cancel` against the local fake RPC node.
+
+    python -m benchmarks.load                                   # 100k contracts, one tx per contract
+    python -m benchmarks.load -n 20000 --cancel-opts "--pack -c 16" --latency 0.02 --drop-rate 0.01
+    python -m benchmarks.load --rps 500 --cli-opts "--rps 400"  # the node answers 429 above 500 requests/s
+
+The node runs in its own process so it doesn't compete with the client for the GIL. The harness writes random
+contract ids to a file and runs the real `cancel` command on them in this process, with its output discarded.
+"""
+import contextlib
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Iterator
+
+import click
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+
+from batch_cancel_cli.cli import cli as batch_cancel_cli
+
+STARTUP_TIMEOUT = 10.0
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def node_stats(url: str) -> dict[str, Any]:
+    with urllib.request.urlopen(f"{url}/stats", timeout=5) as response:
+        return json.loads(response.read())
+
+
+@contextlib.contextmanager
+def fake_node(node_args: list[str]) -> Iterator[str]:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.fake_rpc", "--port", str(port), *node_args])
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                node_stats(url)
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise click.ClickException("Fake RPC node did not start") from None
+                time.sleep(0.1)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def write_ids(path: Path, n: int) -> None:
+    with open(path, "w") as w:
+        w.writelines(f"{Pubkey(os.urandom(32))}\n" for _ in range(n))
+
+
+@click.command(context_settings={"help_option_names": ["-h", "--help"]})
+@click.option("-n", "--contracts", show_default=True, default=100_000, help="Contracts to cancel")
+@click.option("--cli-opts", default="", help="Extra options for the cli group, e.g. '--rps 400 --auto-cu'")
+@click.option("--cancel-opts", show_default=True, default="-c 16", help="Extra options for cancel, e.g. '--pack'")
+@click.option("--latency", show_default=True, default=0.0, help="Seconds the node holds back every response")
+@click.option("--jitter", show_default=True, default=0.0, help="Up to this many seconds added to --latency at random")
+@click.option("--drop-rate", show_default=True, default=0.0, help="Share of sent transactions that never land")
+@click.option("--missing-rate", show_default=True, default=0.0, help="Share of contract ids without an account")
+@click.option("--rps", type=float, help="Requests per second before the node answers 429")
+@click.option("--send-rps", type=float, help="sendTransaction requests per second before the node answers 429")
+def main(
+    contracts: int,
+    cli_opts: str,
+    cancel_opts: str,
+    latency: float,
+    jitter: float,
+    drop_rate: float,
+    missing_rate: float,
+    rps: float | None,
+    send_rps: float | None,
+) -> None:
+    node_args = ["--latency", str(latency), "--jitter", str(jitter), "--drop-rate", str(drop_rate)]
+    node_args += ["--missing-rate", str(missing_rate)]
+    node_args += ["--rps", str(rps)] if rps else []
+    node_args += ["--send-rps", str(send_rps)] if send_rps else []
+    with tempfile.TemporaryDirectory() as tmp, fake_node(node_args) as url:
+        ids = Path(tmp) / "ids.txt"
+        write_ids(ids, contracts)
+        args = ["--key", str(Keypair()), "--rpc", url, *shlex.split(cli_opts)]
+        args += ["cancel", "--ids-file", str(ids), "-r", str(Pubkey.new_unique()), *shlex.split(cancel_opts)]
+        click.echo(f"Cancelling {contracts} contracts against {url}: {' '.join(args[2:])}")
+        started = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            batch_cancel_cli.main(args, prog_name="batch_cancel_cli", standalone_mode=False)
+        elapsed = time.perf_counter() - started
+        stats = node_stats(url)
+
+    calls = stats["calls"]
+    sent = calls.get("sendTransaction", 0)
+    click.echo(f"Elapsed: {elapsed:.1f}s")
+    click.echo(f"Throughput: {contracts / elapsed:,.0f} contracts/s, {sent / elapsed:,.0f} transactions/s")
+    click.echo(f"Transactions: {sent} sent, {stats['landed']} landed, {stats['dropped']} dropped")
+    click.echo(f"Node: {sum(calls.values())} calls, {stats['throttled']} requests answered with 429")
+    for method, count in sorted(calls.items(), key=lambda item: -item[1]):
+        click.echo(f"  {method}: {count}")
+
+
+if __name__ == "__main__":
+    main()
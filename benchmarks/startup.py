@@ -0,0 +1,108 @@
+"""Cold start of the CLI, the time from launching the interpreter to the command's first output.
+
+    python -m benchmarks.startup                    # fail when a case goes over its budget
+    python -m benchmarks.startup --top 15           # list more of the slowest imports per case
+
+Every case runs the real entry point in a fresh interpreter, the best of --rounds counts. Budgets apply to the time on
+top of a bare `python -c pass`, so they hold on slower machines as long as the interpreter itself is slow there too.
+The slowest top-level imports of each case come from `python -X importtime`, leaving out what the bare interpreter
+imports anyway.
+"""
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+import click
+from solders.keypair import Keypair
+
+CLI = ["-m", "batch_cancel_cli.cli"]
+BARE = ["-c", "pass"]
+# Installs and the binary ship compiled modules, launches may write the bytecode cache even if this shell doesn't
+ENV = {name: value for name, value in os.environ.items() if name != "PYTHONDONTWRITEBYTECODE"}
+# Seconds each case may take over a bare interpreter
+HELP_BUDGET = 0.15
+CREATE_BUDGET = 0.35
+
+
+@dataclass
+class Case:
+    name: str
+    args: list[str]
+    budget: float
+
+
+def cases(help_budget: float = HELP_BUDGET, create_budget: float = CREATE_BUDGET) -> list[Case]:
+    return [
+        Case("-h", [*CLI, "-h"], help_budget),
+        Case("create -h", [*CLI, "--key", str(Keypair()), "create", "-h"], create_budget),
+    ]
+
+
+def run(args: list[str]) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, *args], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=ENV, check=True)
+    return time.perf_counter() - started
+
+
+def best_of(args: list[str], rounds: int) -> float:
+    run(args)  # warm up the bytecode cache
+    return min(run(args) for _ in range(rounds))
+
+
+def import_times(args: list[str]) -> dict[str, float]:
+    """Cumulative seconds per top-level import."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        env=ENV,
+        text=True,
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # nested imports are indented below their importer
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+@click.command(context_settings={"help_option_names": ["-h", "--help"]})
+@click.option("--rounds", show_default=True, default=10, help="Launches per case, the fastest one counts")
+@click.option("--top", show_default=True, default=5, help="Slowest top-level imports to list per case")
+@click.option(
+    "--help-budget", show_default=True, default=HELP_BUDGET, help="Seconds `-h` may take over a bare interpreter"
+)
+@click.option(
+    "--create-budget",
+    show_default=True,
+    default=CREATE_BUDGET,
+    help="Seconds `create -h` may take over a bare interpreter, it builds the runner like `create` does",
+)
+def main(rounds: int, top: int, help_budget: float, create_budget: float) -> None:
+    interpreter = best_of(BARE, rounds)
+    preloaded = set(import_times(BARE))
+    click.echo(f"Bare interpreter: {interpreter * 1000:.0f}ms")
+    over_budget = []
+    for case in cases(help_budget, create_budget):
+        elapsed = best_of(case.args, rounds) - interpreter
+        status = "ok" if elapsed <= case.budget else "OVER BUDGET"
+        click.echo(
+            f"{case.name}: {elapsed * 1000:.0f}ms over the interpreter, budget {case.budget * 1000:.0f}ms {status}"
+        )
+        if elapsed > case.budget:
+            over_budget.append(case.name)
+        imports = {name: seconds for name, seconds in import_times(case.args).items() if name not in preloaded}
+        for name, seconds in sorted(imports.items(), key=lambda item: -item[1])[:top]:
+            click.echo(f"  {name}: {seconds * 1000:.1f}ms")
+    if over_budget:
+        click.echo(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Benchmarks for the per-contract hot path: decoding, derivations, instruction building, signing.
+
+    python -m benchmarks.suite                 # compare against benchmarks/baseline.json
+    python -m benchmarks.suite --save          # store the results as the new baseline
+    python -m benchmarks.suite -k derive_ata   # only cases whose name contains derive_ata
+
+Every case runs once per contract over a fresh set of inputs. Allocations are the Python memory blocks each op leaves
+referenced by its result, counted with tracemalloc in a separate pass so tracing does not slow down the timed rounds.
+Baselines only compare runs on the same machine.
+"""
+import gc
+import json
+import math
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Sequence
+
+import click
+from solders.hash import Hash
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+
+from batch_cancel_cli.blockhash import BlockhashCache
+from batch_cancel_cli.client.instructions.create import layout as create_layout
+from batch_cancel_cli.client.structures import Contract, ContractView
+from batch_cancel_cli.runner import Runner, build_create_args, serialize_tx
+from benchmarks.common import derive_ata, make_contracts
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+# inputs of one op, built fresh for every round so no case can reuse work from the previous one
+Inputs = list[tuple[Any, ...]]
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    setup: Callable[[list[tuple[Pubkey, bytes]]], Inputs]
+    op: Callable[..., Any]
+    # slow cases run over this share of the contracts to keep the suite short
+    share: float = 1.0
+
+
+@dataclass(frozen=True)
+class Result:
+    ops_per_sec: float
+    allocs_per_op: float
+    bytes_per_op: float
+
+
+def offline_runner() -> Runner:
+    # nothing here talks to an RPC, the blockhash cache hands out a fixed hash
+    runner = Runner("http://127.0.0.1:8899", Keypair())
+    runner.blockhash_cache = BlockhashCache(lambda: (Hash.new_unique(), 0), ttl=math.inf)
+    return runner
+
+
+def cases() -> list[Case]:
+    runner = offline_runner()
+    new_recipient = Pubkey.new_unique()
+    owner = Pubkey.new_unique()
+    blockhash = Hash.new_unique()
+
+    def views(contracts: list[tuple[Pubkey, bytes]]) -> Inputs:
+        return [(contract_id, ContractView(data)) for contract_id, data in contracts]
+
+    def raw(contracts: list[tuple[Pubkey, bytes]]) -> Inputs:
+        return [(data,) for _, data in contracts]
+
+    def mints(contracts: list[tuple[Pubkey, bytes]]) -> Inputs:
+        return [(owner, ContractView(data).mint) for _, data in contracts]
+
+    def pairs(contracts: list[tuple[Pubkey, bytes]]) -> Inputs:
+        return [
+            (runner.generate_transfer_cancel_instructions(new_recipient, contract_id, ContractView(data)),)
+            for contract_id, data in contracts
+        ]
+
+    def create_args(contracts: list[tuple[Pubkey, bytes]]) -> Inputs:
+        return [(build_create_args(1_000_000 + i, 30, 1_000, f"stream {i}"),) for i in range(len(contracts))]
+
+    def view_fields(data: bytes) -> Any:
+        contract = ContractView.from_bytes(data)
+        return contract.sender, contract.mint, contract.escrow_tokens, contract.partner_tokens, contract.closed
+
+    def signed_tx(ixs: Sequence[Any]) -> bytes:
+        tx = runner.generate_tx(*ixs)
+        tx.sign(runner.signer)
+        return serialize_tx(tx)
+
+    def signed_v0_tx(ixs: Sequence[Any]) -> bytes:
+        return serialize_tx(runner.build_v0_tx(blockhash, *ixs))
+
+    return [
+        # podite adds `from_bytes` when it decorates the class
+        Case("Contract.from_bytes", raw, Contract.from_bytes, share=0.05),  # type: ignore[attr-defined]
+        Case("ContractView.from_bytes+fields", raw, view_fields),
+        Case("derive_ata", mints, derive_ata),
+        Case("PdaCache.derive_ata", mints, runner.pda_cache.derive_ata),
+        Case(
+            "generate_transfer_instruction",
+            views,
+            lambda contract_id, contract: runner.generate_transfer_instruction(new_recipient, contract_id, contract),
+        ),
+        Case(
+            "generate_cancel_instruction",
+            views,
+            lambda contract_id, contract: runner.generate_cancel_instruction(contract_id, contract, new_recipient),
+        ),
+        Case(
+            "generate_transfer_cancel_instructions",
+            views,
+            lambda contract_id, contract: runner.generate_transfer_cancel_instructions(
+                new_recipient, contract_id, contract
+            ),
+        ),
+        Case("generate_tx+sign+serialize", pairs, signed_tx),
+        Case("build_v0_tx+serialize", pairs, signed_v0_tx),
+        Case("create layout.build", create_args, create_layout.build),
+    ]
+
+
+def time_case(case: Case, contracts: list[tuple[Pubkey, bytes]], rounds: int) -> float:
+    contracts = contracts[: max(int(len(contracts) * case.share), 1)]
+    best = math.inf
+    op = case.op
+    for _ in range(rounds):
+        inputs = case.setup(contracts)
+        gc.collect()
+        started = time.perf_counter()
+        for args in inputs:
+            op(*args)
+        best = min(best, time.perf_counter() - started)
+    return len(contracts) / best
+
+
+def count_allocations(case: Case, contracts: list[tuple[Pubkey, bytes]]) -> tuple[float, float]:
+    contracts = contracts[: max(int(len(contracts) * case.share), 1)]
+    inputs = case.setup(contracts)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [case.op(*args) for args in inputs]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    del results
+    return blocks / len(contracts), size / len(contracts)
+
+
+def load_baseline(path: Path) -> dict[str, dict[str, float]]:
+    return json.loads(path.read_text())["results"] if path.exists() else {}
+
+
+@click.command(context_settings={"help_option_names": ["-h", "--help"]})
+@click.option("-n", "--contracts", show_default=True, default=5_000, help="Contracts per round")
+@click.option("--rounds", show_default=True, default=7, help="Timed rounds per case, the best one counts")
+@click.option("-k", "--filter", "filter_", help="Only run cases whose name contains this")
+@click.option(
+    "--baseline",
+    show_default=True,
+    default=str(BASELINE),
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Results to compare against",
+)
+@click.option("--save", is_flag=True, help="Write the results to --baseline instead of comparing")
+@click.option(
+    "--tolerance",
+    show_default=True,
+    default=0.25,
+    help="Share of ops/sec a case may lose against the baseline before it counts as a regression",
+)
+def main(contracts: int, rounds: int, filter_: str | None, baseline: Path, save: bool, tolerance: float) -> None:
+    fixtures = make_contracts(contracts)
+    previous = {} if save else load_baseline(baseline)
+    results: dict[str, Result] = {}
+    regressions = []
+    click.echo(f"{'case':40} {'ops/s':>12} {'us/op':>8} {'allocs/op':>10} {'B/op':>8} {'vs baseline':>12}")
+    for case in cases():
+        if filter_ and filter_ not in case.name:
+            continue
+        ops_per_sec = time_case(case, fixtures, rounds)
+        allocs, size = count_allocations(case, fixtures)
+        results[case.name] = Result(ops_per_sec, allocs, size)
+        change = ""
+        if reference := previous.get(case.name):
+            delta = ops_per_sec / reference["ops_per_sec"] - 1
+            change = f"{delta:+.1%}"
+            if delta < -tolerance:
+                regressions.append(case.name)
+                change += " !"
+        click.echo(
+            f"{case.name:40} {ops_per_sec:12,.0f} {1e6 / ops_per_sec:8.2f} {allocs:10.1f} {size:8.0f} {change:>12}"
+        )
+    if save:
+        baseline.write_text(
+            json.dumps(
+                {
+                    "python": sys.version.split()[0],
+                    "contracts": contracts,
+                    "results": {name: asdict(result) for name, result in results.items()},
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        click.echo(f"Saved baseline to {baseline}")
+    if regressions:
+        click.echo(f"Regressions over {tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Stub JSON-RPC node for runner tests, answering each method from a handler of its params."""
+import base64
+import json
+from collections import Counter
+from typing import Any, Callable
+
+import httpx
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+from solders.transaction import VersionedTransaction
+
+from batch_cancel_cli.client.structures import ContractView
+from batch_cancel_cli.runner import Runner
+
+from .test_structures import encode
+
+BLOCKHASH = "EkSnNWid2cvwEVnVx9aBqawnmiCNiDgp3gUdkDPTKN1N"
+SHARED_FIELDS = (
+    "mint",
+    "sender",
+    "sender_tokens",
+    "partner",
+    "partner_tokens",
+    "streamflow_treasury",
+    "streamflow_treasury_tokens",
+)
+
+
+def context(value: Any, slot: int = 1) -> dict[str, Any]:
+    return {"context": {"slot": slot}, "value": value}
+
+
+def decode_tx(params: list[Any]) -> VersionedTransaction:
+    return VersionedTransaction.from_bytes(base64.b64decode(params[0]))
+
+
+class RpcStub:
+    def __init__(self, **handlers: Callable[[list[Any]], Any]):
+        self.handlers: dict[str, Callable[[list[Any]], Any]] = {
+            "getLatestBlockhash": lambda params: context({"blockhash": BLOCKHASH, "lastValidBlockHeight": 100}),
+            "getBlockHeight": lambda params: 10,
+        } | handlers
+        self.calls: Counter[str] = Counter()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.calls[body["method"]] += 1
+        result = self.handlers[body["method"]](body.get("params", []))
+        return httpx.Response(200, json={"jsonrpc": "2.0", "result": result, "id": body["id"]})
+
+
+def stub_runner(stub: RpcStub) -> Runner:
+    runner = Runner("http://rpc", Keypair(), Pubkey.new_unique())
+    runner.client._provider.session = httpx.Client(transport=httpx.MockTransport(stub))
+    return runner
+
+
+def new_key() -> list[int]:
+    return list(bytes(Pubkey.new_unique()))
+
+
+def contract_items(n: int) -> list[tuple[Pubkey, ContractView]]:
+    # contracts of one sender and mint, as a run cancels them
+    shared = {name: new_key() for name in SHARED_FIELDS}
+    return [
+        (Pubkey.new_unique(), ContractView.from_bytes(encode(**shared, recipient=new_key(), escrow_tokens=new_key())))
+        for _ in range(n)
+    ]
@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+import types
+from typing import Callable
+
+import pytest
+from solders.hash import Hash
+
+from batch_cancel_cli import blockhash
+from batch_cancel_cli.blockhash import REFRESH_AT, BlockhashCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class Chain:
+    """Hands out a new blockhash per fetch, valid for `validity` blocks past the current height."""
+
+    def __init__(self, validity: int = 150):
+        self.validity = validity
+        self.height = 10
+        self.fetched: list[Hash] = []
+        self.height_reads = 0
+
+    def fetch_blockhash(self) -> tuple[Hash, int]:
+        self.fetched.append(Hash.new_unique())
+        return self.fetched[-1], self.height + self.validity
+
+    def fetch_block_height(self) -> int:
+        self.height_reads += 1
+        return self.height
+
+
+@pytest.fixture()
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(blockhash, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+@pytest.fixture()
+def chain() -> Chain:
+    return Chain()
+
+
+@pytest.fixture()
+def cache(chain):
+    caches: list[BlockhashCache] = []
+
+    def cache(poll_interval: float = 60.0, **kwargs) -> BlockhashCache:
+        caches.append(
+            BlockhashCache(chain.fetch_blockhash, chain.fetch_block_height, poll_interval=poll_interval, **kwargs)
+        )
+        return caches[-1]
+
+    yield cache
+    for started in caches:
+        started.stop()
+
+
+def eventually(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_blockhash_is_reused_until_the_ttl(clock, chain, cache):
+    hashes = cache(ttl=20)
+    first = hashes.get()
+    clock.now += 19.9
+    assert hashes.get() == first
+    clock.now += 0.1
+    assert hashes.get() != first
+    assert len(chain.fetched) == 2
+    assert hashes.stats() == {"hits": 1, "misses": 2, "refreshes": 0}
+
+
+def test_invalidate_forces_a_fetch(clock, chain, cache):
+    hashes = cache()
+    first = hashes.get()
+    hashes.invalidate()
+    assert hashes.get() != first
+    assert hashes.stats()["misses"] == 2
+
+
+def test_async_callers_share_the_cache(clock, chain, cache):
+    hashes = cache(ttl=20)
+
+    async def get_twice() -> list[Hash]:
+        return [await hashes.get_async(), await hashes.get_async()]
+
+    assert asyncio.run(get_twice()) == chain.fetched * 2
+    assert hashes.stats() == {"hits": 1, "misses": 1, "refreshes": 0}
+
+
+def test_concurrent_misses_fetch_once(clock, chain, cache):
+    release = threading.Event()
+
+    def slow_fetch() -> tuple[Hash, int]:
+        release.wait(5)
+        return chain.fetch_blockhash()
+
+    hashes = BlockhashCache(slow_fetch, poll_interval=60)
+    results: list[Hash] = []
+    threads = [threading.Thread(target=lambda: results.append(hashes.get())) for _ in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+    finally:
+        hashes.stop()
+    assert len(chain.fetched) == 1
+    assert results == chain.fetched * 8
+
+
+def test_background_refresh_ahead_of_the_ttl(clock, chain, cache):
+    hashes = cache(poll_interval=0.005, ttl=20)
+    first = hashes.get()
+    clock.now += 20 * REFRESH_AT
+    eventually(lambda: hashes.stats()["refreshes"] == 1)
+    # the foreground never misses, it gets the refreshed blockhash from the cache
+    assert hashes.get() == chain.fetched[-1] != first
+    assert hashes.stats()["misses"] == 1
+
+
+def test_background_refresh_near_the_last_valid_block_height(clock, chain, cache):
+    hashes = cache(poll_interval=0.005, refresh_margin=40)
+    first = hashes.get_entry()
+    assert first.last_valid_block_height == 160
+    chain.height = 119
+    eventually(lambda: chain.height_reads >= 3)
+    assert hashes.stats()["refreshes"] == 0
+
+    chain.height = 120
+    eventually(lambda: hashes.stats()["refreshes"] == 1)
+    assert hashes.get_entry().last_valid_block_height == 270
+
+
+def test_failed_refresh_keeps_the_cached_blockhash(clock, chain, cache):
+    hashes = cache(poll_interval=0.005, ttl=20)
+    first = hashes.get()
+
+    def down() -> int:
+        chain.height_reads += 1
+        raise ConnectionError("node is down")
+
+    hashes.fetch_block_height = down
+    eventually(lambda: chain.height_reads >= 3)
+    assert hashes.get() == first
+
+
+def test_stop_ends_the_refresh_thread(clock, chain, cache):
+    hashes = cache(poll_interval=0.005, ttl=20)
+    hashes.get()
+    thread = hashes._thread
+    assert thread is not None
+    assert thread.is_alive()
+    hashes.stop()
+    thread.join(5)
+    assert not thread.is_alive()
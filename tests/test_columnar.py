@@ -0,0 +1,71 @@
+import random
+import struct
+from typing import Any
+
+import pytest
+from solders.pubkey import Pubkey
+
+from batch_cancel_cli.client.contract import Contract
+from batch_cancel_cli.client.structures import CONTRACT_LAYOUT, CONTRACT_SIZE
+
+from .test_structures import encode, normalize
+
+np = pytest.importorskip("numpy")
+from batch_cancel_cli.columnar import CONTRACT_DTYPE, ContractBatch, decode_contracts  # noqa: E402
+
+
+def column_value(value: Any) -> Any:
+    # byte arrays come back as uint8 rows, floats as float32 scalars
+    if isinstance(value, np.ndarray):
+        return bytes(value)
+    if isinstance(value, np.floating):
+        return struct.pack("<f", value)
+    return int(value)
+
+
+def assert_decoded(batch: ContractBatch, index: int, data: bytes) -> None:
+    expected = Contract.from_bytes(data[:CONTRACT_SIZE])
+    for name, _ in CONTRACT_LAYOUT:
+        assert column_value(batch[name][index]) == normalize(getattr(expected, name)), name
+
+
+def test_dtype_matches_the_layout():
+    assert CONTRACT_DTYPE.itemsize == CONTRACT_SIZE
+    assert list(CONTRACT_DTYPE.names) == [name for name, _ in CONTRACT_LAYOUT]
+
+
+def test_decode_matches_podite():
+    rng = random.Random(0)
+    datas = [rng.randbytes(CONTRACT_SIZE) for _ in range(20)]
+    datas.append(encode(sender=list(range(32)), net_amount_deposited=2**64 - 1, closed=1))
+    ids = [Pubkey.new_unique() for _ in datas]
+    batch = decode_contracts(ids, datas)
+    assert len(batch) == len(datas)
+    assert batch.ids == ids
+    assert batch.exists.all()
+    for index, data in enumerate(datas):
+        assert_decoded(batch, index, data)
+
+
+def test_missing_and_short_accounts_are_zeroed_and_flagged():
+    data = encode(withdrawn_amount=7) + b"\x01" * 100
+    datas = [None, data, bytes(CONTRACT_SIZE - 1)]
+    batch = decode_contracts([Pubkey.new_unique() for _ in datas], datas)
+    assert batch.exists.tolist() == [False, True, False]
+    assert batch["withdrawn_amount"].tolist() == [0, 7, 0]
+    # the bytes past the contract are ignored
+    assert_decoded(batch, 1, data)
+
+
+def test_concatenate_keeps_the_order():
+    first = [encode(withdrawn_amount=i) for i in range(3)]
+    second = [encode(withdrawn_amount=i) for i in range(3, 5)]
+    batches = [
+        decode_contracts([Pubkey.new_unique() for _ in first], first),
+        decode_contracts([Pubkey.new_unique() for _ in second], [*second[:1], None]),
+    ]
+    batch = ContractBatch.concatenate(batches)
+    assert batch.ids == batches[0].ids + batches[1].ids
+    assert batch["withdrawn_amount"].tolist() == [0, 1, 2, 3, 0]
+    assert batch.exists.tolist() == [True, True, True, True, False]
+    assert len(ContractBatch.concatenate([])) == 0
@@ -0,0 +1,163 @@
+from typing import Sequence
+
+import pytest
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+from solders.transaction_status import (
+    TransactionConfirmationStatus,
+    TransactionErrorFieldless,
+    TransactionStatus,
+)
+
+from batch_cancel_cli.confirmation import ConfirmationTracker, Outcome
+
+
+def status(
+    confirmation_status: TransactionConfirmationStatus | None = TransactionConfirmationStatus.Confirmed,
+    err: TransactionErrorFieldless | None = None,
+    confirmations: int | None = 1,
+) -> TransactionStatus:
+    return TransactionStatus(1, confirmations, None, err, confirmation_status)
+
+
+class Node:
+    """getSignatureStatuses and getBlockHeight over dicts, either of them can be taken down."""
+
+    def __init__(self) -> None:
+        self.statuses: dict[Signature, TransactionStatus] = {}
+        self.block_height = 10
+        self.down = False
+        self.polled: list[list[Signature]] = []
+
+    def get_statuses(self, signatures: Sequence[Signature]) -> list[TransactionStatus | None]:
+        if self.down:
+            raise ConnectionError("node is down")
+        self.polled.append(list(signatures))
+        return [self.statuses.get(signature) for signature in signatures]
+
+    def get_block_height(self) -> int:
+        if self.down:
+            raise ConnectionError("node is down")
+        return self.block_height
+
+
+@pytest.fixture()
+def node() -> Node:
+    return Node()
+
+
+@pytest.fixture()
+def results() -> dict[Signature, tuple[Outcome, str | None]]:
+    return {}
+
+
+@pytest.fixture()
+def tracker(node, results) -> ConfirmationTracker:
+    return ConfirmationTracker(
+        node.get_statuses,
+        node.get_block_height,
+        lambda pending, outcome, error: results.__setitem__(pending.signature, (outcome, error)),
+        poll_interval=0,
+        max_failures=3,
+    )
+
+
+def send(tracker: ConfirmationTracker, last_valid_block_height: int = 20) -> Signature:
+    signature = Signature.new_unique()
+    tracker.add(signature, [Pubkey.new_unique()], last_valid_block_height)
+    return signature
+
+
+def test_resolves_at_the_commitment(node, tracker, results):
+    confirmed, failed, processed = send(tracker), send(tracker), send(tracker)
+    node.statuses[confirmed] = status()
+    node.statuses[failed] = status(err=TransactionErrorFieldless.AccountInUse)
+    node.statuses[processed] = status(TransactionConfirmationStatus.Processed)
+    tracker.poll()
+    assert results == {
+        confirmed: (Outcome.CONFIRMED, None),
+        failed: (Outcome.FAILED, str(TransactionErrorFieldless.AccountInUse)),
+    }
+    assert len(tracker) == 1
+
+    # rooted transactions come back without a confirmation status
+    node.statuses[processed] = status(None, confirmations=None)
+    tracker.poll()
+    assert results[processed] == (Outcome.CONFIRMED, None)
+    assert tracker.counts == {Outcome.CONFIRMED: 2, Outcome.FAILED: 1, Outcome.EXPIRED: 0, Outcome.UNKNOWN: 0}
+
+
+def test_expires_once_the_block_height_passes(node, tracker, results):
+    signature = send(tracker, last_valid_block_height=20)
+    node.block_height = 20
+    tracker.poll()
+    assert not results
+
+    node.block_height = 21
+    tracker.poll()
+    assert results == {signature: (Outcome.EXPIRED, None)}
+
+
+def test_seen_signatures_do_not_expire(node, tracker, results):
+    signature = send(tracker, last_valid_block_height=20)
+    node.statuses[signature] = status(TransactionConfirmationStatus.Processed)
+    node.block_height = 30
+    tracker.poll()
+    assert not results
+    assert tracker.is_pending(signature)
+
+
+def test_watched_signatures_are_polled_only_to_expire(node, tracker, results):
+    watched, polled = send(tracker, last_valid_block_height=20), send(tracker)
+    assert tracker.watch(watched)
+    tracker.poll()
+    assert node.polled == [[polled]]
+
+    tracker.resolve(watched, "InstructionError")
+    assert results[watched] == (Outcome.FAILED, "InstructionError")
+    assert not tracker.watch(watched)
+
+    expiring = send(tracker, last_valid_block_height=20)
+    tracker.watch(expiring)
+    node.block_height = 21
+    tracker.poll()
+    assert results[expiring] == (Outcome.EXPIRED, None)
+
+
+def test_wait_returns_once_everything_settled(node, tracker, results):
+    signature = send(tracker)
+    node.statuses[signature] = status()
+    tracker.wait()
+    assert results == {signature: (Outcome.CONFIRMED, None)}
+
+
+def test_wait_gives_up_on_a_node_that_stays_down(node, tracker, results):
+    first, second = send(tracker), send(tracker)
+    node.down = True
+    tracker.wait()
+    assert results == {first: (Outcome.UNKNOWN, None), second: (Outcome.UNKNOWN, None)}
+    assert tracker.counts[Outcome.UNKNOWN] == 2
+    assert not len(tracker)
+
+
+def test_wait_counts_consecutive_failures_only(node, tracker, results):
+    signature = send(tracker)
+    failures = iter([True, True, False, True, True, False])
+
+    def get_block_height() -> int:
+        if next(failures):
+            raise ConnectionError("node is down")
+        return node.block_height
+
+    tracker.get_block_height = get_block_height
+    node.statuses[signature] = status(TransactionConfirmationStatus.Processed)
+
+    def get_statuses(signatures: Sequence[Signature]) -> list[TransactionStatus | None]:
+        # confirmed on the second successful poll
+        if len(node.polled) == 1:
+            node.statuses[signature] = status()
+        return Node.get_statuses(node, signatures)
+
+    tracker.get_statuses = get_statuses
+    tracker.wait()
+    assert results == {signature: (Outcome.CONFIRMED, None)}
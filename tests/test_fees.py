@@ -0,0 +1,101 @@
+import httpx
+import pytest
+from solana.exceptions import SolanaRpcException
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+
+from batch_cancel_cli import fees
+from batch_cancel_cli.fees import PriorityFeePolicy
+from batch_cancel_cli.retry import ErrorKind, classify
+from batch_cancel_cli.runner import Runner
+
+ACCOUNTS = [Pubkey.new_unique() for _ in range(3)]
+OTHER_ACCOUNTS = [Pubkey.new_unique()]
+NEW_ACCOUNTS = [Pubkey.new_unique()]
+
+
+class Fees:
+    def __init__(self, *results: list[int] | Exception):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self, accounts: list[Pubkey]) -> list[int]:
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture()
+def clock(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    now = [1000.0]
+    monkeypatch.setattr(fees.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_failed_lookup_reuses_stale_price(clock):
+    fetch = Fees([100, 200, 300, 400], RuntimeError("down"))
+    policy = PriorityFeePolicy(fetch, percentile=50, ttl=10)
+    assert policy.price(ACCOUNTS) == 200
+    clock[0] += 10
+    assert policy.price(ACCOUNTS) == 200
+    assert policy.stats() == {"fetches": 1, "failures": 1, "highest": 200}
+
+
+def test_failed_lookup_falls_back_to_latest_price_then_nothing(clock):
+    fetch = Fees(RuntimeError("down"), [500], RuntimeError("down"))
+    policy = PriorityFeePolicy(fetch, ttl=10)
+    assert policy.price(ACCOUNTS) == 0
+    clock[0] += 10
+    assert policy.price(OTHER_ACCOUNTS) == 500
+    # a set never priced before takes the latest price of any set
+    assert policy.price(NEW_ACCOUNTS) == 500
+    assert policy.stats()["failures"] == 2
+
+
+def test_fallback_is_cached_for_ttl(clock):
+    fetch = Fees(RuntimeError("down"), [7000])
+    policy = PriorityFeePolicy(fetch, ttl=10)
+    for _ in range(5):
+        assert policy.price(ACCOUNTS) == 0
+    assert fetch.calls == 1
+    clock[0] += 10
+    assert policy.price(ACCOUNTS) == 7000
+    # retries still escalate from the fallback
+    assert policy.price(ACCOUNTS, attempt=2) == 14000
+
+
+def runner_against(handler: httpx.MockTransport) -> Runner:
+    runner = Runner("http://rpc", Keypair(), Pubkey.new_unique())
+    runner.client._provider.session = httpx.Client(transport=handler)
+    return runner
+
+
+@pytest.mark.parametrize(
+    "respond",
+    [
+        lambda request: (_ for _ in ()).throw(httpx.ReadTimeout("timed out", request=request)),
+        lambda request: httpx.Response(503, text="unavailable"),
+    ],
+    ids=["timeout", "503"],
+)
+def test_fee_lookup_transport_errors_are_transient(respond):
+    runner = runner_against(httpx.MockTransport(respond))
+    with pytest.raises(SolanaRpcException) as raised:
+        runner.get_recent_prioritization_fees(ACCOUNTS)
+    assert "GetRecentPrioritizationFees" in raised.value.error_msg
+    assert classify(raised.value) is ErrorKind.TRANSIENT
+
+
+def test_fee_lookup_through_policy_survives_transport_errors():
+    runner = runner_against(httpx.MockTransport(lambda request: httpx.Response(503, text="unavailable")))
+    policy = PriorityFeePolicy(runner.get_recent_prioritization_fees)
+    assert policy.price(ACCOUNTS) == 0
+    assert policy.stats()["failures"] == 1
+
+
+def test_fee_lookup_parses_fees():
+    body = '{"jsonrpc":"2.0","result":[{"slot":1,"prioritizationFee":5},{"slot":2,"prioritizationFee":9}],"id":0}'
+    runner = runner_against(httpx.MockTransport(lambda request: httpx.Response(200, text=body)))
+    assert runner.get_recent_prioritization_fees(ACCOUNTS) == [5, 9]
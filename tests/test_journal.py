@@ -0,0 +1,122 @@
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+
+from batch_cancel_cli.journal import FINISHED_STATES, Journal, JournalEntry, State
+from batch_cancel_cli.runner import resume_journal
+
+from .rpc import RpcStub, context, stub_runner
+
+
+@pytest.fixture()
+def path(tmp_path: Path) -> Path:
+    return tmp_path / "cancel.log"
+
+
+def test_records_survive_close_and_load(path):
+    contract_id, other = Pubkey.new_unique(), Pubkey.new_unique()
+    signature = Signature.new_unique()
+    journal = Journal(path)
+    journal.record(contract_id, State.FETCHED)
+    journal.record(contract_id, State.SENT, signature)
+    journal.record(other, State.FAILED, error="custom program error:\n0x1770\tand more")
+    journal.close()
+    # the last state of a contract wins, errors are kept on one line
+    assert Journal.load(path) == {
+        contract_id: JournalEntry(State.SENT, signature),
+        other: JournalEntry(State.FAILED, error="custom program error: 0x1770 and more"),
+    }
+
+
+def test_sync_writes_the_buffer_through(path):
+    contract_id = Pubkey.new_unique()
+    journal = Journal(path, flush_interval=60)
+    try:
+        journal.record(contract_id, State.SKIPPED)
+        assert Journal.load(path) == {}
+        journal.sync()
+        assert Journal.load(path) == {contract_id: JournalEntry(State.SKIPPED)}
+    finally:
+        journal.close()
+
+
+def test_flush_every_wakes_the_flusher(path):
+    journal = Journal(path, flush_every=2, flush_interval=60)
+    try:
+        journal.record(Pubkey.new_unique(), State.FETCHED)
+        journal.record(Pubkey.new_unique(), State.FETCHED)
+        deadline = time.monotonic() + 5
+        # the flusher writes them long before its 60 second interval
+        while len(Journal.load(path)) < 2:
+            assert time.monotonic() < deadline, "flush_every did not wake the flusher"
+            time.sleep(0.01)
+    finally:
+        journal.close()
+
+
+def test_reopened_journal_appends(path):
+    first, second = Pubkey.new_unique(), Pubkey.new_unique()
+    journal = Journal(path)
+    journal.record(first, State.CONFIRMED, Signature.new_unique())
+    journal.close()
+    journal = Journal(path)
+    journal.record(second, State.SKIPPED)
+    journal.close()
+    assert set(Journal.load(path)) == {first, second}
+
+
+def test_load_ignores_a_torn_last_line_and_garbage(path):
+    kept = Pubkey.new_unique()
+    path.write_text(
+        f"fetched\t{kept}\t\t\n"
+        "not a journal line\n"
+        f"bogus\t{Pubkey.new_unique()}\t\t\n"
+        f"confirmed\t{kept}\t{Signature.new_unique()}"
+    )
+    assert Journal.load(path) == {kept: JournalEntry(State.FETCHED)}
+
+
+def test_load_of_a_missing_journal_is_empty(path):
+    assert Journal.load(path) == {}
+
+
+def status(err: Any = None) -> dict[str, Any]:
+    return {"slot": 1, "confirmations": None, "err": err, "status": {"Ok": None}, "confirmationStatus": "confirmed"}
+
+
+def test_resume_keeps_finished_and_rechecks_sent(path):
+    skipped, confirmed, landed, failed, lost, expired = (Pubkey.new_unique() for _ in range(6))
+    signatures = {contract_id: Signature.new_unique() for contract_id in (landed, failed, lost)}
+    journal = Journal(path)
+    journal.record(skipped, State.SKIPPED)
+    journal.record(confirmed, State.CONFIRMED, Signature.new_unique())
+    for contract_id, signature in signatures.items():
+        journal.record(contract_id, State.SENT, signature)
+    journal.record(expired, State.EXPIRED, Signature.new_unique())
+    journal.close()
+
+    answers = {
+        str(signatures[landed]): status(),
+        str(signatures[failed]): status({"InstructionError": [1, {"Custom": 6000}]}),
+    }
+    stub = RpcStub(getSignatureStatuses=lambda params: context([answers.get(s) for s in params[0]]))
+    entries = Journal.load(path)
+    assert {contract_id for contract_id, entry in entries.items() if entry.state in FINISHED_STATES} == {
+        skipped,
+        confirmed,
+    }
+    journal = Journal(path)
+    finished = resume_journal(stub_runner(stub), journal, entries)
+    journal.close()
+
+    # only the sent signatures are looked up, the expired and lost contracts are sent again
+    assert stub.calls["getSignatureStatuses"] == 1
+    assert finished == {skipped, confirmed, landed}
+    resumed = Journal.load(path)
+    assert resumed[landed] == JournalEntry(State.CONFIRMED, signatures[landed])
+    assert resumed[failed].state == State.FAILED
+    assert resumed[lost] == JournalEntry(State.SENT, signatures[lost])
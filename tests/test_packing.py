@@ -0,0 +1,107 @@
+import httpx
+import pytest
+from solders.address_lookup_table_account import AddressLookupTableAccount
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+
+from batch_cancel_cli.client.structures import ContractView
+from batch_cancel_cli.compute_units import ComputeUnitProfiler
+from batch_cancel_cli.packing import MAX_COMPUTE_UNIT_LIMIT
+from batch_cancel_cli.runner import Runner
+
+from .test_structures import encode
+
+BLOCKHASH = (
+    '{"jsonrpc":"2.0","result":{"context":{"slot":1},"value":'
+    '{"blockhash":"EkSnNWid2cvwEVnVx9aBqawnmiCNiDgp3gUdkDPTKN1N","lastValidBlockHeight":100}},"id":0}'
+)
+SHARED = (
+    "mint",
+    "sender",
+    "sender_tokens",
+    "partner",
+    "partner_tokens",
+    "streamflow_treasury",
+    "streamflow_treasury_tokens",
+)
+PAIR_UNITS = 50_000
+NEW_RECIPIENT = Pubkey.new_unique()
+
+
+def new_key() -> list[int]:
+    return list(bytes(Pubkey.new_unique()))
+
+
+@pytest.fixture()
+def runner() -> Runner:
+    runner = Runner("http://rpc", Keypair(), Pubkey.new_unique())
+    runner.client._provider.session = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, text=BLOCKHASH))
+    )
+    return runner
+
+
+@pytest.fixture()
+def items() -> list[tuple[Pubkey, ContractView]]:
+    # contracts of one sender and mint, as a run cancels them
+    shared = {name: new_key() for name in SHARED}
+    return [
+        (Pubkey.new_unique(), ContractView.from_bytes(encode(**shared, recipient=new_key(), escrow_tokens=new_key())))
+        for _ in range(40)
+    ]
+
+
+def batch_sizes(runner: Runner, items: list[tuple[Pubkey, ContractView]]) -> list[int]:
+    return [len(batch) for batch in runner.pack_transfer_cancel(NEW_RECIPIENT, items)]
+
+
+@pytest.mark.parametrize("versioned", [False, True], ids=["legacy", "v0"])
+def test_fixed_budget_caps_packing(runner, items, versioned):
+    if versioned:
+        runner.lookup_table = AddressLookupTableAccount(
+            Pubkey.new_unique(), runner.lookup_table_addresses(NEW_RECIPIENT, items[0][1])
+        )
+    assert set(batch_sizes(runner, items)) == {MAX_COMPUTE_UNIT_LIMIT // runner.compute_units_per_pair}
+
+
+@pytest.mark.parametrize("versioned", [False, True], ids=["legacy", "v0"])
+def test_profiled_units_pack_more_pairs(runner, items, versioned):
+    if versioned:
+        runner.lookup_table = AddressLookupTableAccount(
+            Pubkey.new_unique(), runner.lookup_table_addresses(NEW_RECIPIENT, items[0][1])
+        )
+    fixed = max(batch_sizes(runner, items))
+    runner.cu_profiler = ComputeUnitProfiler(lambda tx: PAIR_UNITS)
+    profiled = batch_sizes(runner, items)
+    assert sum(profiled) == len(items)
+    assert max(profiled) > fixed
+    # one pair is simulated, packed shapes are profiled when they are sent
+    assert runner.cu_profiler.stats()["simulations"] == 1
+    limit = runner.cu_profiler.limit(runner.transfer_cancel_shape(items[:1]), lambda units: None)
+    assert max(profiled) <= MAX_COMPUTE_UNIT_LIMIT // limit
+
+
+def use_lookup_table(runner: Runner, items: list[tuple[Pubkey, ContractView]]) -> None:
+    runner.lookup_table = AddressLookupTableAccount(
+        Pubkey.new_unique(), runner.lookup_table_addresses(NEW_RECIPIENT, items[0][1])
+    )
+
+
+@pytest.mark.parametrize("profiled", [False, True], ids=["cu-per-pair", "auto-cu"])
+def test_v0_packs_more_pairs_than_legacy_when_compute_allows(runner, items, profiled):
+    if profiled:
+        runner.cu_profiler = ComputeUnitProfiler(lambda tx: PAIR_UNITS)
+    else:
+        runner.compute_units_per_pair = PAIR_UNITS
+    legacy = batch_sizes(runner, items)
+    use_lookup_table(runner, items)
+    versioned = batch_sizes(runner, items)
+    assert sum(legacy) == sum(versioned) == len(items)
+    # legacy transactions run out of bytes first, v0 ones load the shared accounts from the table
+    assert max(legacy) < max(versioned)
+    assert len(versioned) < len(legacy)
+
+
+def test_failed_simulation_keeps_fixed_budget(runner, items):
+    runner.cu_profiler = ComputeUnitProfiler(lambda tx: None)
+    assert set(batch_sizes(runner, items)) == {MAX_COMPUTE_UNIT_LIMIT // runner.compute_units_per_pair}
@@ -0,0 +1,124 @@
+import json
+from pathlib import Path
+
+import pytest
+from solders.pubkey import Pubkey
+from spl.token.constants import ASSOCIATED_TOKEN_PROGRAM_ID, TOKEN_PROGRAM_ID
+
+from batch_cancel_cli.pda import MAX_SEEDS, PdaCache, create_program_address
+
+PROGRAM_ID = Pubkey.new_unique()
+
+
+def ata(owner: Pubkey, mint: Pubkey) -> Pubkey:
+    return Pubkey.find_program_address(
+        [bytes(owner), bytes(TOKEN_PROGRAM_ID), bytes(mint)], ASSOCIATED_TOKEN_PROGRAM_ID
+    )[0]
+
+
+@pytest.fixture()
+def path(tmp_path: Path) -> Path:
+    return tmp_path / "pdas.json"
+
+
+def test_hits_return_the_derived_address():
+    cache = PdaCache()
+    owner, mint = Pubkey.new_unique(), Pubkey.new_unique()
+    assert cache.derive_ata(owner, mint) == ata(owner, mint)
+    assert cache.derive_ata(owner, mint) == ata(owner, mint)
+    seeds = [b"strm", bytes(Pubkey.new_unique())]
+    assert cache.find_program_address(seeds, PROGRAM_ID) == Pubkey.find_program_address(seeds, PROGRAM_ID)
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 0, "size": 2}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PdaCache(maxsize=2)
+    first, second, third = ([b"strm", bytes(Pubkey.new_unique())] for _ in range(3))
+    cache.find_program_address(first, PROGRAM_ID)
+    cache.find_program_address(second, PROGRAM_ID)
+    cache.find_program_address(first, PROGRAM_ID)
+    cache.find_program_address(third, PROGRAM_ID)
+    assert cache.stats() == {"hits": 1, "misses": 3, "evictions": 1, "size": 2}
+
+    cache.find_program_address(first, PROGRAM_ID)
+    cache.find_program_address(third, PROGRAM_ID)
+    assert cache.stats()["hits"] == 3
+    # the second one went out, it is derived again
+    cache.find_program_address(second, PROGRAM_ID)
+    assert cache.stats()["misses"] == 4
+
+
+def test_saved_cache_loads_without_deriving(path):
+    owners, mint = [Pubkey.new_unique() for _ in range(3)], Pubkey.new_unique()
+    cache = PdaCache()
+    for owner in owners:
+        cache.derive_ata(owner, mint)
+    escrow = cache.find_program_address([b"strm", bytes(owners[0])], PROGRAM_ID)
+    cache.save(path)
+    assert not path.with_name(path.name + ".tmp").exists()
+
+    loaded = PdaCache()
+    assert loaded.load(path) == 4
+    assert [loaded.derive_ata(owner, mint) for owner in owners] == [ata(owner, mint) for owner in owners]
+    assert loaded.find_program_address([b"strm", bytes(owners[0])], PROGRAM_ID) == escrow
+    assert loaded.stats() == {"hits": 4, "misses": 0, "evictions": 0, "size": 4}
+
+
+def test_tampered_entries_are_dropped_on_load(path):
+    owners, mint = [Pubkey.new_unique() for _ in range(4)], Pubkey.new_unique()
+    cache = PdaCache()
+    for owner in owners:
+        cache.derive_ata(owner, mint)
+    cache.save(path)
+
+    entries = json.loads(path.read_text())
+    # another valid address, a seed too long to derive anything from and an entry that is not one
+    entries[0]["address"] = str(Pubkey.new_unique())
+    entries[1]["seeds"][0] = "00" * 33
+    entries[2]["bump"] = "not a bump"
+    path.write_text(json.dumps(entries))
+
+    loaded = PdaCache()
+    assert loaded.load(path) == 1
+    # the dropped entries are derived again, with the real addresses
+    assert [loaded.derive_ata(owner, mint) for owner in owners] == [ata(owner, mint) for owner in owners]
+    assert loaded.stats()["hits"] == 1
+    assert loaded.stats()["misses"] == 3
+
+
+def test_load_of_a_missing_file_is_empty(path):
+    cache = PdaCache()
+    assert cache.load(path) == 0
+    assert len(cache) == 0
+
+
+def test_load_keeps_the_size_bound(path):
+    cache = PdaCache()
+    for _ in range(5):
+        cache.find_program_address([bytes(Pubkey.new_unique())], PROGRAM_ID)
+    cache.save(path)
+    loaded = PdaCache(maxsize=3)
+    assert loaded.load(path) == 5
+    assert loaded.stats() == {"hits": 0, "misses": 0, "evictions": 2, "size": 3}
+
+
+def test_every_other_bump_is_dropped_on_load(path):
+    cache = PdaCache()
+    seeds = [b"strm", bytes(Pubkey.new_unique())]
+    _, bump = cache.find_program_address(seeds, PROGRAM_ID)
+    cache.save(path)
+    entry = json.loads(path.read_text())[0]
+    # lower bumps are either on the curve, which the runtime refuses, or derive another address
+    for other in range(max(bump - 8, 0), bump):
+        path.write_text(json.dumps([{**entry, "bump": other}]))
+        assert PdaCache().load(path) == 0
+    path.write_text(json.dumps([entry]))
+    assert PdaCache().load(path) == 1
+
+
+def test_create_program_address_matches_the_runtime():
+    seeds = [b"strm", bytes(Pubkey.new_unique())]
+    address, bump = Pubkey.find_program_address(seeds, PROGRAM_ID)
+    assert create_program_address(seeds, bump, PROGRAM_ID) == address
+    assert create_program_address([bytes(33)], 255, PROGRAM_ID) is None
+    assert create_program_address([b"x"] * MAX_SEEDS, 255, PROGRAM_ID) is None
@@ -0,0 +1,285 @@
+import asyncio
+import threading
+import types
+from collections import Counter
+from typing import Callable
+
+import httpx
+import pytest
+from solders.pubkey import Pubkey
+from solders.rpc.requests import GetMultipleAccounts, GetSlot, SendRawTransaction
+
+from batch_cancel_cli import pool as pool_module
+from batch_cancel_cli.pool import REPROBE_AFTER, AsyncPooledHTTPProvider, PooledHTTPProvider, RpcPool
+
+RESULT = '{"jsonrpc":"2.0","result":1,"id":0}'
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class Stubs:
+    """Endpoints by host: seconds an answer takes, or an exception raised after that many seconds."""
+
+    def __init__(self, clock: Clock, behaviour: dict[str, float | tuple[float, type[httpx.HTTPError]]]):
+        self.clock = clock
+        self.behaviour = behaviour
+        self.calls: Counter[str] = Counter()
+
+    def urls(self) -> list[str]:
+        return [f"http://{host}" for host in self.behaviour]
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        self.calls[host] += 1
+        behaviour = self.behaviour[host]
+        if isinstance(behaviour, tuple):
+            self.clock.now += behaviour[0]
+            raise behaviour[1]("stub failure", request=request)
+        self.clock.now += behaviour
+        return httpx.Response(200, text=RESULT)
+
+
+@pytest.fixture()
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(
+        pool_module, "time", types.SimpleNamespace(monotonic=clock.monotonic, perf_counter=clock.monotonic)
+    )
+    return clock
+
+
+def sync_provider(stubs: Stubs) -> tuple[RpcPool, Callable[[], str]]:
+    pool = RpcPool(stubs.urls())
+    provider = PooledHTTPProvider(pool)
+    provider.session = httpx.Client(transport=httpx.MockTransport(stubs))
+    return pool, lambda: provider.make_request_unparsed(GetSlot())
+
+
+def ranking(pool: RpcPool) -> list[str]:
+    return [httpx.URL(endpoint.url).host for endpoint in sorted(pool.endpoints, key=lambda e: e.score())]
+
+
+def test_timed_out_endpoint_ranks_below_slow_one(clock):
+    stubs = Stubs(clock, {"dead": (10.0, httpx.ReadTimeout), "slow": 0.4})
+    pool, read = sync_provider(stubs)
+    for _ in range(20):
+        assert read() == RESULT
+    # one timeout, then every read goes straight to the healthy endpoint
+    assert stubs.calls == {"dead": 1, "slow": 20}
+    assert ranking(pool) == ["slow", "dead"]
+
+
+def test_fast_failures_rank_below_slow_answers(clock):
+    stubs = Stubs(clock, {"refusing": (0.0, httpx.ConnectError), "slow": 0.4, "slower": 0.8})
+    pool, read = sync_provider(stubs)
+    for _ in range(10):
+        read()
+    assert ranking(pool) == ["slow", "slower", "refusing"]
+    assert stubs.calls["refusing"] == 1
+
+
+def test_failover_follows_ranking(clock):
+    stubs = Stubs(clock, {"a": 0.1, "b": 0.2, "c": 0.3})
+    pool, read = sync_provider(stubs)
+    for _ in range(3):
+        read()
+    assert ranking(pool) == ["a", "b", "c"]
+    stubs.behaviour["a"] = (10.0, httpx.ReadTimeout)
+    stubs.calls.clear()
+    read()
+    assert stubs.calls == {"a": 1, "b": 1}
+    read()
+    assert stubs.calls == {"a": 1, "b": 2}
+    assert ranking(pool) == ["b", "c", "a"]
+
+
+def test_demoted_endpoint_is_probed_and_recovers(clock):
+    stubs = Stubs(clock, {"flaky": (10.0, httpx.ReadTimeout), "steady": 0.4})
+    pool, read = sync_provider(stubs)
+    read()
+    assert ranking(pool) == ["steady", "flaky"]
+    stubs.behaviour["flaky"] = 0.05
+    probes = 0
+    while ranking(pool)[0] != "flaky":
+        assert probes < 5, "a recovered endpoint never won its place back"
+        clock.now += REPROBE_AFTER
+        stubs.calls.clear()
+        read()
+        read()
+        # one probe per window, the next read goes back to the best endpoint
+        assert stubs.calls == {"flaky": 1, "steady": 1}
+        probes += 1
+    stubs.calls.clear()
+    read()
+    assert stubs.calls == {"flaky": 1}
+
+
+def test_failed_probe_falls_over(clock):
+    stubs = Stubs(clock, {"dead": (10.0, httpx.ReadTimeout), "steady": 0.4})
+    pool, read = sync_provider(stubs)
+    read()
+    clock.now += REPROBE_AFTER
+    stubs.calls.clear()
+    assert read() == RESULT
+    assert stubs.calls == {"dead": 1, "steady": 1}
+    assert ranking(pool) == ["steady", "dead"]
+
+
+def test_async_failover_follows_ranking(clock):
+    stubs = Stubs(clock, {"dead": (10.0, httpx.ReadTimeout), "slow": 0.4})
+    pool = RpcPool(stubs.urls())
+    provider = AsyncPooledHTTPProvider(pool)
+    provider.session = httpx.AsyncClient(transport=httpx.MockTransport(stubs))
+
+    async def reads() -> list[str]:
+        return [await provider.make_request_unparsed(GetSlot()) for _ in range(10)]
+
+    assert asyncio.run(reads()) == [RESULT] * 10
+    assert stubs.calls == {"dead": 1, "slow": 10}
+    assert ranking(pool) == ["slow", "dead"]
+
+
+HEDGE_AFTER = 0.05
+
+
+class Gated:
+    """Endpoints by host answering with their own result, each held back until its gate is opened."""
+
+    def __init__(self, *hosts: str, rejecting: tuple[str, ...] = ()):
+        self.gates = {host: threading.Event() for host in hosts}
+        self.rejecting = rejecting
+        self.calls: Counter[str] = Counter()
+
+    def urls(self) -> list[str]:
+        return [f"http://{host}" for host in self.gates]
+
+    def open(self, *hosts: str) -> None:
+        for host in hosts or self.gates:
+            self.gates[host].set()
+
+    def answer(self, host: str) -> str:
+        if host in self.rejecting:
+            return f'{{"jsonrpc":"2.0","error":{{"code":-32002,"message":"{host} rejected"}},"id":0}}'
+        return f'{{"jsonrpc":"2.0","result":"{host}","id":0}}'
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        self.calls[host] += 1
+        assert self.gates[host].wait(5), f"{host} was never opened"
+        return httpx.Response(200, text=self.answer(host))
+
+
+@pytest.fixture()
+def gated():
+    opened: list[Gated] = []
+
+    def gated(*hosts: str, rejecting: tuple[str, ...] = ()) -> Gated:
+        opened.append(stubs := Gated(*hosts, rejecting=rejecting))
+        return stubs
+
+    yield gated
+    # let the losing copies finish
+    for stubs in opened:
+        stubs.open()
+
+
+def gated_provider(stubs: Gated) -> tuple[RpcPool, PooledHTTPProvider]:
+    pool = RpcPool(stubs.urls(), hedge_after=HEDGE_AFTER)
+    provider = PooledHTTPProvider(pool)
+    provider.session = httpx.Client(transport=httpx.MockTransport(stubs))
+    return pool, provider
+
+
+def fetch() -> GetMultipleAccounts:
+    return GetMultipleAccounts([Pubkey.new_unique()])
+
+
+def test_hedge_is_not_sent_before_the_delay(gated):
+    stubs = gated("best", "runner-up")
+    stubs.open("best")
+    pool, provider = gated_provider(stubs)
+    assert provider.make_request_unparsed(fetch()) == stubs.answer("best")
+    assert stubs.calls == {"best": 1}
+    assert pool.hedged == 0
+
+
+def test_hedge_fires_after_the_delay_and_first_answer_wins(gated):
+    stubs = gated("best", "runner-up")
+    stubs.open("runner-up")
+    pool, provider = gated_provider(stubs)
+    assert provider.make_request_unparsed(fetch()) == stubs.answer("runner-up")
+    assert stubs.calls == {"best": 1, "runner-up": 1}
+    assert pool.hedged == 1
+
+
+def test_hedged_primary_can_still_win(gated):
+    stubs = gated("best", "runner-up")
+    pool, provider = gated_provider(stubs)
+    timer = threading.Timer(HEDGE_AFTER * 4, stubs.open, ["best"])
+    timer.start()
+    try:
+        assert provider.make_request_unparsed(fetch()) == stubs.answer("best")
+    finally:
+        timer.cancel()
+    assert stubs.calls == {"best": 1, "runner-up": 1}
+    assert pool.hedged == 1
+
+
+def test_only_account_fetches_are_hedged(gated):
+    stubs = gated("best", "runner-up")
+    pool, provider = gated_provider(stubs)
+    threading.Timer(HEDGE_AFTER * 4, stubs.open, ["best"]).start()
+    assert provider.make_request_unparsed(GetSlot()) == stubs.answer("best")
+    assert stubs.calls == {"best": 1}
+    assert pool.hedged == 0
+
+
+def test_async_hedge_fires_after_the_delay(gated):
+    stubs = gated("best", "runner-up")
+    pool = RpcPool(stubs.urls(), hedge_after=HEDGE_AFTER)
+    provider = AsyncPooledHTTPProvider(pool)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        # gates would block the event loop, the best endpoint sleeps instead
+        host = request.url.host
+        stubs.calls[host] += 1
+        if host == "best":
+            await asyncio.sleep(HEDGE_AFTER * 4)
+        return httpx.Response(200, text=stubs.answer(host))
+
+    provider.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    assert asyncio.run(provider.make_request_unparsed(fetch())) == stubs.answer("runner-up")
+    assert stubs.calls == {"best": 1, "runner-up": 1}
+    assert pool.hedged == 1
+
+
+def test_send_is_fanned_out_to_every_endpoint(gated):
+    stubs = gated("a", "b", "c")
+    stubs.open()
+    pool, provider = gated_provider(stubs)
+    assert provider.make_request_unparsed(SendRawTransaction(b"tx")) in {stubs.answer(host) for host in "abc"}
+    pool.executor.shutdown()
+    assert stubs.calls == {"a": 1, "b": 1, "c": 1}
+    assert pool.hedged == 0
+
+
+def test_fan_out_prefers_an_accepted_send_over_a_rejection(gated):
+    stubs = gated("a", "b", "c", rejecting=("a", "b"))
+    stubs.open("a", "b")
+    pool, provider = gated_provider(stubs)
+    threading.Timer(HEDGE_AFTER, stubs.open, ["c"]).start()
+    assert provider.make_request_unparsed(SendRawTransaction(b"tx")) == stubs.answer("c")
+    assert stubs.calls == {"a": 1, "b": 1, "c": 1}
+
+
+def test_fan_out_returns_a_rejection_when_every_endpoint_rejects(gated):
+    stubs = gated("a", "b", rejecting=("a", "b"))
+    stubs.open()
+    pool, provider = gated_provider(stubs)
+    assert provider.make_request_unparsed(SendRawTransaction(b"tx")) in {stubs.answer("a"), stubs.answer("b")}
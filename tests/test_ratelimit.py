@@ -0,0 +1,171 @@
+import types
+from email.utils import formatdate
+
+import pytest
+
+from batch_cancel_cli import ratelimit
+from batch_cancel_cli.ratelimit import ADDITIVE_INCREASE, RateLimiter, TokenBucket, parse_retry_after
+
+EPOCH = 1_700_000_000.0
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.slept: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture()
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(
+        ratelimit,
+        "time",
+        types.SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep, time=lambda: EPOCH),
+    )
+    return clock
+
+
+def test_burst_then_refill_at_the_rate(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+    # callers past the burst queue up a tenth of a second apart
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+    clock.now += 0.5
+    # the two queued tokens are paid back first, three are left
+    assert [bucket.reserve() for _ in range(3)] == [0.0] * 3
+    assert bucket.reserve() == pytest.approx(0.1)
+
+
+def test_refill_is_capped_at_the_burst(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    clock.now += 60
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+    assert bucket.reserve() == pytest.approx(0.1)
+
+
+def test_reserving_several_tokens(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+    assert bucket.reserve(5) == 0.0
+    assert bucket.reserve(3) == pytest.approx(0.3)
+    assert bucket.waited == pytest.approx(0.3)
+
+
+def test_acquire_sleeps_for_its_turn(clock):
+    bucket = TokenBucket(rate=10, burst=1)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.slept == [pytest.approx(0.1)]
+
+
+def test_try_acquire_takes_only_available_tokens(clock):
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.try_acquire(2)
+    assert not bucket.try_acquire()
+    clock.now += 0.1
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+def test_unlimited_bucket_never_waits(clock):
+    bucket = TokenBucket()
+    assert all(bucket.reserve() == 0.0 for _ in range(1000))
+    assert bucket.try_acquire(1000)
+
+
+def test_throttle_halves_the_rate_and_pauses(clock):
+    bucket = TokenBucket(rate=100, burst=10)
+    assert bucket.throttle() == pytest.approx(1 / 50)
+    assert bucket.rate == 50
+    assert bucket.throttled == 1
+    # the remaining burst is gone and nothing goes out before the pause ends
+    assert not bucket.try_acquire()
+    assert bucket.reserve() == pytest.approx(1 / 50)
+
+
+def test_retry_after_sets_the_pause(clock):
+    bucket = TokenBucket(rate=100, burst=10)
+    assert bucket.throttle(retry_after=3.0) == 3.0
+    assert bucket.reserve() == pytest.approx(3.0)
+    clock.now += 3.0
+    assert bucket.try_acquire()
+
+
+def test_rate_never_drops_below_the_floor(clock):
+    bucket = TokenBucket(rate=8, min_rate=2)
+    for _ in range(5):
+        bucket.throttle(retry_after=0)
+    assert bucket.rate == 2
+
+
+def test_granted_requests_raise_the_rate_back_additively(clock):
+    bucket = TokenBucket(rate=100, burst=100)
+    bucket.throttle(retry_after=1.0)
+    # no increase while the pause lasts
+    bucket.reserve()
+    assert bucket.rate == 50
+    clock.now += 1.0
+    bucket.reserve()
+    assert bucket.rate == pytest.approx(50 + ADDITIVE_INCREASE / 50)
+    bucket.reserve(10)
+    assert bucket.rate == pytest.approx(50.1 + ADDITIVE_INCREASE * 10 / 50.1)
+    for _ in range(10_000):
+        bucket.reserve()
+        clock.now += 0.01
+    assert bucket.rate == 100
+
+
+def test_unlimited_bucket_throttles_from_the_observed_rate(clock):
+    bucket = TokenBucket()
+    for _ in range(30):
+        bucket.reserve()
+    clock.now += 1.0
+    bucket.reserve()
+    bucket.throttle()
+    assert bucket.rate == pytest.approx(31 / 2)
+    assert bucket.max_rate == float("inf")
+
+
+def test_unlimited_bucket_throttled_mid_window_uses_the_partial_rate(clock):
+    bucket = TokenBucket()
+    for _ in range(20):
+        bucket.reserve()
+    clock.now += 0.5
+    bucket.throttle()
+    assert bucket.rate == pytest.approx(20 / 0.5 / 2)
+
+
+@pytest.mark.parametrize(
+    ("value", "seconds"),
+    [
+        (None, None),
+        ("", None),
+        ("3", 3.0),
+        ("1.5", 1.5),
+        ("-4", 0.0),
+        ("soon", None),
+        (formatdate(EPOCH + 30, usegmt=True), 30.0),
+        (formatdate(EPOCH - 30, usegmt=True), 0.0),
+    ],
+)
+def test_parse_retry_after(clock, value, seconds):
+    assert parse_retry_after(value) == seconds
+
+
+def test_sends_fall_back_to_the_read_limits(clock):
+    limiter = RateLimiter(rps=20, burst=4)
+    assert (limiter.sends.max_rate, limiter.sends.burst) == (20, 4)
+    limiter = RateLimiter(rps=20, burst=4, send_rps=5, send_burst=1)
+    assert (limiter.sends.max_rate, limiter.sends.burst) == (5, 1)
+    limiter.reads.throttle(retry_after=1.0)
+    limiter.sends.reserve()
+    limiter.sends.reserve()
+    assert limiter.stats() == {"read_rate": 10, "send_rate": 5, "throttled": 1, "waited": pytest.approx(0.2)}
@@ -0,0 +1,212 @@
+import asyncio
+import types
+
+import httpx
+import pytest
+from solana.exceptions import SolanaRpcException, handle_exceptions
+from solana.rpc.core import RPCException
+from solders.rpc.errors import (
+    BlockNotAvailableMessage,
+    InvalidParamsMessage,
+    MinContextSlotNotReached,
+    MinContextSlotNotReachedMessage,
+    NodeUnhealthy,
+    NodeUnhealthyMessage,
+    SendTransactionPreflightFailureMessage,
+)
+from solders.rpc.requests import GetSlot
+from solders.rpc.responses import RpcSimulateTransactionResult
+from solders.transaction_status import (
+    InstructionErrorCustom,
+    TransactionErrorFieldless,
+    TransactionErrorInstructionError,
+)
+
+from batch_cancel_cli import retry
+from batch_cancel_cli.retry import ErrorKind, RetryPolicy, RetryScheduler, classify
+
+from .rpc import RpcStub, stub_runner
+
+
+def transport(cause: httpx.HTTPError) -> SolanaRpcException:
+    # wrapped the way the solana providers wrap their transport errors
+    @handle_exceptions(SolanaRpcException, httpx.HTTPError)
+    def request(provider: object, body: GetSlot) -> None:
+        raise cause
+
+    with pytest.raises(SolanaRpcException) as raised:
+        request(None, GetSlot())
+    return raised.value
+
+
+def status(code: int) -> SolanaRpcException:
+    request = httpx.Request("POST", "http://rpc")
+    return transport(httpx.HTTPStatusError("status", request=request, response=httpx.Response(code, request=request)))
+
+
+def preflight(tx_error: object) -> RPCException:
+    return RPCException(
+        SendTransactionPreflightFailureMessage("preflight failed", RpcSimulateTransactionResult(err=tx_error))
+    )
+
+
+@pytest.mark.parametrize(
+    ("error", "kind"),
+    [
+        (status(429), ErrorKind.TRANSIENT),
+        (status(503), ErrorKind.TRANSIENT),
+        (status(400), ErrorKind.PERMANENT),
+        (transport(httpx.ReadTimeout("timeout")), ErrorKind.TRANSIENT),
+        (transport(httpx.ConnectError("refused")), ErrorKind.TRANSIENT),
+        (transport(httpx.DecodingError("garbled")), ErrorKind.PERMANENT),
+        (RPCException(NodeUnhealthyMessage("behind", NodeUnhealthy(10))), ErrorKind.TRANSIENT),
+        (RPCException(BlockNotAvailableMessage("no block")), ErrorKind.TRANSIENT),
+        (RPCException(MinContextSlotNotReachedMessage("behind", MinContextSlotNotReached(5))), ErrorKind.TRANSIENT),
+        (RPCException(InvalidParamsMessage("bad params")), ErrorKind.PERMANENT),
+        (preflight(TransactionErrorFieldless.BlockhashNotFound), ErrorKind.EXPIRED),
+        (preflight(TransactionErrorFieldless.AccountInUse), ErrorKind.TRANSIENT),
+        (preflight(TransactionErrorFieldless.WouldExceedMaxBlockCostLimit), ErrorKind.TRANSIENT),
+        (preflight(TransactionErrorFieldless.InsufficientFundsForFee), ErrorKind.PERMANENT),
+        (preflight(TransactionErrorInstructionError(1, InstructionErrorCustom(6000))), ErrorKind.PERMANENT),
+        (preflight(None), ErrorKind.PERMANENT),
+        (RPCException(), ErrorKind.PERMANENT),
+        (ValueError("not an RPC error"), ErrorKind.PERMANENT),
+    ],
+    ids=lambda value: value.value if isinstance(value, ErrorKind) else None,
+)
+def test_classify(error, kind):
+    assert classify(error) == kind
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.slept: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture()
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(retry, "time", types.SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    # no jitter, every delay is the full backoff
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: high)
+    return clock
+
+
+class Failing:
+    """Raises the queued errors one per attempt, then answers with the attempt number."""
+
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.attempts: list[int] = []
+
+    def __call__(self, attempt: int) -> int:
+        self.attempts.append(attempt)
+        if self.errors:
+            raise self.errors.pop(0)
+        return attempt
+
+
+def test_transient_errors_back_off_exponentially(clock):
+    retried: list[tuple[int, float]] = []
+    scheduler = RetryScheduler(RetryPolicy(max_attempts=5), on_retry=lambda n, error, delay: retried.append((n, delay)))
+    fn = Failing(*[status(503)] * 3)
+    assert scheduler.call(fn) == 4
+    assert fn.attempts == [1, 2, 3, 4]
+    assert clock.slept == [0.5, 1.0, 2.0]
+    assert retried == [(1, 0.5), (2, 1.0), (3, 2.0)]
+    assert scheduler.stats() == {"retries": 3, "gave_up": 0}
+
+
+def test_backoff_is_capped(clock):
+    scheduler = RetryScheduler(RetryPolicy(max_attempts=7, max_delay=2.0, max_elapsed=100))
+    scheduler.call(Failing(*[status(429)] * 6))
+    assert clock.slept == [0.5, 1.0, 2.0, 2.0, 2.0, 2.0]
+
+
+def test_jitter_stays_within_the_backoff():
+    policy = RetryPolicy(base_delay=0.5, max_delay=8.0)
+    for attempt, cap in [(1, 0.5), (3, 2.0), (10, 8.0)]:
+        assert all(0 <= policy.delay(attempt) <= cap for _ in range(100))
+
+
+def test_permanent_errors_are_not_retried(clock):
+    scheduler = RetryScheduler()
+    error = preflight(TransactionErrorInstructionError(0, InstructionErrorCustom(6000)))
+    fn = Failing(error)
+    with pytest.raises(RPCException) as raised:
+        scheduler.call(fn)
+    assert raised.value is error
+    assert fn.attempts == [1]
+    assert not clock.slept
+    assert scheduler.stats() == {"retries": 0, "gave_up": 0}
+
+
+def test_gives_up_after_max_attempts(clock):
+    scheduler = RetryScheduler(RetryPolicy(max_attempts=3))
+    errors = [status(503) for _ in range(3)]
+    fn = Failing(*errors)
+    with pytest.raises(SolanaRpcException) as raised:
+        scheduler.call(fn)
+    assert raised.value is errors[-1]
+    assert fn.attempts == [1, 2, 3]
+    assert scheduler.stats() == {"retries": 2, "gave_up": 1}
+
+
+def test_gives_up_when_the_next_delay_overruns_the_budget(clock):
+    scheduler = RetryScheduler(RetryPolicy(max_attempts=10, max_elapsed=3.0))
+    fn = Failing(*[status(503)] * 10)
+    with pytest.raises(SolanaRpcException):
+        scheduler.call(fn)
+    # 0.5 + 1.0 fit in 3 seconds, another 2.0 would not
+    assert clock.slept == [0.5, 1.0]
+    assert fn.attempts == [1, 2, 3]
+
+
+def test_expired_blockhash_calls_on_expired_before_the_retry(clock):
+    expired: list[int] = []
+    fn = Failing(preflight(TransactionErrorFieldless.BlockhashNotFound), status(503))
+    scheduler = RetryScheduler(on_expired=lambda: expired.append(len(fn.attempts)))
+    assert scheduler.call(fn) == 3
+    assert expired == [1]
+
+
+def test_async_retries_share_the_policy():
+    scheduler = RetryScheduler(RetryPolicy(base_delay=0))
+
+    async def call() -> int:
+        fn = Failing(status(503), preflight(TransactionErrorFieldless.AccountInUse))
+
+        async def attempt(n: int) -> int:
+            return fn(n)
+
+        return await scheduler.call_async(attempt)
+
+    assert asyncio.run(call()) == 3
+    assert scheduler.stats() == {"retries": 2, "gave_up": 0}
+
+
+def test_runner_signs_the_retry_with_a_fresh_blockhash():
+    stub = RpcStub()
+    runner = stub_runner(stub)
+    runner.retry.policy = RetryPolicy(base_delay=0)
+    try:
+        runner.blockhash_cache.get()
+        fn = Failing(preflight(TransactionErrorFieldless.BlockhashNotFound))
+
+        def send(attempt: int) -> int:
+            runner.blockhash_cache.get()
+            return fn(attempt)
+
+        assert runner.retry.call(send) == 2
+        # one fetch before the run and one after the expiry, the first attempt hit the cache
+        assert stub.calls["getLatestBlockhash"] == 2
+    finally:
+        runner.blockhash_cache.stop()
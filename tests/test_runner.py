@@ -0,0 +1,28 @@
+import io
+
+from solders.pubkey import Pubkey
+
+from batch_cancel_cli.runner import read_contract_ids
+
+
+def test_read_contract_ids_skips_blank_comment_and_invalid_lines(capsys):
+    first, second = Pubkey.new_unique(), Pubkey.new_unique()
+    stream = io.StringIO(f"# contracts to cancel\n{first}\n\n   \n  {second}  \nnot-a-pubkey\n# {first}\n")
+    assert list(read_contract_ids(stream)) == [first, second]
+    assert capsys.readouterr().out == "Skipping invalid contract id on line 6: not-a-pubkey\n"
+
+
+def test_read_contract_ids_dedups_unless_told_not_to():
+    first, second = Pubkey.new_unique(), Pubkey.new_unique()
+    lines = f"{first}\n{second}\n{first}\n{second}\n{first}"
+    assert list(read_contract_ids(io.StringIO(lines))) == [first, second]
+    assert list(read_contract_ids(io.StringIO(lines), dedup=False)) == [first, second, first, second, first]
+
+
+def test_read_contract_ids_streams():
+    def lines():
+        yield f"{Pubkey.new_unique()}\n"
+        raise AssertionError("read past the first id")
+
+    ids = read_contract_ids(lines())  # type: ignore[arg-type]
+    assert isinstance(next(ids), Pubkey)
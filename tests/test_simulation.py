@@ -0,0 +1,89 @@
+from concurrent.futures import Future
+
+import pytest
+from solders.pubkey import Pubkey
+from solders.transaction_status import (
+    InstructionErrorCustom,
+    TransactionErrorFieldless,
+    TransactionErrorInstructionError,
+)
+
+from batch_cancel_cli.journal import Journal, JournalEntry, State
+from batch_cancel_cli.runner import Reporter
+
+from .rpc import RpcStub, context, contract_items, decode_tx, stub_runner
+
+PROGRAM_ERROR = {"InstructionError": [1, {"Custom": 6000}]}
+TRANSIENT_ERRORS = ["BlockhashNotFound", "AccountInUse", "WouldExceedMaxBlockCostLimit", "InsufficientFundsForFee"]
+
+
+class Recorder:
+    """Stands in for the journal, keeps what the reporter records."""
+
+    def __init__(self) -> None:
+        self.records: dict[Pubkey, tuple[State, str | None]] = {}
+
+    def record(self, contract_id, state, signature=None, error=None) -> None:
+        self.records[contract_id] = (state, error)
+
+
+def simulate(errors: dict[Pubkey, object]) -> RpcStub:
+    def simulate_transaction(params):
+        keys = decode_tx(params).message.account_keys
+        error = next((error for contract_id, error in errors.items() if contract_id in keys), None)
+        return context({"err": error, "logs": [], "accounts": None, "unitsConsumed": 0, "returnData": None})
+
+    return RpcStub(simulateTransaction=simulate_transaction)
+
+
+def done(result=None, error: Exception | None = None) -> Future:
+    future: Future = Future()
+    if error:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+
+def test_program_errors_are_skipped_and_journaled(tmp_path):
+    items = contract_items(4)
+    doomed = items[1][0]
+    runner = stub_runner(simulate({doomed: PROGRAM_ERROR}))
+    journal = Journal(tmp_path / "journal.tsv")
+    reporter = Reporter(journal)
+    sent = list(reporter.skip_doomed(runner.iter_simulations(Pubkey.new_unique(), items, 2)))
+    journal.close()
+    assert sent == [item for item in items if item[0] != doomed]
+    assert Journal.load(journal.path) == {doomed: JournalEntry(State.SKIPPED, error="custom program error 0x1770")}
+    assert reporter.simulated == 4
+    assert reporter.doomed == {"custom program error 0x1770": 1}
+
+
+@pytest.mark.parametrize("error", TRANSIENT_ERRORS)
+def test_other_simulation_errors_are_sent(error):
+    items = contract_items(3)
+    runner = stub_runner(simulate({contract_id: error for contract_id, _ in items}))
+    recorder = Recorder()
+    reporter = Reporter(recorder)
+    assert list(reporter.skip_doomed(runner.iter_simulations(Pubkey.new_unique(), items, 2))) == items
+    assert recorder.records == {}
+    assert reporter.simulated == 3
+    assert not reporter.doomed
+
+
+def test_failed_simulations_are_sent():
+    (contract_id, contract), *_ = contract_items(1)
+    reporter = Reporter(Recorder())
+    simulations = [(contract_id, contract, done(error=RuntimeError("node down")))]
+    assert list(reporter.skip_doomed(simulations)) == [(contract_id, contract)]
+    assert reporter.simulated == 0
+
+
+def test_only_instruction_errors_doom():
+    (contract_id, contract), (other_id, other) = contract_items(2)
+    instruction_error = TransactionErrorInstructionError(0, InstructionErrorCustom(1))
+    simulations = [
+        (contract_id, contract, done(instruction_error)),
+        (other_id, other, done(TransactionErrorFieldless.ClusterMaintenance)),
+    ]
+    assert list(Reporter().skip_doomed(simulations)) == [(other_id, other)]
@@ -0,0 +1,47 @@
+import json
+import subprocess
+import sys
+
+import httpx
+import pytest
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+
+from batch_cancel_cli.runner import Runner
+
+# Runs a CLI invocation and prints the modules it imported, the wall-clock budgets are checked by benchmarks.startup
+IMPORTED = """
+import json, sys
+from batch_cancel_cli.cli import cli
+try:
+    cli(sys.argv[1:])
+except SystemExit:
+    pass
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def imported(*args: str) -> set[str]:
+    out = subprocess.run([sys.executable, "-c", IMPORTED, *args], capture_output=True, text=True, check=True).stdout
+    return set(json.loads(out.splitlines()[-1]))
+
+
+@pytest.mark.parametrize(
+    "module", ["httpx", "solana", "batch_cancel_cli.runner", "batch_cancel_cli.client.instructions"]
+)
+def test_help_imports_no_rpc_stack(module):
+    assert module not in imported("-h")
+
+
+def test_create_help_skips_the_instruction_package():
+    modules = imported("--key", str(Keypair()), "create", "-h")
+    assert "batch_cancel_cli.runner" in modules
+    assert "batch_cancel_cli.client.instructions" not in modules
+    assert "anchorpy" not in modules
+
+
+def test_runner_defers_the_http_session():
+    # loading the certificates is the slowest part of building a runner, commands that send nothing skip it
+    runner = Runner("http://rpc", Keypair(), Pubkey.new_unique())
+    assert "session" not in vars(runner.client._provider)
+    assert isinstance(runner.client._provider.session, httpx.Client)
@@ -0,0 +1,116 @@
+import random
+import struct
+import typing
+from typing import Any
+
+import pytest
+from podite import F32, U8, U32, U64
+from solders.pubkey import Pubkey
+
+from batch_cancel_cli.client.contract import Contract
+from batch_cancel_cli.client.structures import CONTRACT_LAYOUT, CONTRACT_SIZE, ContractView
+
+FIELD_TYPES = typing.get_type_hints(Contract)
+BOOL_FIELDS = (
+    "cancelable_by_sender",
+    "cancelable_by_recipient",
+    "automatic_withdrawal",
+    "transferable_by_sender",
+    "transferable_by_recipient",
+    "can_topup",
+    "pausable",
+    "can_update_rate",
+    "closed",
+)
+MAX_VALUES = {U8: 2**8 - 1, U32: 2**32 - 1, U64: 2**64 - 1, F32: struct.unpack("<f", b"\xff\xff\x7f\x7f")[0]}
+ARRAY_FIELDS = frozenset(name for name, kind in FIELD_TYPES.items() if kind not in MAX_VALUES)
+
+
+def encode(**overrides: Any) -> bytes:
+    """Contract bytes from podite, every field not in `overrides` zeroed."""
+    values = {
+        name: [0] * kind.calc_size() if name in ARRAY_FIELDS else 0 for name, kind in FIELD_TYPES.items()
+    } | overrides
+    return Contract.to_bytes(Contract(**values))
+
+
+def normalize(value: Any) -> Any:
+    # podite decodes byte arrays to lists, the view to `Pubkey` or `bytes`; floats compare bit for bit, NaN included
+    if isinstance(value, list | Pubkey):
+        return bytes(value)
+    if isinstance(value, float):
+        return struct.pack("<f", value)
+    return value
+
+
+def assert_same_fields(data: bytes) -> None:
+    expected = Contract.from_bytes(data[:CONTRACT_SIZE])
+    view = ContractView.from_bytes(data)
+    unpacked = view.unpack()
+    for name, _ in CONTRACT_LAYOUT:
+        assert normalize(getattr(view, name)) == normalize(getattr(expected, name)), name
+        assert normalize(unpacked[name]) == normalize(getattr(expected, name)), name
+
+
+def test_layout_matches_contract():
+    assert [name for name, _ in CONTRACT_LAYOUT] == list(FIELD_TYPES)
+    assert CONTRACT_SIZE == Contract.calc_size() == 704
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_random_buffers(seed):
+    assert_same_fields(random.Random(seed).randbytes(CONTRACT_SIZE))
+
+
+def test_zeroed():
+    # zeroed pubkeys and every bool false
+    data = encode()
+    assert_same_fields(data)
+    view = ContractView.from_bytes(data)
+    assert view.sender == Pubkey.default()
+    assert not any(getattr(view, name) for name in BOOL_FIELDS)
+
+
+def test_max_values():
+    overrides = {
+        name: [0xFF] * kind.calc_size() if name in ARRAY_FIELDS else MAX_VALUES[kind]
+        for name, kind in FIELD_TYPES.items()
+    }
+    data = encode(**overrides)
+    assert_same_fields(data)
+    view = ContractView.from_bytes(data)
+    assert view.magic == view.withdrawn_amount == view.funds_unlocked_at_last_rate_change == 2**64 - 1
+    assert view.ghost == 2**32 - 1
+
+
+@pytest.mark.parametrize("flag", [0, 1])
+def test_bools(flag):
+    data = encode(**dict.fromkeys(BOOL_FIELDS, flag))
+    assert_same_fields(data)
+    view = ContractView.from_bytes(data)
+    assert [getattr(view, name) for name in BOOL_FIELDS] == [flag] * len(BOOL_FIELDS)
+
+
+def test_distinct_field_values():
+    # a different value in every field catches fields read at a neighbour's offset
+    overrides = {}
+    for i, (name, kind) in enumerate(FIELD_TYPES.items(), start=1):
+        if name in ARRAY_FIELDS:
+            overrides[name] = [i] * kind.calc_size()
+        elif kind is F32:
+            overrides[name] = i / 4
+        else:
+            overrides[name] = i
+    assert_same_fields(encode(**overrides))
+
+
+def test_account_data_longer_than_contract():
+    data = random.Random(0).randbytes(CONTRACT_SIZE) + b"\x01" * 400
+    assert_same_fields(data)
+    view = ContractView.from_bytes(memoryview(data))
+    assert view.unpack() == ContractView.from_bytes(data[:CONTRACT_SIZE]).unpack()
+
+
+def test_short_buffer():
+    with pytest.raises(ValueError, match="expected at least 704"):
+        ContractView.from_bytes(bytes(CONTRACT_SIZE - 1))
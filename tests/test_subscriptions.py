@@ -0,0 +1,212 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from typing import Any, Callable
+
+import pytest
+import websockets
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+
+from batch_cancel_cli import subscriptions
+from batch_cancel_cli.confirmation import ConfirmationTracker, Outcome
+from batch_cancel_cli.subscriptions import SignatureSubscriber
+
+
+class StubNode:
+    """signatureSubscribe over a websocket, served from a thread of its own; acks can be held back until released."""
+
+    def __init__(self, hold_acks: bool = False):
+        self.hold_acks = hold_acks
+        self.requests: list[dict[str, Any]] = []
+        self.connections = 0
+        self.subscriptions: dict[str, tuple[Any, int]] = {}
+        self._held: list[tuple[Any, str]] = []
+        self._sockets: list[Any] = []
+        self._ids = itertools.count(100)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._server = self._run(self._start())
+
+    @property
+    def rpc_url(self) -> str:
+        # the subscriber derives the websocket port as the RPC port + 1
+        return f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1] - 1}"
+
+    def methods(self) -> list[str]:
+        return [request["method"] for request in self.requests]
+
+    async def _serve(self, ws: Any) -> None:
+        self.connections += 1
+        self._sockets.append(ws)
+        async for raw in ws:
+            request = json.loads(raw)
+            self.requests.append(request)
+            if request["method"] == "signatureSubscribe":
+                subscription = next(self._ids)
+                self.subscriptions[request["params"][0]] = (ws, subscription)
+                ack = json.dumps({"jsonrpc": "2.0", "result": subscription, "id": request["id"]})
+                if self.hold_acks:
+                    self._held.append((ws, ack))
+                else:
+                    await ws.send(ack)
+            elif request["method"] == "signatureUnsubscribe":
+                await ws.send(json.dumps({"jsonrpc": "2.0", "result": True, "id": request["id"]}))
+
+    async def _start(self) -> Any:
+        return await websockets.serve(self._serve, "127.0.0.1", 0)
+
+    def _run(self, coroutine: Any) -> Any:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout=5)
+
+    def release_acks(self) -> None:
+        async def release() -> None:
+            for ws, ack in self._held:
+                await ws.send(ack)
+            self._held.clear()
+
+        self._run(release())
+
+    def notify(self, signature: Signature, err: Any = None) -> None:
+        ws, subscription = self.subscriptions[str(signature)]
+        notification = {
+            "jsonrpc": "2.0",
+            "method": "signatureNotification",
+            "params": {"result": {"context": {"slot": 5}, "value": {"err": err}}, "subscription": subscription},
+        }
+        self._run(ws.send(json.dumps(notification)))
+
+    def drop(self) -> None:
+        async def close() -> None:
+            for ws in self._sockets:
+                await ws.close()
+            self._sockets.clear()
+
+        self.subscriptions.clear()
+        self._run(close())
+
+    def close(self) -> None:
+        async def close() -> None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        self._run(close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+
+def eventually(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture()
+def node():
+    node = StubNode()
+    yield node
+    node.close()
+
+
+@pytest.fixture()
+def results() -> list[tuple[Signature, Outcome, str | None]]:
+    return []
+
+
+@pytest.fixture()
+def tracker(results) -> ConfirmationTracker:
+    # never polled, everything settles from the websocket or by hand
+    return ConfirmationTracker(
+        lambda signatures: [None] * len(signatures),
+        lambda: 0,
+        lambda pending, outcome, error: results.append((pending.signature, outcome, error)),
+    )
+
+
+@pytest.fixture()
+def subscribe(tracker, monkeypatch):
+    monkeypatch.setattr(subscriptions, "RECONNECT_DELAY", 0.05)
+    started: list[SignatureSubscriber] = []
+
+    def subscribe(node: StubNode) -> SignatureSubscriber:
+        subscriber = SignatureSubscriber([node.rpc_url], tracker)
+        subscriber.start()
+        started.append(subscriber)
+        eventually(lambda: node.connections == 1)
+        return subscriber
+
+    yield subscribe
+    for subscriber in started:
+        subscriber.stop()
+        assert subscriber._loop.is_closed()
+
+
+def send(tracker: ConfirmationTracker) -> Signature:
+    signature = Signature.new_unique()
+    tracker.add(signature, [Pubkey.new_unique()], 1_000)
+    return signature
+
+
+def test_notifications_settle_watched_signatures(node, tracker, results, subscribe):
+    subscriber = subscribe(node)
+    confirmed, failed = send(tracker), send(tracker)
+    eventually(lambda: len(tracker._watched) == 2)
+    node.notify(confirmed)
+    node.notify(failed, {"InstructionError": [1, {"Custom": 6000}]})
+    eventually(lambda: len(results) == 2)
+    assert results[0] == (confirmed, Outcome.CONFIRMED, None)
+    assert results[1][:2] == (failed, Outcome.FAILED)
+    assert not tracker._watched
+    assert subscriber.stats() == {"notifications": 2, "reconnects": 0}
+
+
+def test_signature_settled_before_the_ack_is_released(tracker, results, subscribe):
+    node = StubNode(hold_acks=True)
+    try:
+        subscribe(node)
+        signature = send(tracker)
+        eventually(lambda: "signatureSubscribe" in node.methods())
+        # settled by a poll while the subscription is on its way
+        tracker.resolve(signature, None)
+        node.release_acks()
+        eventually(lambda: "signatureUnsubscribe" in node.methods())
+        assert not tracker._watched
+        assert results == [(signature, Outcome.CONFIRMED, None)]
+    finally:
+        node.close()
+
+
+def test_resolved_signatures_are_unsubscribed(node, tracker, subscribe):
+    subscribe(node)
+    signature = send(tracker)
+    eventually(lambda: tracker._watched.get(signature) == 1)
+    tracker.resolve(signature, None)
+    eventually(lambda: "signatureUnsubscribe" in node.methods())
+    assert not tracker._watched
+
+
+def test_reconnect_resubscribes_pending_signatures(node, tracker, results, subscribe):
+    subscriber = subscribe(node)
+    signature = send(tracker)
+    eventually(lambda: str(signature) in node.subscriptions)
+    node.drop()
+    eventually(lambda: node.connections == 2 and str(signature) in node.subscriptions)
+    assert subscriber.stats()["reconnects"] == 1
+    # the dropped socket's watch is gone, the new one holds the only watch
+    eventually(lambda: tracker._watched.get(signature) == 1)
+    node.notify(signature)
+    eventually(lambda: results == [(signature, Outcome.CONFIRMED, None)])
+    assert not tracker._watched
+
+
+def test_stopped_subscriber_ignores_new_signatures(node, tracker, subscribe):
+    subscriber = subscribe(node)
+    subscriber.stop()
+    assert subscriber._loop.is_closed()
+    send(tracker)
+    assert len(tracker) == 1
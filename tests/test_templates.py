@@ -0,0 +1,56 @@
+import pytest
+from solders.instruction import Instruction
+from solders.pubkey import Pubkey
+
+from batch_cancel_cli import templates
+from batch_cancel_cli.client.structures import ContractView
+from batch_cancel_cli.runner import Runner
+
+from .rpc import RpcStub, contract_items, stub_runner
+
+
+@pytest.fixture()
+def runner() -> Runner:
+    return stub_runner(RpcStub())
+
+
+def generated(runner: Runner, new_recipient: Pubkey, contract_id: Pubkey, contract: ContractView) -> list[Instruction]:
+    # what the generated builders make of the contract, the cancel goes to the recipient the transfer sets
+    return [
+        runner.generate_transfer_instruction(new_recipient, contract_id, contract),
+        runner.generate_cancel_instruction(contract_id, contract, new_recipient),
+    ]
+
+
+def assert_same(built: list[Instruction], expected: list[Instruction]) -> None:
+    assert built == expected
+    assert [bytes(ix) for ix in built] == [bytes(ix) for ix in expected]
+
+
+def test_template_matches_the_generated_builders(runner):
+    new_recipient = Pubkey.new_unique()
+    # two senders and mints, so the interned metas are reused and replaced
+    for contract_id, contract in contract_items(3) + contract_items(3):
+        built = runner.generate_transfer_cancel_instructions(new_recipient, contract_id, contract)
+        assert_same(built, generated(runner, new_recipient, contract_id, contract))
+
+
+def test_templates_are_kept_per_new_recipient(runner):
+    first, second = Pubkey.new_unique(), Pubkey.new_unique()
+    (contract_id, contract), *_ = contract_items(1)
+    for new_recipient in (first, second, first):
+        built = runner.generate_transfer_cancel_instructions(new_recipient, contract_id, contract)
+        assert_same(built, generated(runner, new_recipient, contract_id, contract))
+    assert set(runner.templates) == {first, second}
+
+
+def test_template_starts_over_past_the_interning_limit(runner, monkeypatch):
+    monkeypatch.setattr(templates, "MAX_INTERNED", 2)
+    new_recipient = Pubkey.new_unique()
+    items = [item for _ in range(4) for item in contract_items(1)]
+    for contract_id, contract in items:
+        built = runner.generate_transfer_cancel_instructions(new_recipient, contract_id, contract)
+        assert_same(built, generated(runner, new_recipient, contract_id, contract))
+    template = runner.templates[new_recipient]
+    assert len(template._writable) <= 2
+    assert len(template._mints) <= 2